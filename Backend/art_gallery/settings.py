@@ -4,6 +4,7 @@ Django settings for art_gallery project.
 
 from pathlib import Path
 import os
+import sys
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -11,6 +12,8 @@ SECRET_KEY = os.getenv('SECRET_KEY', 'django-insecure-b7v!wnzmlm*43di6$9l5v_tg1f
 
 DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', 'artgallery-1-2sie.onrender.com']
 
 
@@ -32,9 +35,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'gallery.alloc_profiler.AllocationProfilerMiddleware',
+    'gallery.timing.ServerTimingMiddleware',
+    'gallery.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'gallery.middleware.ReadOnlyRequestMiddleware',
+    'gallery.query_inspector.QueryInspectorMiddleware',
+    'gallery.slow_queries.SlowQueryMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'gallery.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -66,7 +76,8 @@ CORS_ALLOW_HEADERS = [
     'cookie',
 ]
 
-CORS_EXPOSE_HEADERS = ['set-cookie']
+# x-next-cursor/link: keyset pagination of the admin lists; x-pending-count: moderation queue
+CORS_EXPOSE_HEADERS = ['set-cookie', 'server-timing', 'x-next-cursor', 'x-pending-count', 'link']
 
 # CSRF Configuration
 CSRF_TRUSTED_ORIGINS = [
@@ -91,9 +102,14 @@ SESSION_COOKIE_SECURE = True
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_AGE = 1209600  # 2 weeks
 SESSION_COOKIE_NAME = 'sessionid'
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Cache first, database behind (see gallery/sessions.py)
+SESSION_ENGINE = 'gallery.sessions'
+SESSION_CACHE_TTL = int(os.getenv('SESSION_CACHE_TTL', '300'))
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
-SESSION_SAVE_EVERY_REQUEST = True
+# Expiry is slid by gallery.middleware.SessionRefreshMiddleware at most once
+# per SESSION_REFRESH_INTERVAL seconds instead of a write on every request
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_INTERVAL = int(os.getenv('SESSION_REFRESH_INTERVAL', '3600'))
 SESSION_COOKIE_DOMAIN = None
 
 ROOT_URLCONF = 'art_gallery.urls'
@@ -120,10 +136,82 @@ TEMPLATES = [
 WSGI_APPLICATION = 'art_gallery.wsgi.application'
 
 
+DATABASE_PATH = Path(os.getenv('DATABASE_PATH', BASE_DIR / 'db.sqlite3'))
+DATABASE_READ_ALIAS = 'read'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': DATABASE_PATH,
+    },
+    # The same file opened read-only: reads of GET requests (gallery.db.ReadWriteRouter)
+    DATABASE_READ_ALIAS: {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{DATABASE_PATH}?mode=ro',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['gallery.db.ReadWriteRouter']
+
+# SQLite production profile, applied to every new connection (gallery/db.py).
+# WAL lets readers run alongside the writer and busy_timeout makes a writer
+# wait for the lock instead of failing with "database is locked"
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000')),  # ms
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),  # bytes
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-20000')),  # negative: KiB
+}
+
+# Query inspection (gallery/query_inspector.py). The N+1 report is meant for
+# development and staging; over-budget views raise under the test runner and
+# are only logged otherwise
+QUERY_INSPECTOR_ENABLED = os.getenv('QUERY_INSPECTOR_ENABLED', str(DEBUG)) == 'True'
+QUERY_INSPECTOR_REPEAT_THRESHOLD = int(os.getenv('QUERY_INSPECTOR_REPEAT_THRESHOLD', '5'))
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', str(TESTING)) == 'True'
+
+# Slow-query log (gallery/slow_queries.py): queries over the threshold, with
+# their plan, kept in a per-worker ring buffer shown at admin/slow-queries/
+SLOW_QUERY_ENABLED = os.getenv('SLOW_QUERY_ENABLED', str(not TESTING)) == 'True'
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '100'))
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv('SLOW_QUERY_BUFFER_SIZE', '200'))
+# Explained query shapes kept per worker (least recently used evicted first)
+SLOW_QUERY_PLAN_CACHE_SIZE = int(os.getenv('SLOW_QUERY_PLAN_CACHE_SIZE', '500'))
+
+# Per-request time breakdown (gallery/timing.py): Server-Timing header and
+# one JSON log line per request
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'True') == 'True'
+SERVER_TIMING_LOG = os.getenv('SERVER_TIMING_LOG', str(not TESTING)) == 'True'
+
+# Request and AI call metrics shared by all workers through files in
+# METRICS_DIR (gallery/metrics.py), served at /metrics to staff or to a
+# scraper presenting METRICS_TOKEN
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', str(not TESTING)) == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Deploy identifier (e.g. the git SHA) attached to stored measurements
+RELEASE = os.getenv('RELEASE', 'dev')
+
+# Allocation profiling (gallery/alloc_profiler.py), off by default: a share of
+# requests, plus any request sending `X-Alloc-Profile: <ALLOC_PROFILER_TOKEN>`
+ALLOC_PROFILER_ENABLED = os.getenv('ALLOC_PROFILER_ENABLED', 'False') == 'True'
+ALLOC_PROFILER_SAMPLE_RATE = float(os.getenv('ALLOC_PROFILER_SAMPLE_RATE', '0'))
+ALLOC_PROFILER_TOKEN = os.getenv('ALLOC_PROFILER_TOKEN', '')
+ALLOC_PROFILER_FRAMES = int(os.getenv('ALLOC_PROFILER_FRAMES', '15'))
+ALLOC_PROFILER_TOP = int(os.getenv('ALLOC_PROFILER_TOP', '15'))
+
+# The default LocMemCache is per process: a worker only drops the entries it
+# invalidated itself, so others may serve a stale value for up to the entry's
+# lifetime (user summaries: USER_SUMMARY_TTL, 300s; admin stats snapshot:
+# ADMIN_STATS_TTL, 30s; sessions: SESSION_CACHE_TTL, 300s). With several
+# workers, point CACHE_BACKEND/CACHE_LOCATION at a shared cache (e.g.
+# django.core.cache.backends.redis.RedisCache) to make invalidation immediate.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'art-gallery'),
     }
 }
 
@@ -153,7 +241,7 @@ USE_TZ = True
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -5,6 +5,10 @@ from django.conf.urls.static import static
 from django.views.static import serve
 from django.urls import re_path
 
+# Without its final catch-all view, the admin site lets unknown admin/... paths
+# fall through to the gallery's admin API routes (admin/users/, admin/stats/, ...)
+admin.site.final_catch_all_view = False
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('gallery.urls')),  # Include your gallery URLs
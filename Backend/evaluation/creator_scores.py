@@ -0,0 +1,183 @@
+"""
+Scores des créateurs maintenus incrémentalement
+Les signaux (signals.py) appliquent un delta à chaque upload, suppression
+et like ; les vues sont cumulées en mémoire et écrites par lots (voir
+record_views) : lire un badge = une lecture par clé primaire
+"""
+
+import atexit
+import os
+import threading
+import time
+import traceback
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CreatorScore
+from .scoring import (
+    BADGES, DEFAULT_BADGE, LIKE_WEIGHT, UPLOAD_WEIGHT, VIEW_WEIGHT, badge_for, with_contribution_stats,
+)
+
+
+# Objets en cours de suppression : les likes supprimés en cascade avec une
+# œuvre sont déjà décomptés par l'œuvre, et un utilisateur supprimé n'a plus
+# de score à maintenir
+_deleting = threading.local()
+
+
+def deleting_artworks():
+    if not hasattr(_deleting, 'artworks'):
+        _deleting.artworks = set()
+    return _deleting.artworks
+
+
+def deleting_users():
+    if not hasattr(_deleting, 'users'):
+        _deleting.users = set()
+    return _deleting.users
+
+
+# Les vues arrivent à chaque GET : elles sont cumulées par créateur dans chaque
+# worker et écrites au plus toutes les VIEWS_FLUSH_INTERVAL secondes, ou dès
+# VIEWS_FLUSH_MAX vues en attente. Un badge peut donc retarder d'un intervalle ;
+# les vues d'un worker arrêté brutalement sont rattrapées par evaluate_all
+VIEWS_FLUSH_INTERVAL = float(os.getenv('CREATOR_VIEWS_FLUSH_INTERVAL', '30'))
+VIEWS_FLUSH_MAX = int(os.getenv('CREATOR_VIEWS_FLUSH_MAX', '500'))
+
+_pending_lock = threading.Lock()
+_pending_views = {}
+_pending_total = 0
+_flushed_at = time.monotonic()
+
+
+def _seed(user_id):
+    """Crée la ligne d'un utilisateur à partir de ses contributions actuelles (une seule fois)"""
+    user = with_contribution_stats(User.objects.filter(pk=user_id)).first()
+    if user is None:
+        return None
+    score = user.uploads * UPLOAD_WEIGHT + user.total_likes * LIKE_WEIGHT + user.total_views * VIEW_WEIGHT
+    score_row, _ = CreatorScore.objects.get_or_create(
+        user_id=user_id,
+        defaults={
+            'uploads': user.uploads,
+            'total_likes': user.total_likes,
+            'total_views': user.total_views,
+            'score': score,
+            'badge': badge_for(score)[0],
+        },
+    )
+    return score_row
+
+
+def apply_delta(user_id, uploads=0, likes=0, views=0):
+    """
+    Applique un delta aux compteurs d'un créateur et recalcule score et badge
+
+    Les compteurs sont mis à jour avec F() (pas de mise à jour perdue entre
+    workers) ; le badge n'est réécrit que s'il change.
+    """
+    if not user_id or not (uploads or likes or views) or user_id in deleting_users():
+        return
+    with transaction.atomic():
+        updated = CreatorScore.objects.filter(pk=user_id).update(
+            uploads=F('uploads') + uploads,
+            total_likes=F('total_likes') + likes,
+            total_views=F('total_views') + views,
+            score=(
+                (F('uploads') + uploads) * UPLOAD_WEIGHT
+                + (F('total_likes') + likes) * LIKE_WEIGHT
+                + (F('total_views') + views) * VIEW_WEIGHT
+            ),
+        )
+        if not updated:
+            # Première contribution suivie : la ligne part de l'état réel (delta inclus)
+            _seed(user_id)
+            return
+
+        score, badge = CreatorScore.objects.filter(pk=user_id).values_list('score', 'badge').get()
+        new_badge = badge_for(score)[0]
+        if new_badge != badge:
+            CreatorScore.objects.filter(pk=user_id).update(
+                badge=new_badge, previous_badge=badge, badge_changed_at=timezone.now()
+            )
+
+
+def record_views(user_id, count=1):
+    """
+    À appeler quand un incrément du compteur de vues est écrit en base
+
+    Le delta est seulement cumulé ; l'écriture a lieu quand le lot est dû.
+    """
+    global _pending_total
+    if not user_id or not count:
+        return
+    with _pending_lock:
+        _pending_views[user_id] = _pending_views.get(user_id, 0) + count
+        _pending_total += count
+        due = _pending_total >= VIEWS_FLUSH_MAX or time.monotonic() - _flushed_at >= VIEWS_FLUSH_INTERVAL
+    if due:
+        flush_views()
+
+
+def take_pending_views():
+    """Retire et retourne les vues en attente ({user_id: count})"""
+    global _pending_total, _flushed_at
+    with _pending_lock:
+        pending = dict(_pending_views)
+        _pending_views.clear()
+        _pending_total = 0
+        _flushed_at = time.monotonic()
+    return pending
+
+
+def flush_views():
+    """Écrit les vues en attente, un delta par créateur ; retourne le nombre de créateurs"""
+    pending = take_pending_views()
+    with transaction.atomic():
+        for user_id, count in pending.items():
+            apply_delta(user_id, views=count)
+    return len(pending)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush_views()
+    except Exception:
+        print(traceback.format_exc())
+
+
+def get_badge(user_id):
+    """
+    Badge d'un créateur : une lecture par clé primaire, jamais d'agrégation
+
+    Retourne None si l'utilisateur n'existe pas (vérifié seulement sans score).
+    """
+    row = CreatorScore.objects.filter(pk=user_id).values(
+        'score', 'badge', 'previous_badge', 'badge_changed_at'
+    ).first()
+    if row is None:
+        if not User.objects.filter(pk=user_id).exists():
+            return None
+        badge, description = DEFAULT_BADGE
+        return {'user': int(user_id), 'score': 0, 'badge': badge, 'description': description,
+                'previous_badge': None, 'badge_changed_at': None}
+    badge = row['badge'] or DEFAULT_BADGE[0]
+    return {
+        'user': int(user_id),
+        'score': round(row['score'], 1),
+        'badge': badge,
+        'description': badge_description(badge),
+        'previous_badge': row['previous_badge'] or None,
+        'badge_changed_at': row['badge_changed_at'].isoformat() if row['badge_changed_at'] else None,
+    }
+
+
+def badge_description(badge):
+    for _, name, description in BADGES:
+        if name == badge:
+            return description
+    return DEFAULT_BADGE[1]
@@ -0,0 +1,128 @@
+"""
+Classement des créateurs
+Les rangs, percentiles et paliers sont calculés en une seule passe NumPy sur
+tous les scores puis écrits dans LeaderboardEntry : lire une page ou le rang
+d'un utilisateur ne parcourt jamais la table
+"""
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CreatorScore, LeaderboardEntry
+
+
+# (percentile minimal, palier), du plus haut au plus bas : les paliers suivent
+# la distribution des scores au lieu de seuils fixes. Ils sont distincts des
+# badges (scoring.BADGES, seuils de score fixes, servis par /badge/ et
+# evaluate) et portent donc d'autres noms : un même créateur a un badge et un
+# palier, sans contradiction
+TIERS = [
+    (99, '🏆 Top 1%'),
+    (90, '🥇 Top 10%'),
+    (60, '🥈 Top 40%'),
+]
+DEFAULT_TIER = '🎖️ Contender'
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def compute_rankings(user_ids, scores):
+    """
+    Rangs, positions, percentiles et paliers pour des tableaux de scores
+
+    - rank : rang de compétition (1 + nombre de scores strictement supérieurs)
+    - position : ordre total 1..n (score décroissant puis user_id), clé de pagination
+    - percentile : part des autres créateurs ayant un score strictement inférieur
+    Un score nul reste toujours au palier par défaut.
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    n = scores.size
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0), np.empty(0, dtype=object)
+
+    ordered = np.sort(scores)
+    below = np.searchsorted(ordered, scores, side='left')
+    not_above = np.searchsorted(ordered, scores, side='right')
+    ranks = n - not_above + 1
+    percentiles = below * 100.0 / max(n - 1, 1)
+
+    positions = np.empty(n, dtype=np.int64)
+    positions[np.lexsort((user_ids, -scores))] = np.arange(1, n + 1)
+
+    conditions = [(percentiles >= threshold) & (scores > 0) for threshold, _ in TIERS]
+    tiers = np.select(conditions, [tier for _, tier in TIERS], default=DEFAULT_TIER)
+    return ranks, positions, percentiles, tiers
+
+
+@transaction.atomic
+def rebuild_leaderboard(batch_size=1000):
+    """Recalcule tout le classement à partir des CreatorScore ; retourne le nombre d'entrées"""
+    rows = np.fromiter(
+        CreatorScore.objects.order_by().values_list('user_id', 'score').iterator(chunk_size=batch_size),
+        dtype=[('user_id', np.int64), ('score', np.float64)],
+    )
+    ranks, positions, percentiles, tiers = compute_rankings(rows['user_id'], rows['score'])
+
+    now = timezone.now()
+    LeaderboardEntry.objects.all().delete()
+    LeaderboardEntry.objects.bulk_create(
+        (
+            LeaderboardEntry(
+                user_id=int(user_id), position=int(position), rank=int(rank), score=float(score),
+                percentile=round(float(percentile), 2), tier=str(tier), computed_at=now,
+            )
+            for user_id, position, rank, score, percentile, tier in zip(
+                rows['user_id'], positions, ranks, rows['score'], percentiles, tiers
+            )
+        ),
+        batch_size=batch_size,
+    )
+    return int(rows.size)
+
+
+def _entry(row):
+    return {
+        'user': row['user_id'],
+        'username': row['user__username'],
+        'rank': row['rank'],
+        'position': row['position'],
+        'score': round(row['score'], 1),
+        'percentile': row['percentile'],
+        'tier': row['tier'],
+    }
+
+
+ENTRY_FIELDS = ('user_id', 'user__username', 'rank', 'position', 'score', 'percentile', 'tier', 'computed_at')
+
+
+def get_page(after=0, limit=PAGE_SIZE):
+    """Une page du classement, paginée par clé sur `position` (pas d'OFFSET)"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = list(
+        LeaderboardEntry.objects.filter(position__gt=after)
+        .order_by('position')
+        .values(*ENTRY_FIELDS)[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'results': [_entry(row) for row in rows],
+        'next_after': rows[-1]['position'] if has_more else None,
+        'computed_at': rows[0]['computed_at'].isoformat() if rows else None,
+    }
+
+
+def get_rank(user_id):
+    """
+    Rang d'un utilisateur : une lecture par clé primaire, plus le total lu
+    sur l'index unique de `position` (MAX indexé), soit O(log n)
+    """
+    row = LeaderboardEntry.objects.filter(pk=user_id).values(*ENTRY_FIELDS).first()
+    if row is None:
+        return None
+    total = LeaderboardEntry.objects.order_by('-position').values_list('position', flat=True).first()
+    return {**_entry(row), 'total': total, 'computed_at': row['computed_at'].isoformat()}
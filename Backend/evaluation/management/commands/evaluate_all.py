@@ -0,0 +1,101 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from evaluation.leaderboard import rebuild_leaderboard
+from evaluation.models import CreatorScore, Evaluation
+from evaluation.scoring import badge_for, compute_score, with_contribution_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcule le score et le badge de tous les utilisateurs (par lots, en bulk)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Nombre d'utilisateurs traités par lot (défaut : 1000)")
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        started = time.perf_counter()
+        created_total = updated_total = 0
+        last_pk = 0
+
+        while True:
+            # Pagination par clé : pas d'OFFSET qui ralentit sur les gros volumes
+            users = list(
+                with_contribution_stats(User.objects.filter(pk__gt=last_pk))
+                .order_by('pk')
+                .only('pk')[:chunk_size]
+            )
+            if not users:
+                break
+            last_pk = users[-1].pk
+
+            created, updated = self.evaluate_chunk(users)
+            created_total += created
+            updated_total += updated
+
+        # Les scores viennent d'être réalignés : le classement suit
+        ranked = rebuild_leaderboard()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{created_total + updated_total} utilisateurs évalués '
+            f'({created_total} créés, {updated_total} mis à jour), {ranked} classés en {elapsed:.2f}s'
+        ))
+
+    @transaction.atomic
+    def evaluate_chunk(self, users):
+        now = timezone.now()
+        existing = {}
+        for evaluation in Evaluation.objects.filter(user_id__in=[u.pk for u in users]).order_by('pk'):
+            existing.setdefault(evaluation.user_id, evaluation)
+
+        to_create, to_update = [], []
+        for user in users:
+            score = compute_score(user.uploads, user.total_likes, user.total_views)
+            badge, description = badge_for(score)
+            evaluation = existing.get(user.pk)
+            if evaluation is None:
+                to_create.append(Evaluation(user_id=user.pk, score=score, badge=badge, description=description))
+            else:
+                evaluation.score = score
+                evaluation.badge = badge
+                evaluation.description = description
+                evaluation.date_evaluated = now
+                to_update.append(evaluation)
+
+        Evaluation.objects.bulk_create(to_create)
+        Evaluation.objects.bulk_update(to_update, ['score', 'badge', 'description', 'date_evaluated'])
+        self.resync_creator_scores(users, now)
+        return len(to_create), len(to_update)
+
+    def resync_creator_scores(self, users, now):
+        """Réaligne les compteurs incrémentaux sur les agrégats (répare une éventuelle dérive)"""
+        scores = CreatorScore.objects.in_bulk([u.pk for u in users])
+        to_create, to_update = [], []
+        for user in users:
+            score = compute_score(user.uploads, user.total_likes, user.total_views)
+            badge = badge_for(score)[0]
+            row = scores.get(user.pk)
+            if row is None:
+                to_create.append(CreatorScore(
+                    user_id=user.pk, uploads=user.uploads, total_likes=user.total_likes,
+                    total_views=user.total_views, score=score, badge=badge,
+                ))
+                continue
+            if row.badge != badge:
+                row.previous_badge, row.badge, row.badge_changed_at = row.badge, badge, now
+            row.uploads, row.total_likes, row.total_views, row.score = (
+                user.uploads, user.total_likes, user.total_views, score
+            )
+            row.updated_at = now
+            to_update.append(row)
+        CreatorScore.objects.bulk_create(to_create)
+        CreatorScore.objects.bulk_update(to_update, [
+            'uploads', 'total_likes', 'total_views', 'score',
+            'badge', 'previous_badge', 'badge_changed_at', 'updated_at',
+        ])
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from evaluation.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit le classement matérialisé (rangs, percentiles et paliers) à partir des scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Taille des lots d'insertion (défaut : 1000)")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = rebuild_leaderboard(batch_size=max(1, options['batch_size']))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'{total} créateurs classés en {elapsed:.2f}s'))
@@ -0,0 +1,66 @@
+# Generated by Django 4.2 on 2026-10-19 07:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_creator_scores(apps, schema_editor):
+    """Initialise les compteurs à partir des données existantes"""
+    from django.db.models import Count, Sum
+
+    User = apps.get_model('auth', 'User')
+    Artwork = apps.get_model('gallery', 'Artwork')
+    Like = apps.get_model('gallery', 'Like')
+    CreatorScore = apps.get_model('evaluation', 'CreatorScore')
+
+    artworks = {
+        row['artist']: row
+        for row in Artwork.objects.order_by().values('artist').annotate(uploads=Count('id'), views=Sum('views'))
+    }
+    likes = dict(
+        Like.objects.order_by().values('artwork__artist').annotate(c=Count('id')).values_list('artwork__artist', 'c')
+    )
+    thresholds = [
+        (200, '🌟 Master Creator'),
+        (100, '🔥 Rising Star'),
+        (50, '✨ Emerging Artist'),
+    ]
+
+    rows = []
+    for user_id in User.objects.values_list('pk', flat=True).iterator():
+        uploads = artworks.get(user_id, {}).get('uploads', 0)
+        views = artworks.get(user_id, {}).get('views') or 0
+        total_likes = likes.get(user_id, 0)
+        score = uploads * 5 + total_likes * 2 + views * 0.1
+        badge = next((b for t, b in thresholds if score > t), '🎨 Newcomer')
+        rows.append(CreatorScore(user_id=user_id, uploads=uploads, total_likes=total_likes,
+                                 total_views=views, score=score, badge=badge))
+    CreatorScore.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('evaluation', '0001_initial'),
+        ('gallery', '0008_aicallrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreatorScore',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='creator_score', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('uploads', models.IntegerField(default=0)),
+                ('total_likes', models.IntegerField(default=0)),
+                ('total_views', models.BigIntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('badge', models.CharField(blank=True, max_length=100)),
+                ('previous_badge', models.CharField(blank=True, max_length=100)),
+                ('badge_changed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_creator_scores, migrations.RunPython.noop),
+    ]
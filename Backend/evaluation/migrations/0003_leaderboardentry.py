@@ -0,0 +1,35 @@
+# Generated by Django 4.2 on 2026-10-19 07:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('evaluation', '0002_creatorscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('position', models.PositiveIntegerField(unique=True)),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.FloatField(default=0)),
+                ('percentile', models.FloatField(default=0)),
+                ('tier', models.CharField(max_length=100)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='evaluation',
+            index=models.Index(fields=['-date_evaluated', '-id'], name='evaluation_date_idx'),
+        ),
+    ]
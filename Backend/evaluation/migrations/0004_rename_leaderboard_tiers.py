@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+# Anciens paliers (noms des badges) -> paliers par percentile
+RENAMED_TIERS = {
+    '🌟 Master Creator': '🏆 Top 1%',
+    '🔥 Rising Star': '🥇 Top 10%',
+    '✨ Emerging Artist': '🥈 Top 40%',
+    '🎨 Newcomer': '🎖️ Contender',
+}
+
+
+def rename_tiers(apps, schema_editor):
+    LeaderboardEntry = apps.get_model('evaluation', 'LeaderboardEntry')
+    for old, new in RENAMED_TIERS.items():
+        LeaderboardEntry.objects.filter(tier=old).update(tier=new)
+
+
+def restore_tiers(apps, schema_editor):
+    LeaderboardEntry = apps.get_model('evaluation', 'LeaderboardEntry')
+    for old, new in RENAMED_TIERS.items():
+        LeaderboardEntry.objects.filter(tier=new).update(tier=old)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0003_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_tiers, restore_tiers),
+    ]
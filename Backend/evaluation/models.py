@@ -10,5 +10,49 @@ class Evaluation(models.Model):
     description = models.TextField(blank=True)
     date_evaluated = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Ordre de la liste paginée par curseur
+            models.Index(fields=['-date_evaluated', '-id'], name='evaluation_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.badge or 'Unranked'}"
+
+
+class CreatorScore(models.Model):
+    """Score d'un créateur maintenu incrémentalement (voir creator_scores.py)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='creator_score')
+    uploads = models.IntegerField(default=0)
+    total_likes = models.IntegerField(default=0)
+    total_views = models.BigIntegerField(default=0)
+    score = models.FloatField(default=0)
+    badge = models.CharField(max_length=100, blank=True)
+    previous_badge = models.CharField(max_length=100, blank=True)
+    badge_changed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.score} ({self.badge or 'Unranked'})"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Classement matérialisé (voir leaderboard.py), reconstruit en une passe
+
+    `position` est unique et continue (1..n) : c'est la clé de pagination ;
+    `rank` est le rang affiché (ex æquo partagent le même rang).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='leaderboard_entry')
+    position = models.PositiveIntegerField(unique=True)
+    rank = models.PositiveIntegerField()
+    score = models.FloatField(default=0)
+    percentile = models.FloatField(default=0)
+    tier = models.CharField(max_length=100)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['position']
+
+    def __str__(self):
+        return f"#{self.rank} {self.user_id} - {self.score} ({self.tier})"
@@ -0,0 +1,65 @@
+from django.contrib.auth.models import User
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from gallery.models import Artwork, Like
+
+
+# Poids du score : uploads*5 + likes*2 + vues*0.1
+UPLOAD_WEIGHT = 5
+LIKE_WEIGHT = 2
+VIEW_WEIGHT = 0.1
+
+# (seuil strict, badge, description), du plus haut au plus bas ; les paliers
+# du classement (leaderboard.TIERS, par percentile) sont une notion à part
+BADGES = [
+    (200, '🌟 Master Creator', 'Un artiste légendaire dont les créations rayonnent partout.'),
+    (100, '🔥 Rising Star', 'Un créateur prometteur au talent en pleine ascension.'),
+    (50, '✨ Emerging Artist', 'Un artiste passionné qui commence à se faire remarquer.'),
+]
+DEFAULT_BADGE = ('🎨 Newcomer', 'Un nouveau talent prêt à briller.')
+
+
+def compute_score(uploads, total_likes, total_views):
+    return uploads * UPLOAD_WEIGHT + total_likes * LIKE_WEIGHT + total_views * VIEW_WEIGHT
+
+
+def badge_for(score):
+    """Retourne (badge, description) pour un score"""
+    for threshold, badge, description in BADGES:
+        if score > threshold:
+            return badge, description
+    return DEFAULT_BADGE
+
+
+def _count_subquery(queryset, group_field, aggregate):
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(group_field).annotate(value=aggregate).values('value')[:1],
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def with_contribution_stats(users=None):
+    """
+    Annote chaque utilisateur avec uploads, total_likes et total_views en une seule requête
+
+    Chaque total est une sous-requête corrélée : joindre artworks et likes
+    directement multiplierait les vues par le nombre de likes. Les œuvres
+    masquées par la modération ne comptent pas.
+    """
+    if users is None:
+        users = User.objects.all()
+    return users.annotate(
+        uploads=_count_subquery(
+            Artwork.objects.filter(artist=OuterRef('pk'), is_active=True), 'artist', Count('id')
+        ),
+        total_likes=_count_subquery(
+            Like.objects.filter(artwork__artist=OuterRef('pk'), artwork__is_active=True), 'artwork__artist', Count('id')
+        ),
+        total_views=_count_subquery(
+            Artwork.objects.filter(artist=OuterRef('pk'), is_active=True), 'artist', Sum('views')
+        ),
+    )
@@ -2,7 +2,9 @@ from rest_framework import serializers
 from .models import Evaluation
 
 class EvaluationSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+
     class Meta:
         model = Evaluation
-        fields = ['id', 'user', 'score', 'badge', 'description', 'date_evaluated']
+        fields = ['id', 'user', 'username', 'score', 'badge', 'description', 'date_evaluated']
         read_only_fields = ['score', 'badge', 'description', 'date_evaluated']
@@ -0,0 +1,77 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from gallery.models import Artwork, Like
+from gallery.signals import artwork_viewed, content_deactivated
+from .creator_scores import apply_delta, deleting_artworks, deleting_users, record_views
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    deleting_users().add(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    deleting_users().discard(instance.pk)
+
+
+@receiver(post_save, sender=Artwork)
+def artwork_created(sender, instance, created, **kwargs):
+    if created:
+        apply_delta(instance.artist_id, uploads=1, views=instance.views)
+
+
+@receiver(pre_delete, sender=Artwork)
+def artwork_deleting(sender, instance, **kwargs):
+    # Compté avant la cascade : les likes de l'œuvre partent avec elle
+    instance._score_likes = instance.likes.count()
+    deleting_artworks().add(instance.pk)
+
+
+@receiver(post_delete, sender=Artwork)
+def artwork_deleted(sender, instance, **kwargs):
+    deleting_artworks().discard(instance.pk)
+    if not instance.is_active:
+        # Déjà retirée du score quand elle a été masquée
+        return
+    apply_delta(
+        instance.artist_id,
+        uploads=-1,
+        likes=-getattr(instance, '_score_likes', 0),
+        views=-instance.views,
+    )
+
+
+def _artist_of(like):
+    # Les likes d'une œuvre masquée ne comptent pas
+    if Like.artwork.is_cached(like):
+        # Œuvre déjà chargée par la vue (toggle_like) : pas de requête
+        artwork = like.artwork
+        return artwork.artist_id if artwork.is_active else None
+    return Artwork.objects.filter(pk=like.artwork_id, is_active=True).values_list('artist_id', flat=True).first()
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        apply_delta(_artist_of(instance), likes=1)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    if instance.artwork_id in deleting_artworks():
+        return
+    apply_delta(_artist_of(instance), likes=-1)
+
+
+@receiver(artwork_viewed)
+def views_flushed(sender, artist_id, count, **kwargs):
+    record_views(artist_id, count)
+
+
+@receiver(content_deactivated)
+def content_hidden(sender, artists, **kwargs):
+    for artist_id, removed in artists.items():
+        apply_delta(artist_id, uploads=-removed['uploads'], likes=-removed['likes'], views=-removed['views'])
@@ -1,3 +1,301 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from gallery.models import Artwork, Like
+from . import creator_scores
+from .leaderboard import DEFAULT_TIER, TIERS, compute_rankings, rebuild_leaderboard
+from .models import CreatorScore, Evaluation, LeaderboardEntry
+from .scoring import BADGES, DEFAULT_BADGE, badge_for, compute_score, with_contribution_stats
+
+
+def make_artworks(artist, *views):
+    # bulk_create : Artwork.save() ouvrirait le fichier image (absent)
+    return Artwork.objects.bulk_create([
+        Artwork(title=f'{artist.username} {i}', description='', artist=artist,
+                image='artworks/test.jpg', views=count)
+        for i, count in enumerate(views)
+    ])
+
+
+class ScoringTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.artist = User.objects.create_user('artist', password='pw')
+        cls.fans = [User.objects.create_user(f'fan{i}', password='pw') for i in range(3)]
+        cls.idle = User.objects.create_user('idle', password='pw')
+        first, second = make_artworks(cls.artist, 100, 40)
+        Like.objects.bulk_create(
+            [Like(user=fan, artwork=first) for fan in cls.fans] + [Like(user=cls.fans[0], artwork=second)]
+        )
+
+    def test_contribution_stats(self):
+        stats = {u.pk: u for u in with_contribution_stats()}
+        artist = stats[self.artist.pk]
+        # Les vues ne sont pas multipliées par le nombre de likes
+        self.assertEqual((artist.uploads, artist.total_likes, artist.total_views), (2, 4, 140))
+        idle = stats[self.idle.pk]
+        self.assertEqual((idle.uploads, idle.total_likes, idle.total_views), (0, 0, 0))
+
+    def test_contribution_stats_is_one_query(self):
+        with self.assertNumQueries(1):
+            list(with_contribution_stats())
+
+    def test_badge_thresholds_are_strict(self):
+        self.assertEqual(badge_for(0), DEFAULT_BADGE)
+        self.assertEqual(badge_for(50)[0], '🎨 Newcomer')
+        self.assertEqual(badge_for(50.1)[0], '✨ Emerging Artist')
+        self.assertEqual(badge_for(101)[0], '🔥 Rising Star')
+        self.assertEqual(badge_for(201)[0], '🌟 Master Creator')
+
+    def test_evaluate_endpoint(self):
+        response = self.client.post(reverse('evaluation-evaluate', args=[self.artist.pk]))
+        self.assertEqual(response.status_code, 200)
+        # 2*5 + 4*2 + 140*0.1
+        self.assertAlmostEqual(response.json()['score'], 32)
+        self.assertEqual(Evaluation.objects.get(user=self.artist).badge, DEFAULT_BADGE[0])
+
+    def test_evaluate_unknown_user(self):
+        response = self.client.post(reverse('evaluation-evaluate', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class EvaluateAllTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{i}', password='pw') for i in range(5)]
+        for i, user in enumerate(cls.users):
+            make_artworks(user, *[i * 100] * i)
+
+    def evaluate_all(self, *args):
+        out = StringIO()
+        call_command('evaluate_all', *args, stdout=out)
+        return out.getvalue()
+
+    def expected(self, user):
+        uploads = self.users.index(user)
+        return compute_score(uploads, 0, uploads * uploads * 100)
+
+    def test_scores_every_user_in_chunks(self):
+        output = self.evaluate_all('--chunk-size', '2')
+        self.assertIn('5 utilisateurs évalués (5 créés, 0 mis à jour)', output)
+        for user in self.users:
+            evaluation = Evaluation.objects.get(user=user)
+            self.assertAlmostEqual(evaluation.score, self.expected(user))
+            self.assertEqual(evaluation.badge, badge_for(evaluation.score)[0])
+
+    def test_rerun_updates_in_place(self):
+        self.evaluate_all()
+        Artwork.objects.filter(artist=self.users[1]).update(views=10000)
+        output = self.evaluate_all()
+        self.assertIn('(0 créés, 5 mis à jour)', output)
+        self.assertEqual(Evaluation.objects.count(), 5)
+        self.assertAlmostEqual(Evaluation.objects.get(user=self.users[1]).score, compute_score(1, 0, 10000))
+
+    def test_query_count_does_not_grow_with_users(self):
+        with CaptureQueriesContext(connection) as small:
+            self.evaluate_all('--chunk-size', '1000')
+        User.objects.bulk_create([User(username=f'extra{i}') for i in range(50)])
+        Evaluation.objects.all().delete()
+        CreatorScore.objects.all().delete()
+        with self.assertNumQueries(len(small.captured_queries)):
+            self.evaluate_all('--chunk-size', '1000')
+
+    def test_resyncs_creator_scores(self):
+        # Compteurs incrémentaux qui ont dérivé
+        CreatorScore.objects.update_or_create(
+            user=self.users[4], defaults={'uploads': 1, 'total_views': 0, 'score': 5, 'badge': DEFAULT_BADGE[0]}
+        )
+        self.evaluate_all()
+        row = CreatorScore.objects.get(user=self.users[4])
+        self.assertEqual((row.uploads, row.total_views), (4, 1600))
+        self.assertEqual(row.badge, badge_for(self.expected(self.users[4]))[0])
+        self.assertEqual(row.previous_badge, DEFAULT_BADGE[0])
+        self.assertEqual(CreatorScore.objects.count(), 5)
+
+
+class CreatorScoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.artist = User.objects.create_user('artist', password='pw')
+        cls.fan = User.objects.create_user('fan', password='pw')
+
+    def setUp(self):
+        # Vues cumulées par d'autres tests (autre base)
+        creator_scores.take_pending_views()
+
+    def create_artwork(self, views=0):
+        # Sans image : Artwork.save() n'ouvre aucun fichier
+        return Artwork.objects.create(title='Work', description='', artist=self.artist, views=views)
+
+    def score(self):
+        return CreatorScore.objects.get(pk=self.artist.pk)
+
+    def test_uploads_and_likes_apply_deltas(self):
+        artwork = self.create_artwork(views=20)
+        row = self.score()
+        self.assertEqual((row.uploads, row.total_likes, row.total_views), (1, 0, 20))
+        like = Like.objects.create(user=self.fan, artwork=artwork)
+        self.assertEqual(self.score().total_likes, 1)
+        like.delete()
+        row = self.score()
+        self.assertEqual(row.total_likes, 0)
+        self.assertAlmostEqual(row.score, compute_score(1, 0, 20))
+
+    def test_like_signals_reuse_the_loaded_artwork(self):
+        artwork = self.create_artwork()
+        self.client.force_login(self.fan)
+        url = reverse('toggle_like', args=[artwork.pk])
+        for liked in (True, False):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.post(url).json()['liked'], liked)
+            self.assertEqual(self.score().total_likes, int(liked))
+            # Seule la vue lit l'œuvre
+            artwork_reads = [q['sql'] for q in queries.captured_queries
+                             if q['sql'].startswith('SELECT') and 'FROM "gallery_artwork"' in q['sql']]
+            self.assertEqual(len(artwork_reads), 1, artwork_reads)
+
+    def test_like_of_hidden_artwork_is_not_counted(self):
+        artwork = self.create_artwork()
+        Artwork.objects.filter(pk=artwork.pk).update(is_active=False)
+        artwork.is_active = False
+        Like.objects.create(user=self.fan, artwork=artwork)
+        # Sans œuvre en cache : la requête de repli filtre aussi is_active
+        Like.objects.get(user=self.fan).delete()
+        self.assertEqual(self.score().total_likes, 0)
+
+    def test_artwork_deletion_counts_cascaded_likes_once(self):
+        self.create_artwork(views=5)
+        artwork = self.create_artwork(views=10)
+        Like.objects.create(user=self.fan, artwork=artwork)
+        artwork.delete()
+        row = self.score()
+        self.assertEqual((row.uploads, row.total_likes, row.total_views), (1, 0, 5))
+
+    def test_views_are_buffered_until_flush(self):
+        artwork = self.create_artwork()
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('artwork_detail', args=[artwork.pk])).status_code, 200)
+        self.assertEqual(self.score().total_views, 0)
+        self.assertEqual(creator_scores.flush_views(), 1)
+        self.assertEqual(self.score().total_views, 3)
+        self.assertEqual(creator_scores.flush_views(), 0)
+
+    def test_views_flush_when_batch_is_full(self):
+        self.create_artwork()
+        with mock.patch.object(creator_scores, 'VIEWS_FLUSH_MAX', 10):
+            creator_scores.record_views(self.artist.pk, 9)
+            self.assertEqual(self.score().total_views, 0)
+            creator_scores.record_views(self.artist.pk, 1)
+        self.assertEqual(self.score().total_views, 10)
+
+    def test_views_flush_after_interval(self):
+        self.create_artwork()
+        with mock.patch.object(creator_scores, 'VIEWS_FLUSH_INTERVAL', 0):
+            creator_scores.record_views(self.artist.pk, 4)
+        self.assertEqual(self.score().total_views, 4)
+
+    def test_badge_transition(self):
+        self.create_artwork()
+        creator_scores.apply_delta(self.artist.pk, views=600)
+        row = self.score()
+        self.assertEqual(row.badge, '✨ Emerging Artist')
+        self.assertEqual(row.previous_badge, DEFAULT_BADGE[0])
+        self.assertIsNotNone(row.badge_changed_at)
+
+    def test_first_delta_seeds_from_current_state(self):
+        make_artworks(self.artist, 30, 70)
+        creator_scores.apply_delta(self.artist.pk, likes=1)
+        row = self.score()
+        # bulk_create sans signaux : la ligne part de l'état réel
+        self.assertEqual((row.uploads, row.total_views), (2, 100))
+
+    def test_badge_endpoint(self):
+        self.create_artwork()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('evaluation-badge', args=[self.artist.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['score'], 5)
+
+    def test_badge_of_user_without_score(self):
+        response = self.client.get(reverse('evaluation-badge', args=[self.fan.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['badge'], DEFAULT_BADGE[0])
+
+    def test_badge_of_unknown_user(self):
+        response = self.client.get(reverse('evaluation-badge', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class LeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{i}', password='pw') for i in range(6)]
+        # Deux ex æquo à 50 et un score nul
+        scores = [300, 50, 50, 20, 10, 0]
+        CreatorScore.objects.bulk_create([
+            CreatorScore(user=user, score=score) for user, score in zip(cls.users, scores)
+        ])
+
+    def page(self, **params):
+        response = self.client.get(reverse('evaluation-leaderboard'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_compute_rankings(self):
+        ranks, positions, percentiles, tiers = compute_rankings([1, 2, 3, 4], [10, 30, 30, 0])
+        self.assertEqual(list(ranks), [3, 1, 1, 4])
+        # Ex æquo départagés par user_id
+        self.assertEqual(list(positions), [3, 1, 2, 4])
+        self.assertEqual([round(p, 2) for p in percentiles], [33.33, 66.67, 66.67, 0])
+        self.assertEqual(tiers[3], DEFAULT_TIER)
+
+    def test_tiers_and_badges_have_distinct_names(self):
+        # Un palier (percentile) ne doit pas se lire comme un badge (seuil de score)
+        tiers = {tier for _, tier in TIERS} | {DEFAULT_TIER}
+        badges = {badge for _, badge, _ in BADGES} | {DEFAULT_BADGE[0]}
+        self.assertFalse(tiers & badges)
+
+    def test_compute_rankings_empty(self):
+        self.assertEqual([len(a) for a in compute_rankings([], [])], [0, 0, 0, 0])
+
+    def test_empty_leaderboard_is_not_built_on_read(self):
+        with self.assertNumQueries(1):
+            page = self.page()
+        self.assertEqual(page, {'results': [], 'next_after': None, 'computed_at': None})
+        self.assertFalse(LeaderboardEntry.objects.exists())
+
+    def test_pages_follow_the_cursor(self):
+        self.assertEqual(rebuild_leaderboard(), 6)
+        seen, after = [], 0
+        while after is not None:
+            page = self.page(after=after, limit=4)
+            seen += page['results']
+            after = page['next_after']
+        self.assertEqual([entry['username'] for entry in seen], [u.username for u in self.users])
+        self.assertEqual([entry['rank'] for entry in seen], [1, 2, 2, 4, 5, 6])
+        self.assertEqual(seen[0]['tier'], TIERS[0][1])
+        self.assertEqual(seen[-1]['tier'], DEFAULT_TIER)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('evaluation-leaderboard'), {'after': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_my_rank(self):
+        rebuild_leaderboard()
+        self.client.force_login(self.users[2])
+        response = self.client.get(reverse('evaluation-my-rank'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['rank'], response.json()['total']), (2, 6))
 
-# Create your tests here.
+    def test_my_rank_anonymous_and_unranked(self):
+        self.assertEqual(self.client.get(reverse('evaluation-my-rank')).status_code, 401)
+        # Pas encore classé : le classement n'a pas été construit
+        response = self.client.get(reverse('evaluation-my-rank'), {'user': self.users[0].pk})
+        self.assertEqual(response.status_code, 404)
@@ -2,44 +2,42 @@ from django.shortcuts import render
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from django.contrib.auth.models import User
 from .models import Evaluation
 from .serializers import EvaluationSerializer
-from gallery.models import Artwork, Like  # si ton app gallery est utilisée
+from .scoring import badge_for, compute_score, with_contribution_stats
+from .creator_scores import get_badge
+from .leaderboard import PAGE_SIZE, get_page, get_rank
+
+
+class EvaluationPagination(CursorPagination):
+    # Pagination par curseur (clé), stable même si des évaluations arrivent entre deux pages
+    ordering = ('-date_evaluated', '-id')
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
+
 
 class EvaluationViewSet(viewsets.ModelViewSet):
-    queryset = Evaluation.objects.all().order_by('-date_evaluated')
+    queryset = Evaluation.objects.select_related('user').order_by('-date_evaluated', '-id')
     serializer_class = EvaluationSerializer
+    pagination_class = EvaluationPagination
 
     # Endpoint spécial pour calculer une évaluation IA
     @action(detail=True, methods=['post'])
     def evaluate(self, request, pk=None):
-        try:
-            user = User.objects.get(pk=pk)
-        except User.DoesNotExist:
+        # Une seule requête agrégée pour uploads, likes et vues
+        user = with_contribution_stats(User.objects.filter(pk=pk)).first()
+        if user is None:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
         # Calcul du score basé sur les contributions
-        uploads = Artwork.objects.filter(artist=user).count()
-        total_likes = sum(art.likes.count() for art in Artwork.objects.filter(artist=user))
-        total_views = sum(art.views for art in Artwork.objects.filter(artist=user))
-
-        score = uploads * 5 + total_likes * 2 + total_views * 0.1
+        score = compute_score(user.uploads, user.total_likes, user.total_views)
 
         # Logique IA pour badge
-        if score > 200:
-            badge = '🌟 Master Creator'
-            description = 'Un artiste légendaire dont les créations rayonnent partout.'
-        elif score > 100:
-            badge = '🔥 Rising Star'
-            description = 'Un créateur prometteur au talent en pleine ascension.'
-        elif score > 50:
-            badge = '✨ Emerging Artist'
-            description = 'Un artiste passionné qui commence à se faire remarquer.'
-        else:
-            badge = '🎨 Newcomer'
-            description = 'Un nouveau talent prêt à briller.'
+        badge, description = badge_for(score)
 
         # Crée ou met à jour l’évaluation
         evaluation, _ = Evaluation.objects.update_or_create(
@@ -50,3 +48,44 @@ class EvaluationViewSet(viewsets.ModelViewSet):
         serializer = EvaluationSerializer(evaluation)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    # Badge courant, maintenu incrémentalement : une lecture par clé primaire
+    @action(detail=True, methods=['get'])
+    def badge(self, request, pk=None):
+        try:
+            user_id = int(pk)
+        except (TypeError, ValueError):
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        badge = get_badge(user_id)
+        if badge is None:
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(badge, status=status.HTTP_200_OK)
+
+    # Classement matérialisé, paginé par clé : ?after=<position>&limit=50
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        try:
+            after = max(0, int(request.query_params.get('after', 0)))
+            limit = int(request.query_params.get('limit', PAGE_SIZE))
+        except (TypeError, ValueError):
+            return Response({'error': 'after and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Jamais reconstruit ici (rebuild_leaderboard / evaluate_all) : vide tant qu'il n'a pas été calculé
+        return Response(get_page(after, limit), status=status.HTTP_200_OK)
+
+    # Rang de l'utilisateur connecté (ou ?user=<id>) : lecture par clé primaire
+    @action(detail=False, methods=['get'], url_path='my-rank')
+    def my_rank(self, request):
+        user_id = request.query_params.get('user')
+        if user_id is None:
+            if not request.user.is_authenticated:
+                return Response({'error': 'Not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
+            user_id = request.user.pk
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        rank = get_rank(user_id)
+        if rank is None:
+            return Response({'error': 'User not ranked yet'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(rank, status=status.HTTP_200_OK)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Artwork, Like, Comment, UserProfile
+from .models import Category, Artwork, Like, Comment, UserProfile, GenerationJob, DailyStats, AllocationProfile
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -20,4 +20,18 @@ class CommentAdmin(admin.ModelAdmin):
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ['user', 'location']
\ No newline at end of file
+    list_display = ['user', 'location']
+
+@admin.register(GenerationJob)
+class GenerationJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+
+@admin.register(DailyStats)
+class DailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['date', 'new_users', 'new_artworks', 'new_likes', 'new_comments', 'new_reports', 'views']
+
+@admin.register(AllocationProfile)
+class AllocationProfileAdmin(admin.ModelAdmin):
+    list_display = ['view', 'release', 'method', 'peak_bytes', 'rss_growth_kb', 'trigger', 'created_at']
+    list_filter = ['release', 'view', 'trigger']
@@ -0,0 +1,130 @@
+"""
+Admin dashboard statistics
+All headline counts come from one SQL statement (one scalar subquery per
+count) and are cached as a short-lived snapshot; per-day trends are read from
+the DailyStats rollup filled by the rollup_daily_stats command
+"""
+
+import os
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Artwork, Comment, DailyStats, Like, Report
+
+
+# Lifetime of the cached snapshot, in seconds
+ADMIN_STATS_TTL = int(os.getenv('ADMIN_STATS_TTL', '30'))
+SNAPSHOT_CACHE_KEY = 'admin_stats:snapshot'
+
+
+def _counters():
+    """Name -> queryset whose row count (or view sum) is reported"""
+    return {
+        'totalUsers': User.objects.all(),
+        'activeUsers': User.objects.filter(is_active=True),
+        'totalArtworks': Artwork.objects.all(),
+        'totalLikes': Like.objects.all(),
+        'totalComments': Comment.objects.all(),
+        'totalReports': Report.objects.all(),
+        'pendingReports': Report.objects.filter(resolved=False),
+    }
+
+
+def compute_stats():
+    """Every dashboard count in a single SELECT of scalar subqueries"""
+    columns, params = [], []
+    for name, queryset in _counters().items():
+        sql, query_params = queryset.order_by().values('pk').query.sql_with_params()
+        columns.append(f'(SELECT COUNT(*) FROM ({sql}) AS counted)')
+        params.extend(query_params)
+    sql, query_params = Artwork.objects.order_by().values('views').query.sql_with_params()
+    columns.append(f'(SELECT COALESCE(SUM(views), 0) FROM ({sql}) AS summed)')
+    params.extend(query_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(columns), params)
+        row = cursor.fetchone()
+
+    stats = dict(zip(list(_counters()) + ['totalViews'], row))
+    stats.update({
+        'totalTransactions': 0,  # Placeholder: there is no transaction model yet
+        'totalRevenue': 0,  # Placeholder
+        'generatedAt': timezone.now().isoformat(),
+    })
+    return stats
+
+
+def get_stats_snapshot():
+    """The cached snapshot, recomputed at most once per ADMIN_STATS_TTL per cache"""
+    stats = cache.get(SNAPSHOT_CACHE_KEY)
+    if stats is None:
+        stats = compute_stats()
+        cache.set(SNAPSHOT_CACHE_KEY, stats, ADMIN_STATS_TTL)
+    return stats
+
+
+def _per_day(queryset, field, since):
+    rows = (
+        queryset.filter(**{f'{field}__gte': since})
+        .annotate(day=TruncDate(field))
+        .order_by()
+        .values('day')
+        .annotate(count=Count('pk'))
+    )
+    return {row['day']: row['count'] for row in rows}
+
+
+@transaction.atomic
+def rollup_daily_stats(days=2):
+    """
+    (Re)compute the DailyStats rows of the last `days` days, today included
+
+    Counts are recomputed from the base tables for the whole range. Views can
+    only be measured live: today's row gets the growth of the total view count
+    since the previous rollup row, older rows keep what they had.
+    """
+    today = timezone.localdate()
+    first_day = today - timedelta(days=max(1, days) - 1)
+    since = timezone.make_aware(datetime.combine(first_day, time.min))
+    now = timezone.now()
+
+    counts = {
+        'new_users': _per_day(User.objects.all(), 'date_joined', since),
+        'new_artworks': _per_day(Artwork.objects.all(), 'created_at', since),
+        'new_likes': _per_day(Like.objects.all(), 'created_at', since),
+        'new_comments': _per_day(Comment.objects.all(), 'created_at', since),
+        'new_reports': _per_day(Report.objects.all(), 'created_at', since),
+    }
+
+    existing = {row.date: row for row in DailyStats.objects.filter(date__gte=first_day)}
+    to_create, to_update = [], []
+    for offset in range((today - first_day).days + 1):
+        day = first_day + timedelta(days=offset)
+        row = existing.get(day) or DailyStats(date=day)
+        for field, per_day in counts.items():
+            setattr(row, field, per_day.get(day, 0))
+        if day == today:
+            total_views = Artwork.objects.aggregate(total=Sum('views'))['total'] or 0
+            # Last day whose view total was measured (rows only back-filled keep 0)
+            previous = DailyStats.objects.filter(date__lt=today, total_views__gt=0).order_by('-date').first()
+            # Deleted artworks take their views with them: never report a negative day
+            row.views = max(0, total_views - previous.total_views) if previous else 0
+            row.total_views = total_views
+        row.updated_at = now
+        (to_update if row.pk else to_create).append(row)
+
+    DailyStats.objects.bulk_create(to_create)
+    DailyStats.objects.bulk_update(to_update, list(counts) + ['views', 'total_views', 'updated_at'])
+    return len(to_create) + len(to_update)
+
+
+def daily_series(days=30):
+    """The last `days` rollup rows, oldest first, for charting"""
+    first_day = timezone.localdate() - timedelta(days=max(1, days) - 1)
+    return [row.to_dict() for row in DailyStats.objects.filter(date__gte=first_day).order_by('date')]
@@ -5,18 +5,23 @@ AI Service for generating artwork descriptions using Groq API
 import os
 from openai import OpenAI
 from dotenv import load_dotenv
+from .ai_metering import CallMeter
+from .ai_singleflight import coalesce
+from .timing import timed
 
 load_dotenv()
 
 # Utiliser VOTRE clé pour les descriptions
 client = OpenAI(
     api_key=os.getenv('GROQ_API_KEY_DESCRIPTION'),  # ← Votre clé
-    base_url='https://api.groq.com/openai/v1'
+    base_url=os.getenv('GROQ_BASE_URL', 'https://api.groq.com/openai/v1')
 )
 
 AI_MODEL = os.getenv('AI_MODEL', 'llama-3.3-70b-versatile')
 
 
+@timed('ai')
+@coalesce('artwork_description')
 def generate_artwork_description(title: str, category: str = None, style: str = None, max_length: int = 150) -> str:
     """
     Generate an attractive description for an artwork
@@ -47,17 +52,21 @@ Create compelling, artistic descriptions that:
 
 Write a description that will make people want to see and purchase this piece. Maximum {max_length} characters."""
 
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
     try:
-        response = client.chat.completions.create(
-            model=AI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.8,
-            max_tokens=200,
-            timeout=10
-        )
+        with CallMeter('artwork_description', AI_MODEL, messages) as meter:
+            response = client.chat.completions.create(
+                model=AI_MODEL,
+                messages=messages,
+                temperature=0.8,
+                max_tokens=200,
+                timeout=10
+            )
+            meter.set_usage(response.usage)
         
         description = response.choices[0].message.content.strip()
         
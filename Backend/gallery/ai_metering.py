@@ -0,0 +1,187 @@
+"""
+Usage and latency metering for upstream AI calls
+Every call records model, endpoint, tokens, wall time, time-to-first-token and
+outcome in the AICallRecord table; `rolling_aggregates` powers the admin endpoint
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from . import metrics
+from .timing import phase
+
+
+# Records older than this are pruned
+AI_USAGE_RETENTION = timedelta(days=int(os.getenv('AI_USAGE_RETENTION_DAYS', '30')))
+# Prune once every N records
+PRUNE_EVERY = 500
+
+_writes = 0
+_writes_lock = threading.Lock()
+
+
+def prompt_hash(messages) -> str:
+    payload = json.dumps(messages, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _usage_value(usage, name):
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get(name)
+    return getattr(usage, name, None)
+
+
+class CallMeter:
+    """
+    Measures one upstream AI call
+
+    Example:
+        with CallMeter('tutorial', model, messages) as meter:
+            response = client.chat.completions.create(...)
+            meter.set_usage(response.usage)
+
+    For streams call meter.first_token() on the first chunk and meter.finish()
+    when the stream ends (or meter.finish('cancelled') if the client went away).
+    """
+
+    def __init__(self, endpoint: str, model: str, messages):
+        self.endpoint = endpoint
+        self.model = model
+        self.prompt_hash = prompt_hash(messages)
+        self.started = time.perf_counter()
+        self.ttft = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.finished = False
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+
+    def set_usage(self, usage):
+        self.prompt_tokens = _usage_value(usage, 'prompt_tokens')
+        self.completion_tokens = _usage_value(usage, 'completion_tokens')
+
+    def finish(self, outcome: str = 'ok'):
+        if self.finished:
+            return
+        self.finished = True
+        record_call(
+            endpoint=self.endpoint,
+            model=self.model,
+            outcome=outcome,
+            wall=time.perf_counter() - self.started,
+            ttft=self.ttft,
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            prompt_hash=self.prompt_hash,
+        )
+
+    def __enter__(self):
+        # The call counts as the `ai` phase of the current request (timing.py)
+        self._phase = phase('ai').__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._phase.__exit__(exc_type, exc, tb)
+        if exc_type is None:
+            self.finish('ok')
+        elif exc_type is GeneratorExit:
+            self.finish('cancelled')
+        else:
+            self.finish(outcome_for(exc))
+        return False
+
+
+def outcome_for(exc: BaseException) -> str:
+    name = type(exc).__name__.lower()
+    return 'timeout' if 'timeout' in name or 'timedout' in name else 'error'
+
+
+def record_call(endpoint, model, outcome, wall, ttft=None, prompt_tokens=None,
+                completion_tokens=None, prompt_hash=''):
+    """Store one call; metering must never break the AI feature itself"""
+    global _writes
+    from .models import AICallRecord
+
+    try:
+        metrics.observe_ai_call(endpoint, model, outcome, wall, prompt_tokens, completion_tokens)
+    except Exception as e:
+        print(f"AI metrics error: {str(e)}")
+
+    try:
+        AICallRecord.objects.create(
+            endpoint=endpoint,
+            model=model or '',
+            outcome=outcome,
+            wall_ms=round(wall * 1000),
+            ttft_ms=round(ttft * 1000) if ttft is not None else None,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            prompt_hash=prompt_hash,
+        )
+        with _writes_lock:
+            _writes += 1
+            prune = _writes % PRUNE_EVERY == 0
+        if prune:
+            AICallRecord.objects.filter(created_at__lt=timezone.now() - AI_USAGE_RETENTION).delete()
+    except Exception as e:
+        print(f"AI metering error: {str(e)}")
+
+
+def _percentile(ordered, pct):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def rolling_aggregates(window: timedelta):
+    """Per (endpoint, model) aggregates over the last `window`"""
+    from .models import AICallRecord
+
+    records = AICallRecord.objects.filter(created_at__gte=timezone.now() - window)
+    groups = records.values('endpoint', 'model').annotate(
+        calls=Count('id'),
+        errors=Count('id', filter=~Q(outcome='ok')),
+        prompt_tokens=Sum('prompt_tokens'),
+        completion_tokens=Sum('completion_tokens'),
+        avg_wall_ms=Avg('wall_ms'),
+        avg_ttft_ms=Avg('ttft_ms'),
+        distinct_prompts=Count('prompt_hash', distinct=True),
+    ).order_by('endpoint', 'model')
+
+    # Percentiles are not portable SQL aggregates; compute them per group
+    latencies = {}
+    for endpoint, model, wall_ms in records.filter(outcome='ok').values_list('endpoint', 'model', 'wall_ms'):
+        latencies.setdefault((endpoint, model), []).append(wall_ms)
+
+    result = []
+    for group in groups:
+        ordered = sorted(latencies.get((group['endpoint'], group['model']), []))
+        calls = group['calls']
+        result.append({
+            'endpoint': group['endpoint'],
+            'model': group['model'],
+            'calls': calls,
+            'errors': group['errors'],
+            'error_rate': round(group['errors'] / calls, 3) if calls else 0,
+            'prompt_tokens': group['prompt_tokens'] or 0,
+            'completion_tokens': group['completion_tokens'] or 0,
+            'avg_wall_ms': round(group['avg_wall_ms']) if group['avg_wall_ms'] is not None else None,
+            'p50_wall_ms': _percentile(ordered, 50),
+            'p95_wall_ms': _percentile(ordered, 95),
+            'avg_ttft_ms': round(group['avg_ttft_ms']) if group['avg_ttft_ms'] is not None else None,
+            # Share of calls whose exact prompt was already sent in the window
+            'repeat_prompt_ratio': round((calls - group['distinct_prompts']) / calls, 3) if calls else 0,
+        })
+    return result
@@ -0,0 +1,309 @@
+"""
+Latency-aware model router for the Groq chat models
+Tracks per-model success rates and latencies, skips models whose circuit is open
+and can optionally hedge a second model once the first one runs past its p95
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from django.db import close_old_connections
+
+
+class CircuitOpenError(Exception):
+    """Raised when every model is unavailable and nothing could be tried"""
+
+
+class ModelHealth:
+    """Rolling health record for a single model"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, model: str, window: int):
+        self.model = model
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.last_error = None
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Latency percentile (seconds) over the successful calls in the window"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def success_rate(self) -> Optional[float]:
+        if not self.outcomes:
+            return None
+        return sum(self.outcomes) / len(self.outcomes)
+
+
+class ModelRouter:
+    """
+    Routes a call across an ordered list of models
+
+    Args:
+        models: Models in order of preference (primary first)
+        failure_threshold: Consecutive failures that open a model's circuit
+        recovery_timeout: Seconds an open circuit waits before allowing one trial call
+        window: Number of recent calls kept per model for rates and percentiles
+        hedge: Start the next model if the current one runs past its p95 latency
+        hedge_min_samples: Successful calls needed before the p95 is trusted for hedging
+        fallback_timeout: Seconds a fallback gets when the models tried before it spent the budget
+    """
+
+    def __init__(
+        self,
+        models: List[str],
+        failure_threshold: int = 3,
+        recovery_timeout: float = 30,
+        window: int = 100,
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+        fallback_timeout: float = 5,
+    ):
+        # Keep order but drop duplicates (AI_MODEL is usually also a fallback)
+        self.models = list(dict.fromkeys(models))
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.fallback_timeout = fallback_timeout
+        self._health = {m: ModelHealth(m, window) for m in self.models}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='ai-hedge') if hedge else None
+
+    # ---------- circuit bookkeeping ----------
+
+    def _acquire(self, model: str) -> bool:
+        """Return True if a call to this model is allowed right now"""
+        health = self._health[model]
+        with self._lock:
+            if health.state == ModelHealth.CLOSED:
+                return True
+            if health.state == ModelHealth.OPEN:
+                if time.monotonic() - health.opened_at < self.recovery_timeout:
+                    return False
+                health.state = ModelHealth.HALF_OPEN
+            # Half-open: only one trial call at a time
+            if health.trial_in_flight:
+                return False
+            health.trial_in_flight = True
+            return True
+
+    def record_success(self, model: str, latency: float):
+        health = self._health[model]
+        with self._lock:
+            health.latencies.append(latency)
+            health.outcomes.append(1)
+            health.consecutive_failures = 0
+            health.state = ModelHealth.CLOSED
+            health.opened_at = None
+            health.trial_in_flight = False
+
+    def record_failure(self, model: str, error: Exception):
+        health = self._health[model]
+        with self._lock:
+            health.outcomes.append(0)
+            health.consecutive_failures += 1
+            health.last_error = str(error)
+            health.trial_in_flight = False
+            if health.state == ModelHealth.HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                health.state = ModelHealth.OPEN
+                health.opened_at = time.monotonic()
+
+    def _release(self, model: str):
+        """Forget an unfinished half-open trial (e.g. the client went away mid-stream)"""
+        with self._lock:
+            self._health[model].trial_in_flight = False
+
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        health = self._health[model]
+        if len(health.latencies) < self.hedge_min_samples:
+            return None
+        return health.percentile(95)
+
+    # ---------- calling ----------
+
+    def _attempt(self, fn: Callable, model: str, timeout: float):
+        started = time.monotonic()
+        try:
+            result = fn(model, timeout)
+        except Exception as e:
+            self.record_failure(model, e)
+            raise
+        self.record_success(model, time.monotonic() - started)
+        return result
+
+    def _hedged_attempt(self, fn: Callable, model: str, timeout: float):
+        """_attempt on an executor thread: its DB connection (metering) is closed afterwards"""
+        try:
+            return self._attempt(fn, model, timeout)
+        finally:
+            close_old_connections()
+
+    def call(self, fn: Callable[[str, float], object], timeout: float):
+        """
+        Call fn(model, timeout) on the best available model
+
+        The timeout is a budget for the whole call; once it is spent, one
+        more model still gets fallback_timeout, so a primary that times out
+        does not rule out the fallback.
+
+        Raises:
+            CircuitOpenError: If every model's circuit is open
+            Exception: The last model error if every attempt failed
+        """
+        deadline = time.monotonic() + timeout
+        last_error = None
+        tried = extended = False
+        pending = [m for m in self.models]
+
+        while pending:
+            model = pending.pop(0)
+            remaining = deadline - time.monotonic()
+            # A primary that timed out has spent the whole budget: one fallback
+            # still gets its own fallback_timeout
+            overtime = tried and remaining < self.fallback_timeout
+            if (overtime and extended) or (not tried and remaining <= 0):
+                break
+            if not self._acquire(model):
+                continue
+            if overtime:
+                remaining, extended = self.fallback_timeout, True
+            tried = True
+
+            delay = self._hedge_delay(model) if self.hedge else None
+            if delay is None or delay >= remaining:
+                try:
+                    return self._attempt(fn, model, remaining)
+                except Exception as e:
+                    last_error = e
+                    continue
+
+            # Hedged call: give the model its p95, then race the next one
+            futures = {self._executor.submit(self._hedged_attempt, fn, model, remaining): model}
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                backup = next((m for m in pending if self._acquire(m)), None)
+                if backup is not None:
+                    pending.remove(backup)
+                    backup_timeout = max(deadline - time.monotonic(), self.fallback_timeout)
+                    deadline = max(deadline, time.monotonic() + backup_timeout)
+                    futures[self._executor.submit(self._hedged_attempt, fn, backup, backup_timeout)] = backup
+            while futures:
+                done, _ = wait(futures, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    futures.pop(future)
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        last_error = e
+
+        if not tried:
+            raise CircuitOpenError('All AI models are temporarily unavailable')
+        if last_error is None:
+            last_error = TimeoutError(f'No model answered within {timeout}s')
+        raise last_error
+
+    def stream(self, fn: Callable[[str, float], Iterable], timeout: float) -> Iterator:
+        """
+        Stream chunks from fn(model, timeout) on the best available model
+
+        Falls back to the next model only while nothing has been received yet
+        (with the same fallback_timeout slice as call); once the first chunk
+        arrives the stream is committed to that model.
+        """
+        deadline = time.monotonic() + timeout
+        last_error = None
+        tried = extended = False
+
+        for model in self.models:
+            remaining = deadline - time.monotonic()
+            # Same fallback slice as call()
+            overtime = tried and remaining < self.fallback_timeout
+            if (overtime and extended) or (not tried and remaining <= 0):
+                break
+            if not self._acquire(model):
+                continue
+            if overtime:
+                remaining, extended = self.fallback_timeout, True
+            tried = True
+
+            started = time.monotonic()
+            try:
+                chunks = iter(fn(model, remaining))
+                first = next(chunks, None)
+            except Exception as e:
+                self.record_failure(model, e)
+                last_error = e
+                continue
+
+            finished = False
+            try:
+                if first is not None:
+                    yield first
+                for chunk in chunks:
+                    yield chunk
+                finished = True
+            except Exception as e:
+                self.record_failure(model, e)
+                raise
+            finally:
+                if finished:
+                    self.record_success(model, time.monotonic() - started)
+                else:
+                    self._release(model)
+            return
+
+        if not tried:
+            raise CircuitOpenError('All AI models are temporarily unavailable')
+        if last_error is None:
+            last_error = TimeoutError(f'No model answered within {timeout}s')
+        raise last_error
+
+    # ---------- introspection ----------
+
+    def snapshot(self) -> Dict[str, object]:
+        """Current state of every model, for the introspection endpoint"""
+        now = time.monotonic()
+        models = []
+        with self._lock:
+            for model in self.models:
+                health = self._health[model]
+                p50 = health.percentile(50)
+                p95 = health.percentile(95)
+                success_rate = health.success_rate()
+                models.append({
+                    'model': model,
+                    'state': health.state,
+                    'calls': len(health.outcomes),
+                    'success_rate': round(success_rate, 3) if success_rate is not None else None,
+                    'p50_ms': round(p50 * 1000) if p50 is not None else None,
+                    'p95_ms': round(p95 * 1000) if p95 is not None else None,
+                    'consecutive_failures': health.consecutive_failures,
+                    'retry_in_s': (
+                        max(0, round(self.recovery_timeout - (now - health.opened_at), 1))
+                        if health.state == ModelHealth.OPEN else None
+                    ),
+                    'last_error': health.last_error,
+                })
+        return {
+            'hedge': self.hedge,
+            'failure_threshold': self.failure_threshold,
+            'recovery_timeout': self.recovery_timeout,
+            'fallback_timeout': self.fallback_timeout,
+            'models': models,
+        }
@@ -6,15 +6,21 @@ Uses Llama 3.1 for intelligent, context-aware comment generation
 import os
 from openai import OpenAI
 from dotenv import load_dotenv
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple
+from .ai_router import ModelRouter
+from .ai_singleflight import coalesce
+from .ai_metering import CallMeter
+from .ai_streaming import TutorialSectionParser, stream_text
+from .timing import timed
 
 # Load environment variables
 load_dotenv()
 
 # Initialize Groq client (uses OpenAI-compatible API)
+# GROQ_BASE_URL can point at any OpenAI-compatible server (e.g. `manage.py fake_llm_server`)
 client = OpenAI(
     api_key=os.getenv('GROQ_API_KEY'),
-    base_url='https://api.groq.com/openai/v1'
+    base_url=os.getenv('GROQ_BASE_URL', 'https://api.groq.com/openai/v1')
 )
 
 # Get model from environment or use default
@@ -27,7 +33,19 @@ FALLBACK_MODELS = [
     'mixtral-8x7b-32768',        # Good alternative
 ]
 
+# Router replaces the sequential fallback loop: failing models are skipped
+# while their circuit is open instead of eating the timeout on every request
+router = ModelRouter(
+    [AI_MODEL] + FALLBACK_MODELS,
+    failure_threshold=int(os.getenv('AI_CIRCUIT_FAILURES', '3')),
+    recovery_timeout=float(os.getenv('AI_CIRCUIT_RECOVERY', '30')),
+    hedge=os.getenv('AI_HEDGE', 'False') == 'True',
+    fallback_timeout=float(os.getenv('AI_FALLBACK_TIMEOUT', '5')),
+)
+
 
+@timed('ai')
+@coalesce('comment_suggestions')
 def generate_comment_suggestions(
     artwork_title: str,
     artwork_description: str,
@@ -80,46 +98,42 @@ Style: {artwork_style}
 
 Write natural, simple comments. One per line, no numbering."""
 
-    # Try primary model first, then fallbacks
-    models_to_try = [AI_MODEL] + [m for m in FALLBACK_MODELS if m != AI_MODEL]
-    last_error = None
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
     
-    for model in models_to_try:
-        try:
-            # Call Groq API
+    def call_model(model: str, attempt_timeout: float) -> List[str]:
+        # Call Groq API
+        with CallMeter('comment_suggestions', model, messages) as meter:
             response = client.chat.completions.create(
                 model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=messages,
                 temperature=0.8,  # Higher temperature for more creative/diverse suggestions
                 max_tokens=300,
-                timeout=timeout
+                timeout=attempt_timeout
             )
-            
-            # Extract suggestions from response
-            suggestions_text = response.choices[0].message.content.strip()
-            
-            # Split into individual suggestions and clean them
-            suggestions = [
-                line.strip().lstrip('123456789.-•*) ').strip('"')
-                for line in suggestions_text.split('\n')
-                if line.strip() and len(line.strip()) > 10
-            ]
-            
-            # Return requested number of suggestions
-            return suggestions[:num_suggestions]
+            meter.set_usage(response.usage)
+        
+        # Extract suggestions from response
+        suggestions_text = response.choices[0].message.content.strip()
+        
+        # Split into individual suggestions and clean them
+        suggestions = [
+            line.strip().lstrip('123456789.-•*) ').strip('"')
+            for line in suggestions_text.split('\n')
+            if line.strip() and len(line.strip()) > 10
+        ]
         
-        except Exception as e:
-            last_error = e
-            print(f"Model {model} failed: {str(e)}")
-            # Continue to next model
-            continue
+        # Return requested number of suggestions
+        return suggestions[:num_suggestions]
     
-    # If all models failed, raise the last error
-    print(f"All models failed. Last error: {str(last_error)}")
-    raise Exception(f"Failed to generate suggestions: {str(last_error)}")
+    # Primary model first, then fallbacks - models with an open circuit are skipped
+    try:
+        return router.call(call_model, timeout=timeout)
+    except Exception as e:
+        print(f"All models failed. Last error: {str(e)}")
+        raise Exception(f"Failed to generate suggestions: {str(e)}")
 
 
 def generate_quick_suggestions(artwork_data: Dict) -> List[str]:
@@ -140,34 +154,12 @@ def generate_quick_suggestions(artwork_data: Dict) -> List[str]:
     )
 
 
-def generate_tutorial(
-    topic: str,
-    skill_level: str = 'beginner',
-    language: str = 'en',
-    timeout: int = 30
-) -> Dict[str, any]:
+def build_tutorial_prompts(topic: str, skill_level: str, language: str) -> Tuple[str, str]:
     """
-    Generate AI-powered art tutorial
-    
-    Args:
-        topic: The tutorial topic (e.g., "portrait drawing", "color mixing")
-        skill_level: Target skill level - 'beginner', 'intermediate', or 'advanced'
-        language: Tutorial language - 'en' (English), 'ar' (Arabic), or 'fr' (French)
-        timeout: API timeout in seconds (default: 30)
+    Build the system and user prompts for a tutorial
     
     Returns:
-        Dictionary containing tutorial data:
-        {
-            'title': str,
-            'introduction': str,
-            'materials': List[str],
-            'steps': List[Dict[str, str]],
-            'tips': List[str],
-            'conclusion': str
-        }
-    
-    Raises:
-        Exception: If API call fails or times out
+        (system_prompt, user_prompt)
     """
     
     # Language configuration
@@ -237,53 +229,148 @@ LANGUAGE: Write everything in {lang_config['name']}.
 Make this tutorial worthy of a professional art school curriculum.
 Respond ONLY with valid JSON, no additional text."""
 
-    # Try primary model first, then fallbacks
-    models_to_try = [AI_MODEL] + [m for m in FALLBACK_MODELS if m != AI_MODEL]
-    last_error = None
+    return system_prompt, user_prompt
+
+
+@timed('ai')
+@coalesce('tutorial', folded=('skill_level', 'language'))
+def generate_tutorial(
+    topic: str,
+    skill_level: str = 'beginner',
+    language: str = 'en',
+    timeout: int = 30
+) -> Dict[str, any]:
+    """
+    Generate AI-powered art tutorial
     
-    for model in models_to_try:
-        try:
-            # Call Groq API
+    Args:
+        topic: The tutorial topic (e.g., "portrait drawing", "color mixing")
+        skill_level: Target skill level - 'beginner', 'intermediate', or 'advanced'
+        language: Tutorial language - 'en' (English), 'ar' (Arabic), or 'fr' (French)
+        timeout: API timeout in seconds (default: 30)
+    
+    Returns:
+        Dictionary containing tutorial data:
+        {
+            'title': str,
+            'introduction': str,
+            'materials': List[str],
+            'steps': List[Dict[str, str]],
+            'tips': List[str],
+            'conclusion': str
+        }
+    
+    Raises:
+        Exception: If API call fails or times out
+    """
+    
+    system_prompt, user_prompt = build_tutorial_prompts(topic, skill_level, language)
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    
+    def call_model(model: str, attempt_timeout: float) -> Dict[str, any]:
+        # Call Groq API
+        with CallMeter('tutorial', model, messages) as meter:
             response = client.chat.completions.create(
                 model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=messages,
                 temperature=0.8,  # Higher creativity for more detailed content
                 max_tokens=4000,  # Increased for detailed tutorials
-                timeout=timeout
+                timeout=attempt_timeout
             )
-            
-            # Extract and parse JSON response
-            import json
-            tutorial_text = response.choices[0].message.content.strip()
-            
-            # Remove markdown code blocks if present
-            if tutorial_text.startswith('```'):
-                tutorial_text = tutorial_text.split('```')[1]
-                if tutorial_text.startswith('json'):
-                    tutorial_text = tutorial_text[4:]
-                tutorial_text = tutorial_text.strip()
-            
-            tutorial_data = json.loads(tutorial_text)
-            
-            # Add metadata
-            tutorial_data['topic'] = topic
-            tutorial_data['skill_level'] = skill_level
-            tutorial_data['language'] = language
-            tutorial_data['generated_by'] = 'AI'
-            
-            return tutorial_data
+            meter.set_usage(response.usage)
+        
+        # Extract and parse JSON response
+        import json
+        tutorial_text = response.choices[0].message.content.strip()
         
-        except Exception as e:
-            last_error = e
-            print(f"Model {model} failed for tutorial generation: {str(e)}")
-            continue
+        # Remove markdown code blocks if present
+        if tutorial_text.startswith('```'):
+            tutorial_text = tutorial_text.split('```')[1]
+            if tutorial_text.startswith('json'):
+                tutorial_text = tutorial_text[4:]
+            tutorial_text = tutorial_text.strip()
+        
+        tutorial_data = json.loads(tutorial_text)
+        
+        # Add metadata
+        tutorial_data['topic'] = topic
+        tutorial_data['skill_level'] = skill_level
+        tutorial_data['language'] = language
+        tutorial_data['generated_by'] = 'AI'
+        
+        return tutorial_data
+    
+    # Primary model first, then fallbacks - models with an open circuit are skipped
+    try:
+        return router.call(call_model, timeout=timeout)
+    except Exception as e:
+        print(f"All models failed for tutorial. Last error: {str(e)}")
+        raise Exception(f"Failed to generate tutorial: {str(e)}")
+
+
+def stream_tutorial(
+    topic: str,
+    skill_level: str = 'beginner',
+    language: str = 'en',
+    timeout: int = 30
+) -> Iterator[Tuple[str, Dict[str, any]]]:
+    """
+    Stream an AI-powered art tutorial as it is generated
+    
+    Yields (event, data) pairs:
+        ('token', {'text': str})              - every model token
+        ('section', {'key': str, 'value': ...}) - each completed top-level field
+        ('step', {...})                        - each completed entry of 'steps'
+        ('done', {tutorial})                   - the full tutorial, same shape as generate_tutorial
+    
+    Raises:
+        Exception: If no model could start streaming or the stream breaks
+    """
+    import json
+    
+    system_prompt, user_prompt = build_tutorial_prompts(topic, skill_level, language)
+    
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    
+    def open_stream(model: str, attempt_timeout: float):
+        return stream_text(lambda: client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.8,
+            max_tokens=4000,
+            timeout=attempt_timeout,
+            stream=True
+        ), CallMeter('tutorial_stream', model, messages))
+    
+    parser = TutorialSectionParser()
+    for delta in router.stream(open_stream, timeout=timeout):
+        yield 'token', {'text': delta}
+        for kind, key, value in parser.feed(delta):
+            if kind == 'step':
+                yield 'step', value
+            else:
+                yield 'section', {'key': key, 'value': value}
+    
+    tutorial_text = parser.text.strip()
+    if tutorial_text.startswith('```'):
+        tutorial_text = tutorial_text.split('```')[1]
+        if tutorial_text.startswith('json'):
+            tutorial_text = tutorial_text[4:]
+        tutorial_text = tutorial_text.strip()
     
-    # If all models failed, raise the last error
-    print(f"All models failed for tutorial. Last error: {str(last_error)}")
-    raise Exception(f"Failed to generate tutorial: {str(last_error)}")
+    tutorial_data = json.loads(tutorial_text)
+    tutorial_data['topic'] = topic
+    tutorial_data['skill_level'] = skill_level
+    tutorial_data['language'] = language
+    tutorial_data['generated_by'] = 'AI'
+    yield 'done', tutorial_data
 
 
 def get_tutorial_categories() -> List[Dict[str, str]]:
@@ -0,0 +1,253 @@
+"""
+Single-flight coalescing for AI generation calls
+Concurrent callers asking for the same thing share one upstream call:
+threads in a worker wait on the leader's result, and other gunicorn workers
+wait on a file lock in a shared local directory and pick up the result file
+the leader writes (or its error, which they raise instead of calling
+upstream again)
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within the process only
+    fcntl = None
+
+
+SINGLEFLIGHT_DIR = os.getenv(
+    'AI_SINGLEFLIGHT_DIR',
+    os.path.join(tempfile.gettempdir(), 'artgallery-singleflight')
+)
+# Longest time a follower waits for the leader before calling upstream itself
+SINGLEFLIGHT_WAIT = float(os.getenv('AI_SINGLEFLIGHT_WAIT', '60'))
+# Seconds between two sweeps of the directory
+SINGLEFLIGHT_PRUNE_INTERVAL = 60
+
+
+class SharedCallError(Exception):
+    """The leader of a coalesced call (in another worker) failed"""
+
+
+def normalise(value):
+    """Case- and whitespace-insensitive form of an enum-like argument (skill level, language...)"""
+    if isinstance(value, str):
+        return ' '.join(value.lower().split())
+    return value
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Shares one execution of fn among concurrent callers with the same key"""
+
+    def __init__(self, directory: str = SINGLEFLIGHT_DIR, wait_timeout: float = SINGLEFLIGHT_WAIT):
+        self.directory = directory
+        self.wait_timeout = wait_timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._pruned_at = time.monotonic()
+
+    def make_key(self, namespace: str, arguments: dict, folded=()) -> str:
+        """
+        Key of a call; only the `folded` arguments are compared case- and
+        whitespace-insensitively: free text (titles, topics) reaches the
+        prompt as is, so it must match exactly
+        """
+        payload = json.dumps(
+            [namespace, {k: normalise(v) if k in folded else v for k, v in arguments.items()}],
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def do(self, key: str, fn):
+        # Coalesce threads of this worker
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(self.wait_timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            return fn()
+
+        try:
+            call.result = self._do_shared(key, fn)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    # ---------- cross-worker ----------
+
+    def _do_shared(self, key: str, fn):
+        """Coalesce with other processes through a lock file and a result file"""
+        if fcntl is None:
+            return fn()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError:
+            return fn()
+
+        result_path = os.path.join(self.directory, f'{key}.json')
+        started = time.time()
+        lock_file = self._acquire(os.path.join(self.directory, f'{key}.lock'))
+        if lock_file is None:
+            return fn()
+        try:
+            # Somebody finished the same call while we were waiting for the lock
+            shared = self._read_result(result_path, since=started)
+            if shared is not None:
+                if 'error' in shared:
+                    raise SharedCallError(shared['error'])
+                return shared['result']
+
+            try:
+                result = fn()
+            except Exception as e:
+                self._write_result(result_path, {'error': str(e)})
+                raise
+            self._write_result(result_path, {'result': result})
+            return result
+        finally:
+            lock_file.close()  # releases the flock
+            self._maybe_prune()
+
+    def _acquire(self, path: str):
+        """The lock file, opened and flocked; None on timeout or error"""
+        deadline = time.monotonic() + self.wait_timeout
+        lock_file = None
+        try:
+            while True:
+                if lock_file is None:
+                    lock_file = open(path, 'a+')
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        lock_file.close()
+                        return None
+                    time.sleep(0.05)
+                    continue
+                # The pruner may have removed the file between open and flock:
+                # a lock on an unlinked file excludes nobody
+                if _same_file(lock_file, path):
+                    return lock_file
+                lock_file.close()
+                lock_file = None
+        except OSError:
+            if lock_file is not None:
+                lock_file.close()
+            return None
+
+    def _read_result(self, path: str, since: float):
+        try:
+            if os.path.getmtime(path) < since:
+                return None
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_result(self, path: str, outcome: dict):
+        try:
+            payload = json.dumps(outcome)
+        except TypeError:
+            return  # not shareable across processes, threads still got it
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def _maybe_prune(self):
+        with self._lock:
+            if time.monotonic() - self._pruned_at < SINGLEFLIGHT_PRUNE_INTERVAL:
+                return
+            self._pruned_at = time.monotonic()
+        self.prune()
+
+    def prune(self):
+        """
+        Remove the files no caller can use any more. A result is only read by
+        followers that started waiting before it was written, i.e. within
+        wait_timeout. flock never touches the mtime of a lock file, so a lock
+        file is only removed while we hold it ourselves (nobody else does).
+        """
+        cutoff = time.time() - self.wait_timeout
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.name.endswith('.lock'):
+                    self._remove_idle_lock(entry.path)
+                elif entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _remove_idle_lock(self, path: str):
+        with open(path, 'a+') as lock_file:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # a leader is running
+            if _same_file(lock_file, path):
+                os.remove(path)
+
+
+def _same_file(opened, path: str) -> bool:
+    try:
+        return os.fstat(opened.fileno()).st_ino == os.stat(path).st_ino
+    except OSError:
+        return False
+
+
+singleflight = SingleFlight()
+
+
+def coalesce(namespace: str, folded=()):
+    """
+    Decorator: concurrent calls with the same arguments share one execution;
+    the `folded` arguments (enum-like values) ignore case and whitespace
+
+    Example:
+        @coalesce('tutorial', folded=('skill_level', 'language'))
+        def generate_tutorial(topic, skill_level='beginner', ...): ...
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = singleflight.make_key(namespace, bound.arguments, folded)
+            return singleflight.do(key, lambda: func(*args, **kwargs))
+
+        return wrapper
+    return decorator
@@ -0,0 +1,142 @@
+"""
+Helpers for streaming AI output to the client as Server-Sent Events
+"""
+
+import json
+from typing import Iterator, List, Tuple
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class TutorialSectionParser:
+    """
+    Incremental parser for the tutorial JSON as it streams in
+
+    Feed it text deltas; it returns the top-level sections that became complete
+    ('introduction', 'tips', ...) and every entry of 'steps' as soon as its
+    closing brace arrives, without waiting for the whole document.
+
+    Example:
+        parser = TutorialSectionParser()
+        for delta in deltas:
+            for kind, key, value in parser.feed(delta):
+                ...  # ('section', 'introduction', '...') or ('step', 'steps', {...})
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.expect_key = False
+        self.key_start = None
+        self.current_key = None
+        self.value_start = None
+        self.awaiting_value = False
+        self.item_start = None
+        self.finished = False
+
+    def feed(self, delta: str) -> List[Tuple[str, str, object]]:
+        self.text += delta
+        events = []
+        text = self.text
+
+        while self.pos < len(text) and not self.finished:
+            i = self.pos
+            ch = text[i]
+            self.pos += 1
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.key_start is not None:
+                        self.current_key = self._load(self.key_start, i + 1)
+                        self.key_start = None
+                    elif self.depth == 1 and self.value_start is not None:
+                        self._emit_section(events, i + 1)
+                continue
+
+            # Ignore anything (e.g. a ```json fence) before the opening brace
+            if self.depth == 0 and ch != '{':
+                continue
+
+            if self.awaiting_value and not ch.isspace():
+                self.awaiting_value = False
+                self.value_start = i
+
+            if ch == '"':
+                self.in_string = True
+                if self.depth == 1 and self.expect_key:
+                    self.expect_key = False
+                    self.key_start = i
+            elif ch in '{[':
+                if ch == '{' and self.depth == 2 and self.current_key == 'steps':
+                    self.item_start = i
+                self.depth += 1
+                if self.depth == 1:
+                    self.expect_key = True
+            elif ch in '}]':
+                if self.depth == 1:
+                    # End of a primitive value right before the closing brace
+                    if self.value_start is not None:
+                        self._emit_section(events, i)
+                    self.finished = True
+                self.depth -= 1
+                if self.depth == 2 and self.item_start is not None:
+                    events.append(('step', 'steps', self._load(self.item_start, i + 1)))
+                    self.item_start = None
+                elif self.depth == 1 and self.value_start is not None:
+                    self._emit_section(events, i + 1)
+            elif ch == ':' and self.depth == 1:
+                self.awaiting_value = True
+            elif ch == ',' and self.depth == 1:
+                if self.value_start is not None:
+                    self._emit_section(events, i)
+                self.expect_key = True
+
+        return events
+
+    def _load(self, start: int, end: int):
+        try:
+            return json.loads(self.text[start:end])
+        except ValueError:
+            return self.text[start:end].strip()
+
+    def _emit_section(self, events: list, end: int):
+        key = self.current_key
+        # Steps were already sent one by one
+        if key != 'steps':
+            events.append(('section', key, self._load(self.value_start, end)))
+        self.value_start = None
+
+
+def stream_text(create, meter) -> Iterator[str]:
+    """
+    Yield the text deltas of an OpenAI-style chat completion stream
+
+    `create` opens the stream; it is only called once iteration starts, so
+    connection errors surface (and are metered) on the first next().
+    """
+    with meter:
+        for chunk in create():
+            # OpenAI puts usage on the last chunk, Groq under x_groq
+            groq = getattr(chunk, 'x_groq', None)
+            usage = getattr(chunk, 'usage', None) or (
+                groq.get('usage') if isinstance(groq, dict) else getattr(groq, 'usage', None)
+            )
+            if usage:
+                meter.set_usage(usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                meter.first_token()
+                yield delta
@@ -0,0 +1,240 @@
+"""
+Opt-in allocation profiling (tracemalloc)
+AllocationProfilerMiddleware profiles a sample of requests
+(ALLOC_PROFILER_SAMPLE_RATE) and every request sending
+`X-Alloc-Profile: <ALLOC_PROFILER_TOKEN>`. For each one it stores an
+AllocationProfile: peak and retained Python memory, growth of the process's
+peak RSS and the biggest allocation sites, tagged with the view and the
+deploy (RELEASE). `deploy_comparison` powers the admin endpoint.
+
+tracemalloc only sees allocations made through Python's allocator: the pixel
+buffers of Pillow do not appear in the sites, only in the RSS growth. Tracing
+is process-wide, so a concurrent request of the same worker (threads) adds to
+the figures; one request per process is profiled at a time.
+"""
+
+import os
+import random
+import sysconfig
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+from .metrics import view_label
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+HEADER = 'X-Alloc-Profile'
+# Profiles older than this are pruned; long enough to span several deploys
+ALLOC_PROFILE_RETENTION = timedelta(days=int(os.getenv('ALLOC_PROFILE_RETENTION_DAYS', '90')))
+# Prune once every N profiles
+PRUNE_EVERY = 100
+
+# The profiler's own allocations and lazy imports (first request of a worker)
+# are not sites of the view
+IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap*>', all_frames=True),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+STDLIB = sysconfig.get_paths()['stdlib']
+
+_profiling = threading.Lock()
+_writes = 0
+_writes_lock = threading.Lock()
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    # KiB on Linux (bytes on macOS, where the figure is only indicative)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _frame(frame):
+    base_dir = str(settings.BASE_DIR)
+    filename = frame.filename
+    if filename.startswith(base_dir):
+        filename = filename[len(base_dir) + 1:]
+    elif 'site-packages' in filename:
+        filename = filename.split('site-packages', 1)[1].lstrip(os.sep)
+    elif filename.startswith(STDLIB):
+        filename = filename[len(STDLIB) + 1:]
+    return f'{filename}:{frame.lineno}'
+
+
+def _is_project(frame):
+    return frame.filename.startswith(str(settings.BASE_DIR)) and 'site-packages' not in frame.filename
+
+
+def site(traceback):
+    """
+    Innermost frame of an allocation, followed by the innermost project frame
+    that led to it when they differ (json.dumps <- views.py:210)
+    """
+    innermost = traceback[-1]
+    label = _frame(innermost)
+    if not _is_project(innermost):
+        caller = next((frame for frame in reversed(traceback) if _is_project(frame)), None)
+        if caller is not None:
+            label += f' <- {_frame(caller)}'
+    return label
+
+
+def top_sites(before, after, limit):
+    """[{site, size, count}] of the memory allocated between two snapshots, largest first"""
+    sites = {}
+    for stat in after.filter_traces(IGNORED).compare_to(before.filter_traces(IGNORED), 'traceback'):
+        if stat.size_diff <= 0:
+            continue
+        row = sites.setdefault(site(stat.traceback), {'size': 0, 'count': 0})
+        row['size'] += stat.size_diff
+        row['count'] += max(stat.count_diff, 0)
+    ordered = sorted(sites.items(), key=lambda item: -item[1]['size'])[:limit]
+    return [{'site': label, **row} for label, row in ordered]
+
+
+def trigger_for(request):
+    """'header', 'sample' or None (not profiled)"""
+    token = settings.ALLOC_PROFILER_TOKEN
+    if token and request.headers.get(HEADER) == token:
+        return 'header'
+    if settings.ALLOC_PROFILER_SAMPLE_RATE and random.random() < settings.ALLOC_PROFILER_SAMPLE_RATE:
+        return 'sample'
+    return None
+
+
+def record_profile(**fields):
+    """Store one profile; profiling must never break the request"""
+    global _writes
+    from .models import AllocationProfile
+
+    try:
+        AllocationProfile.objects.create(release=settings.RELEASE, **fields)
+        with _writes_lock:
+            _writes += 1
+            prune = _writes % PRUNE_EVERY == 0
+        if prune:
+            AllocationProfile.objects.filter(created_at__lt=timezone.now() - ALLOC_PROFILE_RETENTION).delete()
+    except Exception as e:
+        print(f"Allocation profile error: {str(e)}")
+
+
+class AllocationProfilerMiddleware:
+    """
+    Profile the allocations of sampled or flagged requests (off unless
+    ALLOC_PROFILER_ENABLED). Goes first in MIDDLEWARE: the profiler's
+    overhead then stays out of the Server-Timing and metrics figures.
+    Streaming responses are measured up to the moment the view returns.
+    """
+
+    def __init__(self, get_response):
+        if not settings.ALLOC_PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger = trigger_for(request)
+        if trigger is None or not _profiling.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request, trigger)
+        finally:
+            _profiling.release()
+
+    def profile(self, request, trigger):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(settings.ALLOC_PROFILER_FRAMES)
+        try:
+            before = tracemalloc.take_snapshot()
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            rss_before = _peak_rss_kb()
+            started = time.perf_counter()
+
+            response = self.get_response(request)
+
+            duration = time.perf_counter() - started
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+        rss_after = _peak_rss_kb()
+
+        profile = {
+            'view': view_label(request)[:100],
+            'method': request.method,
+            'path': request.path[:255],
+            'status': response.status_code,
+            'trigger': trigger,
+            'duration_ms': round(duration * 1000),
+            'peak_bytes': peak - baseline,
+            'retained_bytes': current - baseline,
+            'rss_growth_kb': rss_after - rss_before if rss_before is not None else None,
+            'top_sites': top_sites(before, after, settings.ALLOC_PROFILER_TOP),
+        }
+        record_profile(**profile)
+        print(f"[alloc] {profile['method']} {profile['view']}: peak {profile['peak_bytes'] / 1024:.0f} KiB, "
+              f"retained {profile['retained_bytes'] / 1024:.0f} KiB, rss +{profile['rss_growth_kb']} KiB"
+              + ''.join(f"; {row['site']} {row['size'] / 1024:.0f} KiB" for row in profile['top_sites'][:3]))
+        response[HEADER] = f"peak={profile['peak_bytes']}; retained={profile['retained_bytes']}"
+        return response
+
+
+def deploy_comparison(view=None, releases=None, sites=10):
+    """
+    Per (view, release) summary of the stored profiles, newest release first:
+    profile count, average and max peak, average RSS growth, and the
+    allocation sites summed over the profiles
+    """
+    from .models import AllocationProfile
+
+    profiles = AllocationProfile.objects.all()
+    if view:
+        profiles = profiles.filter(view=view)
+    if releases:
+        profiles = profiles.filter(release__in=releases)
+
+    groups = {}
+    for profile in profiles.order_by('created_at').iterator():
+        group = groups.setdefault((profile.view, profile.release), {
+            'view': profile.view, 'release': profile.release, 'profiles': 0,
+            'peaks': [], 'rss': [], 'sites': {}, 'last_seen': None,
+        })
+        group['profiles'] += 1
+        group['peaks'].append(profile.peak_bytes)
+        if profile.rss_growth_kb is not None:
+            group['rss'].append(profile.rss_growth_kb)
+        group['last_seen'] = profile.created_at
+        for row in profile.top_sites:
+            group['sites'][row['site']] = group['sites'].get(row['site'], 0) + row['size']
+
+    result = []
+    for group in sorted(groups.values(), key=lambda group: (group['view'], -group['last_seen'].timestamp())):
+        peaks = group['peaks']
+        result.append({
+            'view': group['view'],
+            'release': group['release'],
+            'profiles': group['profiles'],
+            'last_seen': group['last_seen'].isoformat(),
+            'avg_peak_bytes': round(sum(peaks) / len(peaks)),
+            'max_peak_bytes': max(peaks),
+            'avg_rss_growth_kb': round(sum(group['rss']) / len(group['rss'])) if group['rss'] else None,
+            'top_sites': [
+                {'site': label, 'avg_size': round(size / group['profiles'])}
+                for label, size in sorted(group['sites'].items(), key=lambda item: -item[1])[:sites]
+            ],
+        })
+    return result
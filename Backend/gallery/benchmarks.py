@@ -0,0 +1,275 @@
+"""
+Endpoint benchmarks
+ENDPOINTS says how to call every route of gallery.urls and evaluation.urls
+against a seeded database (gallery/seed.py): method, URL arguments and body
+taken from a Fixture, and who calls it. SKIPPED lists the routes that are not
+measured, with the reason. measure() runs one endpoint in-process with the
+test client and reports latency, query count and response size; requests
+that write are rolled back, so every repetition sees the same data.
+
+Used by the bench_endpoints command.
+"""
+
+import json
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.test import Client
+from django.urls import URLPattern, URLResolver, reverse
+
+from evaluation.models import Evaluation
+from .models import Artwork, Comment, GenerationJob, Report
+from .query_inspector import QueryRecorder
+
+
+ANONYMOUS, USER, STAFF = 'anonymous', 'user', 'staff'
+
+
+class _Rollback(Exception):
+    pass
+
+
+@dataclass
+class Fixture:
+    """Objects of the seeded database the requests point at"""
+    user: User
+    staff: User
+    # The busiest active artwork of `user` (most comments), and one of its comments by `user`
+    artwork: Artwork
+    comment: Comment
+    report: Report
+    evaluation: Evaluation
+    tutorial_job: GenerationJob
+    description_job: GenerationJob
+    password: str = 'secret'
+
+    @classmethod
+    def from_database(cls, password='secret'):
+        """Pick the fixture objects; None if the database has not been seeded"""
+        # A comment the artist wrote on their own artwork: the user can then
+        # both update the artwork and delete the comment
+        comment = (
+            Comment.objects.filter(is_active=True, artwork__is_active=True, user__is_staff=False,
+                                   user__is_active=True, artwork__artist=F('user'))
+            .annotate(artwork_comments=Count('artwork__comments', filter=Q(artwork__comments__is_active=True)))
+            .order_by('-artwork_comments', 'pk').select_related('artwork', 'user').first()
+        )
+        staff = User.objects.filter(is_staff=True, is_active=True).order_by('pk').first()
+        report = Report.objects.filter(resolved=False, artwork__isnull=False).order_by('pk').first()
+        evaluation = Evaluation.objects.order_by('pk').first()
+        tutorial_job = GenerationJob.objects.filter(kind='tutorial').order_by('pk').first()
+        # Only its requester can read a description job
+        description_job = GenerationJob.objects.filter(
+            kind='description', requested_by__is_active=True
+        ).select_related('requested_by').order_by('pk').first()
+        if None in (comment, staff, report, evaluation, tutorial_job, description_job):
+            return None
+        return cls(user=comment.user, staff=staff, artwork=comment.artwork, comment=comment, report=report,
+                   evaluation=evaluation, tutorial_job=tutorial_job, description_job=description_job,
+                   password=password)
+
+
+@dataclass
+class Endpoint:
+    """How to call one route"""
+    name: str
+    method: str = 'GET'
+    # Callers measured; the second one is the authenticated mode
+    auth: tuple = (ANONYMOUS, USER)
+    # Who logs in for USER (default: fixture.user)
+    user: Optional[Callable[[Fixture], User]] = None
+    kwargs: Callable[[Fixture], dict] = lambda fixture: {}
+    query: str = ''
+    # JSON body (or form data when form=True)
+    body: Optional[Callable[[Fixture], dict]] = None
+    form: bool = False
+    # Writes: run in a transaction that is rolled back
+    writes: bool = False
+    # New client (logged in again) for every repetition: the request changes
+    # the session, and a rolled-back session must not be sent again
+    fresh_session: bool = False
+
+    def path(self, fixture):
+        return reverse(self.name, kwargs=self.kwargs(fixture)) + self.query
+
+
+def _staff(name, **options):
+    return Endpoint(name, auth=(ANONYMOUS, STAFF), **options)
+
+
+ENDPOINTS = [
+    # Artworks
+    Endpoint('artworks'),
+    Endpoint('artwork_detail', kwargs=lambda f: {'pk': f.artwork.pk}, writes=True),
+    Endpoint('update_artwork', 'POST', kwargs=lambda f: {'pk': f.artwork.pk}, body=lambda f: {'title': 'Renamed'},
+             form=True, writes=True),
+    Endpoint('toggle_like', 'POST', kwargs=lambda f: {'pk': f.artwork.pk}, writes=True),
+    Endpoint('add_comment', 'POST', kwargs=lambda f: {'pk': f.artwork.pk}, body=lambda f: {'text': 'Lovely'},
+             writes=True),
+    Endpoint('delete_comment', 'DELETE', kwargs=lambda f: {'pk': f.comment.pk}, writes=True),
+    Endpoint('get_description_job', kwargs=lambda f: {'job_id': f.description_job.public_id},
+             user=lambda f: f.description_job.requested_by),
+    # Auth
+    Endpoint('register', 'POST', auth=(ANONYMOUS,), writes=True,
+             body=lambda f: {'username': 'bench_new_user', 'email': 'bench_new_user@example.com', 'password': 'secret'}),
+    Endpoint('login', 'POST', auth=(ANONYMOUS,), writes=True, fresh_session=True,
+             body=lambda f: {'username': f.user.username, 'password': f.password}),
+    Endpoint('logout', 'POST', writes=True, fresh_session=True),
+    Endpoint('check_auth'),
+    Endpoint('profile'),
+    # Users
+    Endpoint('user_profile', kwargs=lambda f: {'username': f.user.username}),
+    # Reports
+    Endpoint('create_report', 'POST', writes=True,
+             body=lambda f: {'reporter_id': f.user.pk, 'artwork_id': f.artwork.pk, 'reason': 'spam'}),
+    _staff('get_reports'),
+    _staff('get_report_targets'),
+    _staff('resolve_report', method='POST', kwargs=lambda f: {'report_id': f.report.pk}, writes=True),
+    _staff('ban_user', method='POST', kwargs=lambda f: {'user_id': f.user.pk}, writes=True),
+    _staff('bulk_resolve_reports', method='POST', body=lambda f: {'ids': [f.report.pk]}, writes=True),
+    # Admin
+    _staff('get_all_users'),
+    _staff('bulk_ban_users', method='POST', body=lambda f: {'user_ids': [f.user.pk]}, writes=True),
+    _staff('bulk_deactivate_content', method='POST', body=lambda f: {'user_ids': [f.user.pk]}, writes=True),
+    _staff('get_admin_stats'),
+    _staff('get_admin_daily_stats'),
+    _staff('get_ai_usage'),
+    _staff('get_slow_queries'),
+    _staff('get_alloc_profiles'),
+    # Categories and tutorials
+    Endpoint('get_categories'),
+    Endpoint('get_tutorial_categories'),
+    Endpoint('get_tutorial_job', kwargs=lambda f: {'job_id': f.tutorial_job.public_id}),
+    _staff('ai_router_status'),
+    _staff('metrics'),
+    # Evaluation
+    Endpoint('api-root'),
+    Endpoint('evaluation-list'),
+    Endpoint('evaluation-detail', kwargs=lambda f: {'pk': f.evaluation.pk}),
+    Endpoint('evaluation-evaluate', 'POST', kwargs=lambda f: {'pk': f.user.pk}, writes=True),
+    Endpoint('evaluation-badge', kwargs=lambda f: {'pk': f.user.pk}),
+    Endpoint('evaluation-leaderboard'),
+    Endpoint('evaluation-my-rank'),
+]
+
+SKIPPED = {
+    'upload_artwork': 'multipart upload, writes image files',
+    'upload_avatar': 'multipart upload, writes image files',
+    'suggest_comments': 'calls the AI provider',
+    'generate_art_technique': 'calls the AI provider',
+    'generate_art_technique_stream': 'calls the AI provider',
+    'generate_description': 'calls the AI provider',
+    'create_description_job': 'queues an AI generation job',
+    'generate_ai_tutorial': 'calls the AI provider',
+    'generate_ai_tutorial_stream': 'calls the AI provider',
+    'create_tutorial_job': 'queues an AI generation job',
+}
+
+
+def route_names(patterns=None):
+    """URL names of gallery.urls (evaluation.urls included), in declaration order"""
+    if patterns is None:
+        from . import urls
+        patterns = urls.urlpatterns
+    names = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names.extend(name for name in route_names(pattern.url_patterns) if name not in names)
+        elif isinstance(pattern, URLPattern) and pattern.name and pattern.name not in names:
+            names.append(pattern.name)
+    return names
+
+
+def unmeasured():
+    """Routes that are neither benchmarked nor skipped on purpose"""
+    covered = {endpoint.name for endpoint in ENDPOINTS} | set(SKIPPED)
+    return [name for name in route_names() if name not in covered]
+
+
+def client_for(auth, fixture, endpoint=None, **defaults):
+    client = Client(raise_request_exception=False, **defaults)
+    if auth == USER:
+        client.force_login(endpoint.user(fixture) if endpoint is not None and endpoint.user else fixture.user)
+    elif auth == STAFF:
+        client.force_login(fixture.staff)
+    return client
+
+
+def send(client, endpoint, fixture):
+    """One request; a writing request is rolled back once the response is read"""
+    path = endpoint.path(fixture)
+    method = getattr(client, endpoint.method.lower())
+    kwargs = {}
+    if endpoint.body is not None:
+        body = endpoint.body(fixture)
+        kwargs = {'data': body} if endpoint.form else {'data': json.dumps(body), 'content_type': 'application/json'}
+
+    if not endpoint.writes:
+        response = method(path, **kwargs)
+        return response, _content(response)
+    try:
+        with transaction.atomic():
+            response = method(path, **kwargs)
+            content = _content(response)
+            raise _Rollback
+    except _Rollback:
+        pass
+    return response, content
+
+
+def _content(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def _percentile(ordered, pct):
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(endpoint, auth, fixture, repeat=5, **client_defaults):
+    """
+    Run `endpoint` 1 + `repeat` times as `auth`: the first (cold) request is
+    reported apart, latency percentiles are over the others
+    """
+    client = client_for(auth, fixture, endpoint, **client_defaults)
+    runs = []
+    for i in range(1 + repeat):
+        if endpoint.fresh_session and i:
+            client = client_for(auth, fixture, endpoint, **client_defaults)
+        with QueryRecorder() as recorder:
+            started = time.perf_counter()
+            response, content = send(client, endpoint, fixture)
+            elapsed = time.perf_counter() - started
+        runs.append((elapsed, len(recorder), response.status_code, len(content)))
+
+    warm = sorted(run[0] for run in runs[1:]) or [runs[0][0]]
+    last = runs[-1]
+    return {
+        'endpoint': endpoint.name,
+        'auth': auth,
+        'method': endpoint.method,
+        'path': endpoint.path(fixture),
+        'status': last[2],
+        'bytes': last[3],
+        'queries': last[1],
+        'queries_cold': runs[0][1],
+        'cold_ms': round(runs[0][0] * 1000, 2),
+        'p50_ms': round(_percentile(warm, 50) * 1000, 2),
+        'p95_ms': round(_percentile(warm, 95) * 1000, 2),
+        'max_ms': round(warm[-1] * 1000, 2),
+    }
+
+
+def run_all(fixture, repeat=5, names=None, **client_defaults):
+    """measure() every endpoint (or those in `names`) for each of its callers"""
+    return [
+        measure(endpoint, auth, fixture, repeat, **client_defaults)
+        for endpoint in ENDPOINTS if not names or endpoint.name in names
+        for auth in endpoint.auth
+    ]
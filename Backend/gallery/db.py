@@ -0,0 +1,88 @@
+"""
+SQLite production profile
+- every new SQLite connection gets the pragmas of settings.SQLITE_PRAGMAS
+  (WAL, synchronous=NORMAL, busy_timeout, mmap_size, cache_size)
+- ReadWriteRouter sends the reads of GET/HEAD requests to the read-only
+  alias (settings.DATABASE_READ_ALIAS, the same file opened with mode=ro);
+  writes, and reads inside a transaction, stay on 'default'
+The bench_sqlite_concurrency command measures the effect of the pragmas.
+"""
+
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# Set by ReadOnlyRequestMiddleware for the duration of a GET/HEAD request
+_read_only_request = ContextVar('read_only_request', default=False)
+
+# Pragmas that change the database file itself: a read-only connection cannot set them
+FILE_PRAGMAS = {'journal_mode'}
+
+
+def is_read_only(settings_dict):
+    return 'mode=ro' in str(settings_dict.get('NAME', ''))
+
+
+def pragma_statements(pragmas, read_only=False):
+    return [
+        f'PRAGMA {name} = {value}'
+        for name, value in pragmas.items()
+        if not (read_only and name in FILE_PRAGMAS)
+    ]
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    read_only = is_read_only(connection.settings_dict)
+    # On the raw connection: not logged as queries, not counted by assertNumQueries
+    for statement in pragma_statements(settings.SQLITE_PRAGMAS, read_only):
+        connection.connection.execute(statement)
+
+
+def read_alias():
+    alias = getattr(settings, 'DATABASE_READ_ALIAS', None)
+    return alias if alias in settings.DATABASES else None
+
+
+class read_only_request:
+    """Route the reads of the enclosed block to the read-only alias"""
+
+    def __enter__(self):
+        self._token = _read_only_request.set(True)
+
+    def __exit__(self, *exc_info):
+        _read_only_request.reset(self._token)
+
+
+class ReadWriteRouter:
+    """
+    Reads of GET/HEAD requests -> the read-only alias, everything else -> default
+
+    A read made while 'default' is inside a transaction stays there so that it
+    sees the transaction's own uncommitted writes (this also keeps TestCase,
+    which wraps every test in a transaction, on a single connection).
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = read_alias()
+        if alias is None or not _read_only_request.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases open the same file
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
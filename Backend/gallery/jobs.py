@@ -0,0 +1,160 @@
+"""
+Durable local job queue for long-running AI generation
+Jobs live in the GenerationJob table; `manage.py run_ai_worker` claims and runs them
+"""
+
+import hashlib
+import json
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .ai_singleflight import normalise
+from .models import GenerationJob
+
+
+# Attempts before a job is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv('AI_JOB_MAX_ATTEMPTS', '3'))
+# A running job older than this is assumed to belong to a dead worker
+JOB_STALE_AFTER = timedelta(seconds=int(os.getenv('AI_JOB_STALE_AFTER', '300')))
+# Delay before retrying a failed attempt, doubled at every attempt; also how
+# long a failed job is returned as is before an identical request queues it again
+JOB_RETRY_DELAY = timedelta(seconds=int(os.getenv('AI_JOB_RETRY_DELAY', '30')))
+# How long identical requests reuse a finished job
+JOB_RESULT_TTL = timedelta(seconds=int(os.getenv('AI_JOB_RESULT_TTL', str(7 * 24 * 3600))))
+
+# Enum-like params, compared case- and whitespace-insensitively; free text
+# (topic, title, category, style) reaches the prompt as is
+FOLDED_PARAMS = {'skill_level', 'language'}
+# Jobs of these kinds belong to their requester and are never shared
+PER_USER_KINDS = {'description'}
+
+
+def input_hash(kind: str, params: dict, user=None) -> str:
+    payload = [kind, {k: normalise(v) if k in FOLDED_PARAMS else v for k, v in params.items()}]
+    if kind in PER_USER_KINDS:
+        payload.append(user.pk if user is not None else None)
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return JOB_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+
+
+def enqueue(kind: str, params: dict, user=None) -> GenerationJob:
+    """
+    Queue a generation job, reusing an identical job that is queued or
+    running, or that finished less than JOB_RESULT_TTL ago
+
+    A job that failed less than JOB_RETRY_DELAY ago is returned as is; after
+    that an identical request queues a new job. Two concurrent requests
+    cannot both queue one (genjob_active_input_uniq): the second gets the
+    first one's job.
+    """
+    requester = user if user is not None and user.is_authenticated else None
+    digest = input_hash(kind, params, requester)
+    now = timezone.now()
+    job = GenerationJob.objects.filter(kind=kind, input_hash=digest).order_by('-created_at').first()
+    if job is not None and (
+        job.status in GenerationJob.ACTIVE_STATUSES
+        or (job.status == 'done' and job.finished_at >= now - JOB_RESULT_TTL)
+        or (job.status == 'failed' and job.finished_at >= now - JOB_RETRY_DELAY)
+    ):
+        return job
+
+    try:
+        with transaction.atomic():
+            return GenerationJob.objects.create(kind=kind, input_hash=digest, params=params, requested_by=requester)
+    except IntegrityError:
+        # An identical request queued it in the meantime
+        same = GenerationJob.objects.filter(kind=kind, input_hash=digest)
+        return same.filter(status__in=GenerationJob.ACTIVE_STATUSES).first() or same.order_by('-created_at').first()
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Put jobs abandoned by a crashed worker back in the queue (those that used
+    up their attempts fail); run periodically by `run_ai_worker`
+    """
+    now = timezone.now()
+    stale = GenerationJob.objects.filter(status='running', started_at__lt=now - JOB_STALE_AFTER)
+    stale.filter(attempts__gte=JOB_MAX_ATTEMPTS).update(
+        status='failed', worker='', error='Worker lost', finished_at=now
+    )
+    return stale.update(status='pending', worker='', run_after=None)
+
+
+def claim_next(worker: str):
+    """
+    Atomically claim the oldest pending job that is due (run_after)
+
+    SQLite has no SELECT ... FOR UPDATE SKIP LOCKED, so the claim is a
+    conditional UPDATE: only one worker can flip a given row from pending.
+    """
+    while True:
+        job_id = (
+            GenerationJob.objects.filter(status='pending')
+            .filter(Q(run_after__isnull=True) | Q(run_after__lte=timezone.now()))
+            .order_by('created_at')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        claimed = GenerationJob.objects.filter(pk=job_id, status='pending').update(
+            status='running', worker=worker, started_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        if claimed:
+            return GenerationJob.objects.get(pk=job_id)
+
+
+def execute(job: GenerationJob):
+    """Run the generation a job describes and return its result"""
+    params = job.params
+    if job.kind == 'tutorial':
+        from .ai_service import generate_tutorial
+        return generate_tutorial(
+            topic=params['topic'],
+            skill_level=params.get('skill_level', 'beginner'),
+            language=params.get('language', 'en'),
+        )
+    if job.kind == 'description':
+        from .ai_description_service import generate_multiple_descriptions
+        return generate_multiple_descriptions(
+            title=params['title'],
+            category=params.get('category'),
+            style=params.get('style'),
+            count=3,
+        )
+    raise ValueError(f"Unknown job kind: {job.kind}")
+
+
+def run_job(job: GenerationJob) -> GenerationJob:
+    """Execute a claimed job and persist its outcome"""
+    try:
+        result = execute(job)
+    except Exception as e:
+        print(f"Generation job {job.pk} failed (attempt {job.attempts}): {str(e)}")
+        job.error = str(e)
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            job.status, job.finished_at = 'failed', timezone.now()
+        else:
+            job.status, job.run_after = 'pending', timezone.now() + retry_delay(job.attempts)
+        job.save(update_fields=['error', 'status', 'finished_at', 'run_after'])
+        return job
+
+    job.result = result
+    job.error = ''
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'error', 'status', 'finished_at'])
+    return job
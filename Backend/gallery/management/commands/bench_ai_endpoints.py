@@ -0,0 +1,143 @@
+"""
+Load benchmark for the AI endpoints of a running server
+
+Usage (against the fake LLM server):
+    python manage.py fake_llm_server --quiet &
+    GROQ_BASE_URL=http://127.0.0.1:8090/openai/v1 gunicorn art_gallery.wsgi -w 4 &
+    python manage.py bench_ai_endpoints --url http://127.0.0.1:8000 --username bench --password secret \
+        --artwork-id 1 --concurrency 16 --requests 200
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+ENDPOINTS = {
+    'suggest_comments': ('POST', '/artworks/{artwork_id}/suggest-comments/', None),
+    'generate_ai_tutorial': ('POST', '/tutorials/generate/', {
+        'topic': 'Shading techniques', 'skill_level': 'beginner', 'language': 'en'
+    }),
+    'generate_description': ('POST', '/artworks/generate-description/', {
+        'title': 'Benchmark sunset', 'category': 'Painting', 'style': 'abstract'
+    }),
+}
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Drive the AI endpoints at a target concurrency and report throughput and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the running server')
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                            help='Endpoint to benchmark (repeatable, default: all)')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=100, help='Requests per endpoint')
+        parser.add_argument('--username', help='User to log in as (needed by suggest_comments and generate_description)')
+        parser.add_argument('--password')
+        parser.add_argument('--artwork-id', type=int, default=1)
+        parser.add_argument('--vary', action='store_true',
+                            help='Make every request body unique so request coalescing does not kick in')
+        parser.add_argument('--timeout', type=float, default=60)
+        parser.add_argument('--json', dest='json_output', help='Also write the results to this JSON file')
+
+    def login(self, base_url, username, password, timeout):
+        """Return session cookies for an authenticated user"""
+        session = requests.Session()
+        response = session.post(f'{base_url}/auth/login/', json={'username': username, 'password': password},
+                                timeout=timeout)
+        if response.status_code != 200:
+            raise CommandError(f'Login failed ({response.status_code}): {response.text[:200]}')
+        return session.cookies.get_dict()
+
+    def run_endpoint(self, name, options, cookies):
+        method, path, body = ENDPOINTS[name]
+        url = options['url'].rstrip('/') + path.format(artwork_id=options['artwork_id'])
+        latencies = []
+        statuses = {}
+        lock = threading.Lock()
+        local = threading.local()
+
+        def one(i):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+                local.session.cookies.update(cookies)
+            payload = dict(body) if body else {}
+            if options['vary'] and payload:
+                first_key = next(iter(payload))
+                payload[first_key] = f'{payload[first_key]} #{i}'
+            started = time.perf_counter()
+            try:
+                response = local.session.request(method, url, data=json.dumps(payload),
+                                                 headers={'Content-Type': 'application/json'},
+                                                 timeout=options['timeout'])
+                status = response.status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(one, range(options['requests'])))
+        wall = time.perf_counter() - started
+
+        latencies.sort()
+        ok = len(latencies)
+        return {
+            'endpoint': name,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'ok': ok,
+            'errors': options['requests'] - ok,
+            'statuses': {str(k): v for k, v in statuses.items()},
+            'wall_s': round(wall, 3),
+            'throughput_rps': round(ok / wall, 2) if wall else None,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1) if ok else None,
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1) if ok else None,
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1) if ok else None,
+            'max_ms': round(latencies[-1] * 1000, 1) if ok else None,
+        }
+
+    def handle(self, *args, **options):
+        endpoints = options['endpoint'] or sorted(ENDPOINTS)
+        base_url = options['url'].rstrip('/')
+        cookies = {}
+        if options['username']:
+            cookies = self.login(base_url, options['username'], options['password'], options['timeout'])
+        elif set(endpoints) & {'suggest_comments', 'generate_description'}:
+            self.stderr.write('No --username given: suggest_comments and generate_description will return 401')
+
+        results = []
+        header = f"{'endpoint':<22}{'ok':>6}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name in endpoints:
+            result = self.run_endpoint(name, options, cookies)
+            results.append(result)
+            self.stdout.write(
+                f"{name:<22}{result['ok']:>6}{result['errors']:>6}"
+                f"{result['throughput_rps'] or 0:>9}"
+                f"{result['p50_ms'] or '-':>10}{result['p95_ms'] or '-':>10}{result['p99_ms'] or '-':>10}"
+            )
+            if result['errors']:
+                self.stdout.write(f"  statuses: {result['statuses']}")
+
+        if options['json_output']:
+            with open(options['json_output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['json_output']}")
@@ -0,0 +1,183 @@
+"""
+End-to-end benchmark of every endpoint (gallery/benchmarks.py) at several
+dataset sizes
+
+For each --scale, a fresh SQLite database and media directory are created in
+a temporary directory, migrated and seeded (seed_gallery --scale), then every
+endpoint is measured in a child process; the JSON report holds latency
+(cold, p50, p95), query count and response size per endpoint and caller.
+
+Usage:
+    python manage.py bench_endpoints --scales 1 5 25 --repeat 10 --json bench.json
+    python manage.py bench_endpoints --scales 1 5 25 --baseline bench.json   # compare with an earlier run
+    python manage.py bench_endpoints --current-database                       # the configured (seeded) database
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+
+from gallery import benchmarks
+
+
+# The instrumentation of production would be measured with the endpoints
+CHILD_ENVIRONMENT = {
+    'DEBUG': 'False',
+    'SERVER_TIMING_LOG': 'False',
+    'METRICS_ENABLED': 'False',
+    'SLOW_QUERY_ENABLED': 'False',
+    'QUERY_INSPECTOR_ENABLED': 'False',
+    'ALLOC_PROFILER_ENABLED': 'False',
+}
+# Relative p50 change reported by --baseline
+LATENCY_TOLERANCE = 0.2
+
+
+class Command(BaseCommand):
+    help = 'Measure latency, query count and response size of every endpoint at several dataset sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=float, nargs='+', default=[1, 5],
+                            help='Dataset sizes, as seed_gallery --scale values (default: 1 5)')
+        parser.add_argument('--repeat', type=int, default=5, help='Warm requests per endpoint (default: 5)')
+        parser.add_argument('--endpoint', action='append', help='Only this URL name (repeatable)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_output', help='Write the report to this file')
+        parser.add_argument('--baseline', help='Earlier report to compare with')
+        parser.add_argument('--current-database', action='store_true',
+                            help='Measure the configured database instead of fresh seeded ones')
+        parser.add_argument('--password', default='secret', help='Password of the seeded users (login endpoint)')
+
+    def handle(self, *args, **options):
+        if options['current_database']:
+            report = {'runs': [self.measure_current(options)]}
+        else:
+            report = {'runs': [self.run_scale(scale, options) for scale in options['scales']]}
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'release': settings.RELEASE,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            **report,
+            'skipped': benchmarks.SKIPPED,
+            'unmeasured': benchmarks.unmeasured(),
+        }
+
+        for run in report['runs']:
+            self.print_run(run)
+        if report['unmeasured']:
+            self.stderr.write(f"No benchmark for: {', '.join(report['unmeasured'])}")
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                self.print_comparison(json.load(f), report)
+        if options['json_output']:
+            with open(options['json_output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['json_output']}")
+
+    def measure_current(self, options):
+        fixture = benchmarks.Fixture.from_database(password=options['password'])
+        if fixture is None:
+            raise CommandError('The database has no seeded data: run manage.py seed_gallery first')
+        # Test client host and in-memory email, as in the test runner
+        setup_test_environment()
+        # Views print request details: keep the command output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = benchmarks.run_all(fixture, repeat=options['repeat'], names=options['endpoint'])
+        return {'scale': None, 'endpoints': results}
+
+    def run_scale(self, scale, options):
+        """Seed a fresh database at `scale` and measure it in a child process"""
+        manage = [sys.executable, str(settings.BASE_DIR / 'manage.py')]
+        with tempfile.TemporaryDirectory(prefix='bench-endpoints-') as directory:
+            env = {
+                **os.environ,
+                **CHILD_ENVIRONMENT,
+                'DATABASE_PATH': os.path.join(directory, 'db.sqlite3'),
+                'MEDIA_ROOT': os.path.join(directory, 'media'),
+                'METRICS_DIR': os.path.join(directory, 'metrics'),
+            }
+            output = os.path.join(directory, 'run.json')
+
+            self.stdout.write(f'Scale {scale:g}: seeding...')
+            started = time.perf_counter()
+            self.child(manage + ['migrate', '--noinput'], env)
+            seed_output = self.child(manage + ['seed_gallery', '--force', '--scale', str(scale),
+                                               '--seed', str(options['seed']), '--password', options['password']], env)
+            seed_seconds = time.perf_counter() - started
+
+            self.stdout.write(f'Scale {scale:g}: measuring...')
+            command = manage + ['bench_endpoints', '--current-database', '--repeat', str(options['repeat']),
+                                '--password', options['password'], '--json', output]
+            for name in options['endpoint'] or []:
+                command += ['--endpoint', name]
+            self.child(command, env)
+            with open(output) as f:
+                run = json.load(f)['runs'][0]
+
+        run['scale'] = scale
+        run['seed_seconds'] = round(seed_seconds, 2)
+        run['dataset'] = [line.strip() for line in seed_output.splitlines() if line.startswith('  ')]
+        return run
+
+    def child(self, command, env):
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f"{' '.join(command[1:3])} failed:\n{result.stdout[-2000:]}{result.stderr[-2000:]}")
+        return result.stdout
+
+    def print_run(self, run):
+        title = 'Current database' if run['scale'] is None else f"Scale {run['scale']:g}"
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        header = f"{'endpoint':<26}{'caller':<11}{'status':>7}{'queries':>9}{'cold ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'bytes':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in run['endpoints']:
+            self.stdout.write(
+                f"{row['endpoint']:<26}{row['auth']:<11}{row['status']:>7}{row['queries']:>9}"
+                f"{row['cold_ms']:>10}{row['p50_ms']:>9}{row['p95_ms']:>9}{row['bytes']:>10}"
+            )
+
+    def print_comparison(self, baseline, report):
+        """Endpoints whose query count, status or p50 (beyond LATENCY_TOLERANCE) changed"""
+        previous = {
+            (run['scale'], row['endpoint'], row['auth']): row
+            for run in baseline['runs'] for row in run['endpoints']
+        }
+        changes = []
+        compared = 0
+        for run in report['runs']:
+            for row in run['endpoints']:
+                before = previous.get((run['scale'], row['endpoint'], row['auth']))
+                if before is None:
+                    continue
+                compared += 1
+                label = f"scale {run['scale']:g} {row['endpoint']} ({row['auth']})" if run['scale'] is not None \
+                    else f"{row['endpoint']} ({row['auth']})"
+                if before['queries'] != row['queries']:
+                    changes.append(f"{label}: {before['queries']} -> {row['queries']} queries")
+                if before['status'] != row['status']:
+                    changes.append(f"{label}: status {before['status']} -> {row['status']}")
+                if before['p50_ms'] and abs(row['p50_ms'] - before['p50_ms']) / before['p50_ms'] > LATENCY_TOLERANCE:
+                    changes.append(f"{label}: p50 {before['p50_ms']} -> {row['p50_ms']} ms")
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Compared with {baseline.get('release')} "
+                                                     f"({baseline.get('generated_at')})"))
+        if not compared:
+            self.stdout.write('  Nothing to compare: no endpoint measured at the same scale')
+        for change in changes or (['No change beyond the tolerance'] if compared else []):
+            self.stdout.write(f'  {change}')
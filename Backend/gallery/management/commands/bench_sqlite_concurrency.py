@@ -0,0 +1,213 @@
+"""
+Concurrency benchmark for the SQLite profile (gallery/db.py)
+
+Copies the database, then runs writer processes (like toggles and comments,
+as toggle_like and add_comment do) next to reader processes (the artwork list
+query) for a fixed time, once per profile:
+- baseline: what Django does without the profile (rollback journal, no pragmas)
+- tuned: settings.SQLITE_PRAGMAS
+and reports throughput, write latency and "database is locked" errors.
+
+Usage:
+    python manage.py bench_sqlite_concurrency --writers 4 --readers 4 --duration 10
+"""
+
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from gallery.db import pragma_statements
+from gallery.models import Artwork, Comment, Like
+
+
+PROFILES = ('baseline', 'tuned')
+
+# Django's sqlite3.connect default
+CONNECT_TIMEOUT = 5.0
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def profile_pragmas(profile):
+    if profile == 'baseline':
+        return {'journal_mode': 'DELETE'}
+    return dict(settings.SQLITE_PRAGMAS)
+
+
+def connect(path, profile):
+    # isolation_level=None: autocommit, transactions are explicit like Django's atomic()
+    db = sqlite3.connect(path, timeout=CONNECT_TIMEOUT, isolation_level=None)
+    for statement in pragma_statements(profile_pragmas(profile)):
+        db.execute(statement)
+    return db
+
+
+def toggle_like(db, user_id, artwork_id):
+    row = db.execute(
+        f'SELECT id FROM {Like._meta.db_table} WHERE user_id = ? AND artwork_id = ?', (user_id, artwork_id)
+    ).fetchone()
+    db.execute('BEGIN')
+    try:
+        if row:
+            db.execute(f'DELETE FROM {Like._meta.db_table} WHERE id = ?', (row[0],))
+        else:
+            db.execute(
+                f"INSERT OR IGNORE INTO {Like._meta.db_table} (user_id, artwork_id, created_at) "
+                f"VALUES (?, ?, datetime('now'))",
+                (user_id, artwork_id),
+            )
+        db.execute('COMMIT')
+    except Exception:
+        if db.in_transaction:
+            db.execute('ROLLBACK')
+        raise
+    db.execute(f'SELECT COUNT(*) FROM {Like._meta.db_table} WHERE artwork_id = ?', (artwork_id,)).fetchone()
+
+
+def add_comment(db, user_id, artwork_id):
+    db.execute('BEGIN')
+    try:
+        db.execute(
+            f"INSERT INTO {Comment._meta.db_table} (content, created_at, updated_at, artwork_id, user_id, is_active) "
+            f"VALUES (?, datetime('now'), datetime('now'), ?, ?, 1)",
+            ('Benchmark comment', artwork_id, user_id),
+        )
+        db.execute('COMMIT')
+    except Exception:
+        if db.in_transaction:
+            db.execute('ROLLBACK')
+        raise
+
+
+def list_artworks(db):
+    db.execute(
+        f'SELECT a.id, a.title, a.views, '
+        f'(SELECT COUNT(*) FROM {Like._meta.db_table} l WHERE l.artwork_id = a.id), '
+        f'(SELECT COUNT(*) FROM {Comment._meta.db_table} c WHERE c.artwork_id = a.id) '
+        f'FROM {Artwork._meta.db_table} a WHERE a.is_active ORDER BY a.created_at DESC LIMIT 20'
+    ).fetchall()
+
+
+def worker(kind, path, profile, duration, user_ids, artwork_ids, seed, results):
+    rng = random.Random(seed)
+    db = connect(path, profile)
+    latencies, locked, other_errors = [], 0, 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if kind == 'reader':
+                list_artworks(db)
+            elif rng.random() < 0.5:
+                toggle_like(db, rng.choice(user_ids), rng.choice(artwork_ids))
+            else:
+                add_comment(db, rng.choice(user_ids), rng.choice(artwork_ids))
+        except sqlite3.OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                locked += 1
+            else:
+                other_errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    db.close()
+    results.put({'kind': kind, 'latencies': latencies, 'locked': locked, 'errors': other_errors})
+
+
+class Command(BaseCommand):
+    help = 'Compare SQLite throughput and "database is locked" errors with and without the production pragmas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help='Writer processes (likes and comments)')
+        parser.add_argument('--readers', type=int, default=4, help='Reader processes (artwork list)')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per profile')
+        parser.add_argument('--profile', action='append', choices=PROFILES,
+                            help='Profile to run (repeatable, default: all)')
+        parser.add_argument('--json', dest='json_output', help='Also write the results to this JSON file')
+
+    def snapshot(self, directory):
+        """A consistent copy of the database to benchmark against; the real file is never written"""
+        source = connections['default']
+        source.ensure_connection()
+        path = os.path.join(directory, 'bench.sqlite3')
+        target = sqlite3.connect(path)
+        source.connection.backup(target)
+        target.close()
+        return path
+
+    def run_profile(self, profile, template, directory, options, user_ids, artwork_ids):
+        path = os.path.join(directory, f'{profile}.sqlite3')
+        shutil.copyfile(template, path)
+        # journal_mode is stored in the file: set it once before the workers start
+        connect(path, profile).close()
+
+        results = multiprocessing.Queue()
+        kinds = ['writer'] * options['writers'] + ['reader'] * options['readers']
+        processes = [
+            multiprocessing.Process(target=worker, args=(
+                kind, path, profile, options['duration'], user_ids, artwork_ids, seed, results
+            ))
+            for seed, kind in enumerate(kinds)
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        summary = {'profile': profile, 'duration_s': options['duration'],
+                   'writers': options['writers'], 'readers': options['readers']}
+        for kind in ('writer', 'reader'):
+            rows = [row for row in collected if row['kind'] == kind]
+            latencies = sorted(latency for row in rows for latency in row['latencies'])
+            summary[f'{kind}s_ok'] = len(latencies)
+            summary[f'{kind}s_per_s'] = round(len(latencies) / options['duration'], 1)
+            summary[f'{kind}_p50_ms'] = round(percentile(latencies, 50) * 1000, 2) if latencies else None
+            summary[f'{kind}_p95_ms'] = round(percentile(latencies, 95) * 1000, 2) if latencies else None
+            summary[f'{kind}_locked'] = sum(row['locked'] for row in rows)
+            summary[f'{kind}_errors'] = sum(row['errors'] for row in rows)
+        return summary
+
+    def handle(self, *args, **options):
+        user_ids = list(User.objects.values_list('id', flat=True)[:100])
+        artwork_ids = list(Artwork.objects.values_list('id', flat=True)[:100])
+        if not user_ids or not artwork_ids:
+            raise CommandError('The database needs at least one user and one artwork')
+
+        results = []
+        header = (f"{'profile':<10}{'writes/s':>10}{'w p95 ms':>10}{'w locked':>10}"
+                  f"{'reads/s':>10}{'r p95 ms':>10}{'r locked':>10}")
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        directory = tempfile.mkdtemp(prefix='bench-sqlite-')
+        try:
+            template = self.snapshot(directory)
+            for profile in options['profile'] or PROFILES:
+                result = self.run_profile(profile, template, directory, options, user_ids, artwork_ids)
+                results.append(result)
+                self.stdout.write(
+                    f"{profile:<10}{result['writers_per_s']:>10}{result['writer_p95_ms'] or '-':>10}"
+                    f"{result['writer_locked']:>10}{result['readers_per_s']:>10}"
+                    f"{result['reader_p95_ms'] or '-':>10}{result['reader_locked']:>10}"
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        if options['json_output']:
+            with open(options['json_output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['json_output']}")
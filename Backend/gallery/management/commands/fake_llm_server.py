@@ -0,0 +1,224 @@
+"""
+Local stand-in for the Groq OpenAI-compatible API, for load testing without quota
+
+Usage:
+    python manage.py fake_llm_server --port 8090 --latency lognormal --latency-ms 800 --error-rate 0.02
+    GROQ_BASE_URL=http://127.0.0.1:8090/openai/v1 python manage.py runserver
+"""
+
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+FAKE_TUTORIAL = {
+    'title': 'Fake tutorial',
+    'introduction': 'This tutorial was produced by the local fake LLM server. '
+                    'It has the same shape as a real tutorial so the UI and parsers can be exercised.',
+    'materials': ['2B pencil', 'Sketchbook', 'Kneaded eraser', 'Blending stump', 'Ruler'],
+    'steps': [
+        {'step': i, 'title': f'Step {i}',
+         'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. '
+                        'Sed do eiusmod tempor incididunt ut labore et dolore magna aliqua. '
+                        'Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris.'}
+        for i in range(1, 9)
+    ],
+    'tips': ['Work from light to dark', 'Keep your pencil sharp', 'Take breaks to rest your eyes',
+             'Check proportions often', 'Practice daily'],
+    'conclusion': 'Keep practising and compare your drawings over time to see your progress.',
+}
+
+FAKE_COMMENTS = (
+    'Wow, this is stunning! The colors really pop.\n'
+    'I love this! It makes me feel so peaceful.\n'
+    'This is amazing work, I could stare at it for hours!\n'
+    'Beautiful piece! Really captures the mood perfectly.'
+)
+
+FAKE_DESCRIPTION = (
+    'A luminous study in colour and light that invites the viewer to linger, '
+    'with layered textures revealing new details at every glance.'
+)
+
+
+class LatencyModel:
+    """Samples response latencies (seconds) from a configurable distribution"""
+
+    def __init__(self, distribution: str, mean_ms: float, spread: float):
+        self.distribution = distribution
+        self.mean = mean_ms / 1000
+        self.spread = spread
+
+    def sample(self) -> float:
+        if self.distribution == 'fixed':
+            return self.mean
+        if self.distribution == 'uniform':
+            return random.uniform(self.mean * (1 - self.spread), self.mean * (1 + self.spread))
+        if self.distribution == 'exponential':
+            return random.expovariate(1 / self.mean) if self.mean > 0 else 0
+        # lognormal, scaled so its mean is self.mean; spread is sigma
+        mu = -(self.spread ** 2) / 2
+        return self.mean * random.lognormvariate(mu, self.spread)
+
+
+def fake_answer(messages) -> str:
+    """Pick a canned answer that matches what the caller expects to parse"""
+    prompt = ' '.join(m.get('content', '') for m in messages).lower()
+    if 'respond only with valid json' in prompt or 'format your response as json' in prompt:
+        return json.dumps(FAKE_TUTORIAL, indent=2)
+    if 'comments' in prompt:
+        return FAKE_COMMENTS
+    if 'description' in prompt:
+        return FAKE_DESCRIPTION
+    return 'Start with the big shapes, then refine edges and values. ' * 8
+
+
+def make_handler(options):
+    latency = LatencyModel(options['latency'], options['latency_ms'], options['latency_spread'])
+    ttft = LatencyModel(options['latency'], options['ttft_ms'], options['latency_spread'])
+    error_rate = options['error_rate']
+    tokens_per_second = options['tokens_per_second']
+    quiet = options['quiet']
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            if not quiet:
+                super().log_message(format, *args)
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/').endswith('/models'):
+                return self.send_json(200, {'object': 'list', 'data': [
+                    {'id': 'fake-model', 'object': 'model', 'owned_by': 'local'}
+                ]})
+            self.send_json(404, {'error': {'message': 'Not found'}})
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                return self.send_json(404, {'error': {'message': 'Not found'}})
+
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                return self.send_json(400, {'error': {'message': 'Invalid JSON'}})
+
+            if random.random() < error_rate:
+                time.sleep(ttft.sample())
+                status = random.choice([429, 500, 503])
+                return self.send_json(status, {'error': {'message': f'Injected failure ({status})',
+                                                         'type': 'fake_error'}})
+
+            model = request.get('model', 'fake-model')
+            answer = fake_answer(request.get('messages', []))
+            completion_id = f'chatcmpl-{uuid.uuid4().hex[:12]}'
+            prompt_tokens = sum(len(m.get('content', '').split()) for m in request.get('messages', []))
+            tokens = answer.split(' ')
+            usage = {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(tokens),
+                'total_tokens': prompt_tokens + len(tokens),
+            }
+
+            if request.get('stream'):
+                return self.stream(completion_id, model, tokens, usage)
+
+            time.sleep(latency.sample())
+            self.send_json(200, {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': answer},
+                    'finish_reason': 'stop',
+                }],
+                'usage': usage,
+            })
+
+        def stream(self, completion_id, model, tokens, usage):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+
+            def chunk(delta, finish_reason=None, **extra):
+                payload = {
+                    'id': completion_id,
+                    'object': 'chat.completion.chunk',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+                    **extra,
+                }
+                self.wfile.write(f'data: {json.dumps(payload)}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+
+            time.sleep(ttft.sample())
+            delay = 1 / tokens_per_second if tokens_per_second > 0 else 0
+            try:
+                chunk({'role': 'assistant', 'content': ''})
+                for i, token in enumerate(tokens):
+                    chunk({'content': token if i == 0 else ' ' + token})
+                    if delay:
+                        time.sleep(delay)
+                chunk({}, finish_reason='stop', usage=usage)
+                self.wfile.write(b'data: [DONE]\n\n')
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = 'Run a fake OpenAI-compatible chat completions server (point GROQ_BASE_URL at it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8090)
+        parser.add_argument('--latency', choices=['fixed', 'uniform', 'exponential', 'lognormal'],
+                            default='lognormal', help='Latency distribution (default: lognormal)')
+        parser.add_argument('--latency-ms', type=float, default=800,
+                            help='Mean latency of a non-streamed completion in ms (default: 800)')
+        parser.add_argument('--latency-spread', type=float, default=0.5,
+                            help='Relative spread for uniform, sigma for lognormal (default: 0.5)')
+        parser.add_argument('--ttft-ms', type=float, default=200,
+                            help='Mean time to first token for streamed completions in ms (default: 200)')
+        parser.add_argument('--tokens-per-second', type=float, default=200,
+                            help='Streaming speed, 0 for no delay (default: 200)')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Fraction of requests answered with 429/500/503 (default: 0)')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--quiet', action='store_true', help='Do not log each request')
+
+    def handle(self, *args, **options):
+        if options['seed'] is not None:
+            random.seed(options['seed'])
+        server = ThreadingHTTPServer((options['host'], options['port']), make_handler(options))
+        server.daemon_threads = True
+        base_url = f"http://{options['host']}:{options['port']}/openai/v1"
+        self.stdout.write(self.style.SUCCESS(f'Fake LLM server listening on {base_url}'))
+        self.stdout.write(f'Start Django with GROQ_BASE_URL={base_url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from gallery.report_targets import rebuild_report_targets
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-target report rollup used by the grouped moderation queue'
+
+    def handle(self, *args, **options):
+        count = rebuild_report_targets()
+        self.stdout.write(self.style.SUCCESS(f'{count} reported target(s) rebuilt'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from gallery.admin_stats import rollup_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Refresh the per-day dashboard counters (run it periodically, e.g. hourly from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2,
+                            help='Number of days to recompute, today included (default: 2)')
+
+    def handle(self, *args, **options):
+        rows = rollup_daily_stats(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f'{rows} day(s) rolled up'))
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from gallery.jobs import JOB_STALE_AFTER, claim_next, requeue_stale_jobs, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Run queued AI generation jobs (tutorials, descriptions)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2,
+                            help='Number of jobs processed in parallel (default: 2)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty (default: 1)')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling')
+        parser.add_argument('--requeue-interval', type=float, default=JOB_STALE_AFTER.total_seconds() / 2,
+                            help='Seconds between two sweeps for jobs of dead workers (default: half of AI_JOB_STALE_AFTER)')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        poll_interval = options['poll_interval']
+        once = options['once']
+        stop = threading.Event()
+
+        self.requeue()
+
+        def loop():
+            name = worker_name()
+            try:
+                while not stop.is_set():
+                    close_old_connections()
+                    job = claim_next(name)
+                    if job is None:
+                        if once:
+                            return
+                        stop.wait(poll_interval)
+                        continue
+                    job = run_job(job)
+                    self.stdout.write(f'[{name}] job #{job.pk} ({job.kind}) -> {job.status}')
+            finally:
+                close_old_connections()
+
+        threads = [
+            threading.Thread(target=loop, name=f'ai-worker-{i}', daemon=True)
+            for i in range(concurrency)
+        ]
+        self.stdout.write(self.style.SUCCESS(f'AI worker started with concurrency={concurrency}'))
+        for thread in threads:
+            thread.start()
+        next_requeue = time.monotonic() + options['requeue_interval']
+        try:
+            while any(thread.is_alive() for thread in threads):
+                # Another worker process may have died since we started
+                if time.monotonic() >= next_requeue:
+                    self.requeue()
+                    next_requeue = time.monotonic() + options['requeue_interval']
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping after the current jobs...')
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def requeue(self):
+        close_old_connections()
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale job(s)')
@@ -0,0 +1,51 @@
+"""
+Fill the database with a synthetic dataset (gallery/seed.py)
+
+Usage:
+    python manage.py seed_gallery --scale 10
+    python manage.py seed_gallery --users 1000 --artworks 20000 --likes 500000 --no-images
+
+Seeded users are seed_user_<n> plus a staff account seed_staff, all with the
+--password (default: secret).
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gallery.seed import DEFAULT_COUNTS, counts_for, seed
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create a synthetic dataset (users, artworks, likes, comments, reports, discussions...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1,
+                            help='Multiplier of the default counts (default: 1, i.e. '
+                                 + ', '.join(f'{count} {name}' for name, count in DEFAULT_COUNTS.items()) + ')')
+        for name in DEFAULT_COUNTS:
+            parser.add_argument(f'--{name}', type=int, help=f'Number of {name} (overrides --scale)')
+        parser.add_argument('--days', type=int, default=365, help='Spread the data over the last N days')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (same seed, same data)')
+        parser.add_argument('--password', default='secret', help='Password of the seeded users')
+        parser.add_argument('--no-images', action='store_true', help='Do not generate image files')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--force', action='store_true', help='Seed even when DEBUG is off')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('DEBUG is off: this may be a production database. Use --force to seed anyway.')
+
+        counts = counts_for(options['scale'], **{name: options[name] for name in DEFAULT_COUNTS})
+        started = time.perf_counter()
+        seed(
+            counts,
+            seed=options['seed'],
+            days=options['days'],
+            password=options['password'],
+            images=not options['no_images'],
+            batch_size=max(1, options['batch_size']),
+            log=lambda message: self.stdout.write(f'  {message}'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Dataset seeded in {time.perf_counter() - started:.1f}s'))
@@ -0,0 +1,363 @@
+"""
+Dependency-free metrics: counters, gauges and fixed-bucket histograms
+
+Every process (gunicorn worker) writes its samples to its own memory-mapped
+file in METRICS_DIR; the /metrics view (views.metrics) reads the files of all
+processes and sums them into the Prometheus text format. Writes never take a
+cross-process lock: a file has a single writer.
+
+Counters and histograms of exited workers keep counting (their totals stay
+valid); gauges only count live processes. METRICS_DIR is emptied when the
+server starts (on_starting in gunicorn.conf.py).
+"""
+
+import glob
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'art-gallery-metrics'))
+
+# Latency buckets (seconds)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+AI_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+INITIAL_FILE_SIZE = 64 * 1024
+# File header: bytes in use
+HEADER = struct.Struct('<Q')
+KEY_LENGTH = struct.Struct('<I')
+VALUE = struct.Struct('<d')
+
+
+def _entry_size(key_length):
+    """Length prefix and key padded to 8 bytes, then the value"""
+    unpadded = KEY_LENGTH.size + key_length
+    return unpadded + (-unpadded % 8) + VALUE.size
+
+
+class MmapValues:
+    """
+    {key: float} stored in a memory-mapped file
+
+    Entry layout: key length (uint32), key (utf-8), padding to 8 bytes, value
+    (float64). A new entry is written before the header counts it, so a reader
+    never sees a half-written key.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size < INITIAL_FILE_SIZE:
+            self._file.truncate(INITIAL_FILE_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._offsets = {}
+        self._used = HEADER.unpack_from(self._map, 0)[0] or HEADER.size
+        for key, _, offset in read_entries(self._map[:self._used]):
+            self._offsets[key] = offset
+
+    def _grow(self, needed):
+        size = len(self._map)
+        while size < needed:
+            size *= 2
+        self._map.close()
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def _add(self, key):
+        encoded = key.encode('utf-8')
+        entry_size = _entry_size(len(encoded))
+        if self._used + entry_size > len(self._map):
+            self._grow(self._used + entry_size)
+        offset = self._used
+        KEY_LENGTH.pack_into(self._map, offset, len(encoded))
+        self._map[offset + KEY_LENGTH.size:offset + KEY_LENGTH.size + len(encoded)] = encoded
+        value_offset = offset + entry_size - VALUE.size
+        VALUE.pack_into(self._map, value_offset, 0.0)
+        self._used += entry_size
+        HEADER.pack_into(self._map, 0, self._used)
+        self._offsets[key] = value_offset
+        return value_offset
+
+    def add(self, key, amount):
+        offset = self._offsets.get(key) or self._add(key)
+        VALUE.pack_into(self._map, offset, VALUE.unpack_from(self._map, offset)[0] + amount)
+
+    def set(self, key, value):
+        offset = self._offsets.get(key) or self._add(key)
+        VALUE.pack_into(self._map, offset, value)
+
+
+def read_entries(data):
+    """(key, value, value offset) of every entry of a metrics file's content"""
+    if len(data) < HEADER.size:
+        return
+    used = min(HEADER.unpack_from(data, 0)[0], len(data))
+    offset = HEADER.size
+    while offset + KEY_LENGTH.size <= used:
+        length = KEY_LENGTH.unpack_from(data, offset)[0]
+        entry_size = _entry_size(length)
+        if offset + entry_size > used:
+            break
+        key = bytes(data[offset + KEY_LENGTH.size:offset + KEY_LENGTH.size + length]).decode('utf-8')
+        value_offset = offset + entry_size - VALUE.size
+        yield key, VALUE.unpack_from(data, value_offset)[0], value_offset
+        offset += entry_size
+
+
+_lock = threading.Lock()
+_values = None
+_values_pid = None
+
+
+def _process_values():
+    """This process's file, reopened after a fork (preloaded gunicorn master)"""
+    global _values, _values_pid
+    pid = os.getpid()
+    if _values_pid != pid:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        _values = MmapValues(os.path.join(METRICS_DIR, f'{pid}.db'))
+        _values_pid = pid
+    return _values
+
+
+def _sample_key(metric, suffix, labels):
+    return json.dumps([metric.name, suffix, labels], separators=(',', ':'))
+
+
+REGISTRY = {}
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY[name] = self
+
+    def labels(self, **labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return _Child(self, {name: str(labels[name]) for name in self.labelnames})
+
+    def _write(self, suffix, labels, amount=None, value=None):
+        if not settings.METRICS_ENABLED:
+            return
+        key = _sample_key(self, suffix, labels)
+        with _lock:
+            values = _process_values()
+            if value is None:
+                values.add(key, amount)
+            else:
+                values.set(key, value)
+
+
+class _Child:
+    def __init__(self, metric, labels):
+        self.metric = metric
+        self.labels = labels
+
+    def inc(self, amount=1):
+        self.metric.inc(amount, self.labels)
+
+    def dec(self, amount=1):
+        self.metric.inc(-amount, self.labels)
+
+    def set(self, value):
+        self.metric.set(value, self.labels)
+
+    def observe(self, value):
+        self.metric.observe(value, self.labels)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, labels=None):
+        if amount < 0:
+            raise ValueError('Counters can only go up')
+        self._write('_total' if not self.name.endswith('_total') else '', labels or {}, amount=amount)
+
+
+class Gauge(Metric):
+    """Summed over live processes"""
+    type = 'gauge'
+
+    def inc(self, amount=1, labels=None):
+        self._write('', labels or {}, amount=amount)
+
+    def dec(self, amount=1, labels=None):
+        self._write('', labels or {}, amount=-amount)
+
+    def set(self, value, labels=None):
+        self._write('', labels or {}, value=value)
+
+
+class Histogram(Metric):
+    """Fixed buckets, stored cumulative (as exposed) so processes can be summed"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, labels=None):
+        labels = labels or {}
+        for bound in self.buckets:
+            # Every bucket is written, so each series exposes all of them
+            self._write('_bucket', {**labels, 'le': _format_value(bound)}, amount=1 if value <= bound else 0)
+        self._write('_sum', labels, amount=value)
+        self._write('_count', labels, amount=1)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return f'{value:.1f}'
+    return repr(float(value))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    """{(metric name, suffix, labels tuple): value} summed over every process file"""
+    samples = {}
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.db')):
+        try:
+            pid = int(os.path.basename(path)[:-3])
+            with open(path, 'rb') as f:
+                data = f.read()
+        except (ValueError, OSError):
+            continue
+        alive = None
+        for key, value, _ in read_entries(data):
+            name, suffix, labels = json.loads(key)
+            metric = REGISTRY.get(name)
+            if metric is None:
+                continue
+            if metric.type == 'gauge':
+                if alive is None:
+                    alive = _pid_alive(pid)
+                if not alive:
+                    continue
+            sample = (name, suffix, tuple(labels.items()))
+            samples[sample] = samples.get(sample, 0.0) + value
+    return samples
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render_text():
+    """Every registered metric in the Prometheus text exposition format (0.0.4)"""
+    samples = collect()
+    lines = []
+    for name in sorted(REGISTRY):
+        metric = REGISTRY[name]
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        for (sample_name, suffix, labels), value in sorted(samples.items(), key=_sample_order):
+            if sample_name != name:
+                continue
+            label_text = ','.join(f'{key}="{_escape(str(label))}"' for key, label in labels)
+            label_text = f'{{{label_text}}}' if label_text else ''
+            lines.append(f'{name}{suffix}{label_text} {_format_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _sample_order(item):
+    (_, suffix, labels), _ = item
+    # Buckets in numeric `le` order
+    return suffix, [(key, float(value.replace('+Inf', 'inf')) if key == 'le' else value) for key, value in labels]
+
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def reset_directory():
+    """Remove every process file (call once when the server starts, before the workers)"""
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+
+# ---- Metrics of the application ----
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by view, method and status code', ['view', 'method', 'status'],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time until the view returned its response', ['view', 'method'],
+)
+HTTP_EXCEPTIONS = Counter(
+    'http_request_exceptions_total', 'Requests that raised instead of returning a response', ['view'],
+)
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests being processed')
+
+AI_CALLS = Counter('ai_calls_total', 'Upstream AI calls by outcome', ['endpoint', 'model', 'outcome'])
+AI_CALL_DURATION = Histogram(
+    'ai_call_duration_seconds', 'Wall time of upstream AI calls', ['endpoint', 'model'], buckets=AI_BUCKETS,
+)
+AI_TOKENS = Counter('ai_tokens_total', 'Tokens used by upstream AI calls', ['endpoint', 'model', 'kind'])
+
+
+def observe_ai_call(endpoint, model, outcome, wall, prompt_tokens=None, completion_tokens=None):
+    model = model or 'unknown'
+    AI_CALLS.labels(endpoint=endpoint, model=model, outcome=outcome).inc()
+    AI_CALL_DURATION.labels(endpoint=endpoint, model=model).observe(wall)
+    for kind, tokens in (('prompt', prompt_tokens), ('completion', completion_tokens)):
+        if tokens:
+            AI_TOKENS.labels(endpoint=endpoint, model=model, kind=kind).inc(tokens)
+
+
+def view_label(request):
+    """URL name of the matched route (low cardinality); 'unmatched' for 404s"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route or 'unnamed'
+
+
+class MetricsMiddleware:
+    """Request count, latency, errors and in-flight requests for every URL"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            # Never raises: Django turns exceptions into responses before they
+            # get here (process_exception below counts those of the view)
+            response = self.get_response(request)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+        view = view_label(request)
+        HTTP_REQUEST_DURATION.labels(view=view, method=request.method).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(view=view, method=request.method, status=response.status_code).inc()
+        return response
+
+    def process_exception(self, request, exception):
+        HTTP_EXCEPTIONS.labels(view=view_label(request)).inc()
+        # Let Django build the 500 response
+        return None
@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+
+from .db import read_only_request
+
+
+class SessionRefreshMiddleware:
+    """
+    Sliding session expiry without a database write on every request
+
+    Replaces SESSION_SAVE_EVERY_REQUEST: a non-empty session that was used
+    during the request is saved again (pushing back its expiry and cookie)
+    only when its last refresh is older than SESSION_REFRESH_INTERVAL seconds.
+    Requests that never touch the session, and anonymous (empty) sessions,
+    cause no write. Must come after SessionMiddleware.
+    """
+
+    REFRESHED_AT = '_refreshed_at'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.interval = settings.SESSION_REFRESH_INTERVAL
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        session = getattr(request, 'session', None)
+        if session is None or not session.accessed or session.is_empty():
+            return response
+
+        now = int(time.time())
+        # A session saved anyway (login, profile change) records the refresh for free
+        if session.modified or now - session.get(self.REFRESHED_AT, 0) >= self.interval:
+            session[self.REFRESHED_AT] = now
+        return response
+
+
+class ReadOnlyRequestMiddleware:
+    """
+    Route the database reads of GET and HEAD requests to the read-only alias
+    (see gallery.db.ReadWriteRouter); writes they make still go to 'default'
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in self.SAFE_METHODS:
+            return self.get_response(request)
+        with read_only_request():
+            return self.get_response(request)
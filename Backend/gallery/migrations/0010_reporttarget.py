@@ -0,0 +1,84 @@
+# Generated by Django 4.2 on 2026-10-19 07:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_report_targets(apps, schema_editor):
+    """One rollup row per reported artwork or comment from the existing reports"""
+    from django.db.models import Count, Max, Min, Q
+
+    Report = apps.get_model('gallery', 'Report')
+    ReportTarget = apps.get_model('gallery', 'ReportTarget')
+    reasons = ['inappropriate', 'spam', 'copyright']
+
+    rows = []
+    groups = (
+        ('comment', Report.objects.filter(comment__isnull=False), 'comment_id'),
+        ('artwork', Report.objects.filter(comment__isnull=True, artwork__isnull=False), 'artwork_id'),
+    )
+    for target_type, reports, group_field in groups:
+        aggregated = reports.order_by().values(group_field).annotate(
+            total_reports=Count('id'),
+            pending_reports=Count('id', filter=Q(resolved=False)),
+            first_reported_at=Min('created_at'),
+            last_reported_at=Max('created_at'),
+            last_resolved_at=Max('resolved_at'),
+            **{f'{reason}_reports': Count('id', filter=Q(reason=reason)) for reason in reasons},
+        )
+        for row in aggregated:
+            target_id = row.pop(group_field)
+            row['other_reports'] = row['total_reports'] - sum(row[f'{reason}_reports'] for reason in reasons)
+            rows.append(ReportTarget(
+                target_type=target_type,
+                target_id=target_id,
+                artwork_id=target_id if target_type == 'artwork' else None,
+                comment_id=target_id if target_type == 'comment' else None,
+                **row,
+            ))
+    ReportTarget.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0009_report_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportTarget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('artwork', 'Artwork'), ('comment', 'Comment')], max_length=10)),
+                ('target_id', models.PositiveIntegerField()),
+                ('total_reports', models.PositiveIntegerField(default=0)),
+                ('pending_reports', models.PositiveIntegerField(default=0)),
+                ('inappropriate_reports', models.PositiveIntegerField(default=0)),
+                ('spam_reports', models.PositiveIntegerField(default=0)),
+                ('copyright_reports', models.PositiveIntegerField(default=0)),
+                ('other_reports', models.PositiveIntegerField(default=0)),
+                ('first_reported_at', models.DateTimeField()),
+                ('last_reported_at', models.DateTimeField()),
+                ('last_resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('artwork', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_targets', to='gallery.artwork')),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_targets', to='gallery.comment')),
+            ],
+            options={
+                'ordering': ['-last_reported_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reporttarget',
+            index=models.Index(fields=['-last_reported_at', '-id'], name='reporttarget_last_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reporttarget',
+            index=models.Index(condition=models.Q(('pending_reports__gt', 0)), fields=['last_reported_at'], name='reporttarget_pending_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reporttarget',
+            constraint=models.UniqueConstraint(fields=('target_type', 'target_id'), name='unique_report_target'),
+        ),
+        migrations.RunPython(backfill_report_targets, migrations.RunPython.noop),
+    ]
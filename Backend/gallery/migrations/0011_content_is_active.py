@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-19 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0010_reporttarget'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artwork',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-19 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0011_content_is_active'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('new_users', models.PositiveIntegerField(default=0)),
+                ('new_artworks', models.PositiveIntegerField(default=0)),
+                ('new_likes', models.PositiveIntegerField(default=0)),
+                ('new_comments', models.PositiveIntegerField(default=0)),
+                ('new_reports', models.PositiveIntegerField(default=0)),
+                ('views', models.BigIntegerField(default=0)),
+                ('total_views', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily stats',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Indexes on auth_user for the admin user list (get_all_users): keyset
+    pagination on date_joined and case-insensitive prefix search
+    """
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('gallery', '0012_dailystats'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX gallery_user_joined_idx ON auth_user (date_joined DESC, id DESC);',
+            'DROP INDEX gallery_user_joined_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX gallery_user_username_lower_idx ON auth_user (LOWER(username));',
+            'DROP INDEX gallery_user_username_lower_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX gallery_user_email_lower_idx ON auth_user (LOWER(email));',
+            'DROP INDEX gallery_user_email_lower_idx;',
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-19 07:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('gallery', '0013_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='artwork',
+            name='category',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='gallery.category'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='artwork',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='gallery.artwork'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at'], name='artwork_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['style', '-created_at'], name='artwork_style_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['category', '-created_at'], name='artwork_category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(condition=models.Q(('is_featured', True)), fields=['-created_at'], name='artwork_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['artwork', '-created_at'], name='comment_artwork_created_idx'),
+        ),
+        # register() checks that the email is not taken
+        migrations.RunSQL(
+            'CREATE INDEX gallery_user_email_idx ON auth_user (email);',
+            'DROP INDEX gallery_user_email_idx;',
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-19 08:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0014_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AllocationProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('release', models.CharField(max_length=64)),
+                ('view', models.CharField(max_length=100)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=255)),
+                ('status', models.PositiveSmallIntegerField()),
+                ('trigger', models.CharField(choices=[('sample', 'Sampled'), ('header', 'Header')], max_length=10)),
+                ('duration_ms', models.PositiveIntegerField()),
+                ('peak_bytes', models.BigIntegerField()),
+                ('retained_bytes', models.BigIntegerField()),
+                ('rss_growth_kb', models.BigIntegerField(blank=True, null=True)),
+                ('top_sites', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='allocationprofile',
+            index=models.Index(fields=['view', 'release'], name='allocprofile_view_release_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='allocationprofile',
+            index=models.Index(fields=['created_at'], name='allocprofile_created_idx'),
+        ),
+    ]
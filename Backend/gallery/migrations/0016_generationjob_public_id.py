@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-19 08:29
+
+from django.db import migrations, models
+import uuid
+
+
+def fill_public_ids(apps, schema_editor):
+    """A distinct public id per existing job (the field default is only evaluated once)"""
+    GenerationJob = apps.get_model('gallery', 'GenerationJob')
+    for job in GenerationJob.objects.filter(public_id__isnull=True).only('pk'):
+        GenerationJob.objects.filter(pk=job.pk).update(public_id=uuid.uuid4())
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    """Keep the oldest active job per input: the others would break genjob_active_input_uniq"""
+    GenerationJob = apps.get_model('gallery', 'GenerationJob')
+    seen = set()
+    duplicates = []
+    active = GenerationJob.objects.filter(status__in=['pending', 'running']).order_by('created_at', 'pk')
+    for job in active.only('pk', 'kind', 'input_hash'):
+        if (job.kind, job.input_hash) in seen:
+            duplicates.append(job.pk)
+        seen.add((job.kind, job.input_hash))
+    GenerationJob.objects.filter(pk__in=duplicates).update(status='failed', error='Duplicate of an active job')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0015_allocationprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='public_id',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_public_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='generationjob',
+            name='public_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AddField(
+            model_name='generationjob',
+            name='run_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='generationjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('kind', 'input_hash'), name='genjob_active_input_uniq'),
+        ),
+    ]
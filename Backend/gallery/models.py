@@ -1,9 +1,13 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
 from PIL import Image
 from django.utils import timezone
 
+from .timing import phase
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -28,7 +32,8 @@ class Artwork(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     artist = models.ForeignKey(User, on_delete=models.CASCADE, related_name='artworks')
-    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    # Indexed by artwork_category_created_idx (category first)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, db_index=False)
     style = models.CharField(max_length=20, choices=STYLE_CHOICES, default='abstract')
     image = models.ImageField(upload_to='artworks/')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -38,9 +43,22 @@ class Artwork(models.Model):
     #yosr's add
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, default=0)
     in_stock = models.BooleanField(default=True)
+    # False once hidden by moderation (bulk_deactivate_content)
+    is_active = models.BooleanField(default=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # index(): active artworks newest first
+            models.Index(fields=['-created_at'], name='artwork_active_created_idx',
+                         condition=models.Q(is_active=True)),
+            # index() filtered by style or category, same order
+            models.Index(fields=['style', '-created_at'], name='artwork_style_created_idx'),
+            models.Index(fields=['category', '-created_at'], name='artwork_category_created_idx'),
+            # Featured artworks are a small subset
+            models.Index(fields=['-created_at'], name='artwork_featured_idx',
+                         condition=models.Q(is_featured=True)),
+        ]
 
     def __str__(self):
         return self.title
@@ -53,11 +71,12 @@ class Artwork(models.Model):
         
         # Resize image if it's too large
         if self.image:
-            img = Image.open(self.image.path)
-            if img.height > 800 or img.width > 800:
-                output_size = (800, 800)
-                img.thumbnail(output_size)
-                img.save(self.image.path)
+            with phase('image'):
+                img = Image.open(self.image.path)
+                if img.height > 800 or img.width > 800:
+                    output_size = (800, 800)
+                    img.thumbnail(output_size)
+                    img.save(self.image.path)
 
 class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -69,13 +88,20 @@ class Like(models.Model):
 
 class Comment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    artwork = models.ForeignKey(Artwork, on_delete=models.CASCADE, related_name='comments')
+    # Indexed by comment_artwork_created_idx (artwork first)
+    artwork = models.ForeignKey(Artwork, on_delete=models.CASCADE, related_name='comments', db_index=False)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # False once hidden by moderation
+    is_active = models.BooleanField(default=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Comments of an artwork, newest first
+            models.Index(fields=['artwork', '-created_at'], name='comment_artwork_created_idx'),
+        ]
 
     def __str__(self):
         return f'Comment by {self.user.username} on {self.artwork.title}'
@@ -118,6 +144,14 @@ class Report(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Unfiltered queue, newest first (keyset pagination order)
+            models.Index(fields=['-created_at', '-id'], name='report_created_idx'),
+            # Moderation queue filtered by status, newest first
+            models.Index(fields=['resolved', 'created_at'], name='report_resolved_created_idx'),
+            # Pending reports only: stays small however long the history gets
+            models.Index(fields=['created_at'], name='report_pending_idx', condition=models.Q(resolved=False)),
+        ]
 
     def __str__(self):
         if self.artwork and getattr(self.artwork, "title", None):
@@ -132,7 +166,64 @@ class Report(models.Model):
         self.resolved = True
         self.resolved_at = timezone.now()
         self.save(update_fields=['resolved', 'resolved_at'])
-    
+
+
+class ReportTarget(models.Model):
+    """
+    One row per reported artwork or comment, kept up to date on every save and
+    delete of a Report (see report_targets.py), so the grouped moderation queue
+    grows with the number of targets rather than the number of reports
+    """
+    TARGET_CHOICES = [
+        ('artwork', 'Artwork'),
+        ('comment', 'Comment'),
+    ]
+
+    target_type = models.CharField(max_length=10, choices=TARGET_CHOICES)
+    target_id = models.PositiveIntegerField()
+    # Kept (as NULL) when the content is deleted, like Report
+    artwork = models.ForeignKey(
+        Artwork, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_targets'
+    )
+    comment = models.ForeignKey(
+        Comment, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_targets'
+    )
+
+    total_reports = models.PositiveIntegerField(default=0)
+    pending_reports = models.PositiveIntegerField(default=0)
+    # One counter per Report.REPORT_CHOICES reason, so concurrent reports can use F() updates
+    inappropriate_reports = models.PositiveIntegerField(default=0)
+    spam_reports = models.PositiveIntegerField(default=0)
+    copyright_reports = models.PositiveIntegerField(default=0)
+    other_reports = models.PositiveIntegerField(default=0)
+
+    first_reported_at = models.DateTimeField()
+    last_reported_at = models.DateTimeField()
+    last_resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-last_reported_at']
+        constraints = [
+            models.UniqueConstraint(fields=['target_type', 'target_id'], name='unique_report_target'),
+        ]
+        indexes = [
+            models.Index(fields=['-last_reported_at', '-id'], name='reporttarget_last_idx'),
+            models.Index(fields=['last_reported_at'], name='reporttarget_pending_idx',
+                         condition=models.Q(pending_reports__gt=0)),
+        ]
+
+    def __str__(self):
+        return f'{self.target_type} #{self.target_id} ({self.pending_reports}/{self.total_reports} pending)'
+
+    @property
+    def reason_counts(self):
+        return {
+            reason: getattr(self, f'{reason}_reports')
+            for reason, _ in Report.REPORT_CHOICES
+            if getattr(self, f'{reason}_reports')
+        }
+
+
 class Discussion(models.Model):
     """Modèle pour les discussions"""
     title = models.CharField(max_length=200)
@@ -201,4 +292,163 @@ class Reply(models.Model):
         elif diff.seconds > 60:
             return f"{diff.seconds // 60} minute{'s' if diff.seconds // 60 > 1 else ''} ago"
         else:
-            return "Just now"
\ No newline at end of file
+            return "Just now"
+
+class GenerationJob(models.Model):
+    """Durable queue entry for long-running AI generation (tutorials, descriptions)"""
+    KIND_CHOICES = [
+        ('tutorial', 'Tutorial'),
+        ('description', 'Description'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    # Queued or running: at most one per (kind, input_hash), see genjob_active_input_uniq
+    ACTIVE_STATUSES = ['pending', 'running']
+
+    # Public handle of the job (the sequential id would let anyone walk through other users' jobs)
+    public_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Hash of kind + normalised params (+ requester for per-user kinds), so identical requests reuse the same job
+    input_hash = models.CharField(max_length=64, db_index=True)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    # A failed attempt is retried after a delay, not right away
+    run_after = models.DateTimeField(null=True, blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='generation_jobs')
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='genjob_status_created_idx'),
+        ]
+        constraints = [
+            # Two concurrent identical requests cannot both queue a job
+            models.UniqueConstraint(fields=['kind', 'input_hash'], condition=models.Q(status__in=['pending', 'running']),
+                                    name='genjob_active_input_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job #{self.pk} ({self.status})"
+
+    def to_dict(self):
+        return {
+            'id': str(self.public_id),
+            'kind': self.kind,
+            'status': self.status,
+            'params': self.params,
+            'result': self.result,
+            'error': self.error or None,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class AICallRecord(models.Model):
+    """One upstream AI call: tokens, latency and outcome (see ai_metering)"""
+    OUTCOME_CHOICES = [
+        ('ok', 'OK'),
+        ('error', 'Error'),
+        ('timeout', 'Timeout'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    endpoint = models.CharField(max_length=50)
+    model = models.CharField(max_length=100)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES)
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    completion_tokens = models.PositiveIntegerField(null=True, blank=True)
+    wall_ms = models.PositiveIntegerField()
+    # Only known for streamed calls
+    ttft_ms = models.PositiveIntegerField(null=True, blank=True)
+    # Short hash of the prompt, to see how often identical prompts are sent
+    prompt_hash = models.CharField(max_length=16)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.endpoint} via {self.model} ({self.outcome}, {self.wall_ms} ms)"
+
+
+class AllocationProfile(models.Model):
+    """Python allocations of one profiled request (see alloc_profiler)"""
+    TRIGGER_CHOICES = [
+        ('sample', 'Sampled'),
+        ('header', 'Header'),
+    ]
+
+    # Deploy the worker was running (RELEASE), to compare deploys
+    release = models.CharField(max_length=64)
+    view = models.CharField(max_length=100)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    status = models.PositiveSmallIntegerField()
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+    duration_ms = models.PositiveIntegerField()
+    # Highest traced Python memory during the request, above its level at the start
+    peak_bytes = models.BigIntegerField()
+    # Traced memory still held when the view returned (response included)
+    retained_bytes = models.BigIntegerField()
+    # Growth of the process's peak RSS: also covers C allocations (Pillow)
+    rss_growth_kb = models.BigIntegerField(null=True, blank=True)
+    # [{site, size, count}] biggest allocation sites, largest first
+    top_sites = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['view', 'release'], name='allocprofile_view_release_idx'),
+            models.Index(fields=['created_at'], name='allocprofile_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.view} on {self.release}: peak {self.peak_bytes} bytes"
+
+
+class DailyStats(models.Model):
+    """Per-day activity counters for the admin dashboard (see admin_stats.rollup_daily_stats)"""
+    date = models.DateField(unique=True)
+    new_users = models.PositiveIntegerField(default=0)
+    new_artworks = models.PositiveIntegerField(default=0)
+    new_likes = models.PositiveIntegerField(default=0)
+    new_comments = models.PositiveIntegerField(default=0)
+    new_reports = models.PositiveIntegerField(default=0)
+    # Views are a counter on Artwork: the daily figure is the growth of their
+    # sum between two rollups, so it is only known for days rolled up live
+    views = models.BigIntegerField(default=0)
+    total_views = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'Daily stats'
+
+    def __str__(self):
+        return f"{self.date}: {self.new_users} users, {self.new_artworks} artworks, {self.views} views"
+
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat(),
+            'users': self.new_users,
+            'artworks': self.new_artworks,
+            'likes': self.new_likes,
+            'comments': self.new_comments,
+            'reports': self.new_reports,
+            'views': self.views,
+        }
@@ -0,0 +1,155 @@
+"""
+Per-request query inspection
+- QueryInspectorMiddleware (development/staging, QUERY_INSPECTOR_ENABLED):
+  records every query of a request, groups them by normalised SQL and reports
+  the shapes run QUERY_INSPECTOR_REPEAT_THRESHOLD times or more (an N+1) with
+  the line of project code that issued them
+- @query_budget(n): maximum number of queries a view may run; exceeding it
+  raises QueryBudgetExceeded when QUERY_BUDGET_STRICT (the test runner) and
+  is only logged otherwise
+"""
+
+import re
+import time
+import traceback
+from collections import defaultdict
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+# Transaction control repeats by nature: never reported as an N+1
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def normalize_sql(sql):
+    """The shape of a query: literals and parameter lists replaced by placeholders"""
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = IN_LIST.sub('IN (...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def call_site():
+    """file:line (function) of the innermost project frame outside this module"""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        filename = frame.filename
+        if (filename.startswith(base_dir) and filename != __file__
+                and 'site-packages' not in filename):
+            return f'{filename[len(base_dir) + 1:]}:{frame.lineno} ({frame.name})'
+    return 'unknown'
+
+
+class QueryRecorder:
+    """execute_wrapper recording every query run on any database alias"""
+
+    def __init__(self, with_call_sites=False):
+        self.with_call_sites = with_call_sites
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'duration': time.perf_counter() - started,
+                'site': call_site() if self.with_call_sites else None,
+            })
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in settings.DATABASES:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated(self, threshold):
+        """[(shape, count, total seconds, call sites)] of the shapes run `threshold` times or more"""
+        groups = defaultdict(list)
+        for query in self.queries:
+            if not query['sql'].lstrip().upper().startswith(TRANSACTION_STATEMENTS):
+                groups[normalize_sql(query['sql'])].append(query)
+        return sorted(
+            (
+                (shape, len(queries), sum(query['duration'] for query in queries),
+                 sorted({query['site'] for query in queries if query['site']}))
+                for shape, queries in groups.items() if len(queries) >= threshold
+            ),
+            key=lambda group: -group[1],
+        )
+
+
+class QueryInspectorMiddleware:
+    """
+    Report the N+1 patterns of every request (printed, plus X-Query-Count and
+    X-Query-Repeats headers). Off unless QUERY_INSPECTOR_ENABLED: recording
+    call sites walks the stack on every query.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTOR_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.QUERY_INSPECTOR_REPEAT_THRESHOLD
+
+    def __call__(self, request):
+        with QueryRecorder(with_call_sites=True) as recorder:
+            response = self.get_response(request)
+
+        repeated = recorder.repeated(self.threshold)
+        response['X-Query-Count'] = len(recorder)
+        response['X-Query-Repeats'] = len(repeated)
+        for shape, count, duration, sites in repeated:
+            print(f'[queries] {request.method} {request.path}: {count}x ({duration * 1000:.1f} ms) '
+                  f'{shape[:300]}')
+            for site in sites:
+                print(f'[queries]     at {site}')
+        return response
+
+
+def query_budget(max_queries):
+    """
+    Cap the number of queries of a view (the view body only, not the
+    middleware around it). Place it right above the view function.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with QueryRecorder(with_call_sites=settings.QUERY_BUDGET_STRICT) as recorder:
+                response = view(request, *args, **kwargs)
+            if len(recorder) > max_queries:
+                message = f'{view.__name__} ran {len(recorder)} queries, budget is {max_queries}'
+                repeated = recorder.repeated(2)
+                if settings.QUERY_BUDGET_STRICT:
+                    details = ''.join(
+                        f'\n  {count}x {shape[:200]}\n    at ' + '\n    at '.join(sites)
+                        for shape, count, _, sites in repeated
+                    )
+                    raise QueryBudgetExceeded(message + details)
+                print(f'[queries] {message}' + ''.join(
+                    f'; {count}x {shape[:120]}' for shape, count, _, _ in repeated[:3]
+                ))
+            return response
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
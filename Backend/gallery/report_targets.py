@@ -0,0 +1,214 @@
+"""
+Per-target rollup of reports (ReportTarget)
+Every save and delete of a Report applies a delta with F() expressions (see
+the receivers in signals.py), so the grouped moderation queue never aggregates
+the Report table. Queryset updates send no signal: resolve_report and
+bulk_resolve_reports call record_resolved themselves. `rebuild_report_targets`
+recomputes every row from scratch (backfill, or after raw SQL edits)
+"""
+
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Q, Value
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from .models import Report, ReportTarget
+
+
+REASON_FIELDS = {reason: f'{reason}_reports' for reason, _ in Report.REPORT_CHOICES}
+
+
+def reason_field(reason):
+    # create_report does not validate the reason: unknown ones count as 'other'
+    return REASON_FIELDS.get(reason, 'other_reports')
+
+
+def target_for(report):
+    """(target_type, target_id) of a report; a comment report targets the comment"""
+    if report.comment_id:
+        return 'comment', report.comment_id
+    if report.artwork_id:
+        return 'artwork', report.artwork_id
+    return None
+
+
+def record_report(report):
+    """Count a report in its target's row (a new one, or one moved from another target)"""
+    key = target_for(report)
+    if key is None:
+        return
+    target_type, target_id = key
+    field = reason_field(report.reason)
+    pending = 0 if report.resolved else 1
+    increments = {
+        'total_reports': F('total_reports') + 1,
+        'pending_reports': F('pending_reports') + pending,
+        field: F(field) + 1,
+        # A report moved from another target may be older than the first one
+        # or the latest one
+        'first_reported_at': Least(F('first_reported_at'), Value(report.created_at)),
+        'last_reported_at': Greatest(F('last_reported_at'), Value(report.created_at)),
+    }
+
+    with transaction.atomic():
+        targets = ReportTarget.objects.filter(target_type=target_type, target_id=target_id)
+        if targets.update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                ReportTarget.objects.create(
+                    target_type=target_type,
+                    target_id=target_id,
+                    artwork_id=target_id if target_type == 'artwork' else None,
+                    comment_id=target_id if target_type == 'comment' else None,
+                    total_reports=1,
+                    pending_reports=pending,
+                    first_reported_at=report.created_at,
+                    last_reported_at=report.created_at,
+                    **{field: 1},
+                )
+        except IntegrityError:
+            # Another request created the row first
+            targets.update(**increments)
+
+
+ROLLUP_FIELDS = {'artwork', 'comment', 'reason', 'resolved'}
+
+
+def _state(report):
+    return target_for(report), reason_field(report.reason), report.resolved
+
+
+def remember_state(report, update_fields=None):
+    """
+    Keep the rollup-relevant state of a report before it is saved or deleted
+
+    Before a save the state is read from the database (the instance already
+    holds the new values); nothing is read for new reports or when
+    `update_fields` leaves the rollup fields alone.
+    """
+    report._rollup_state = None
+    if report._state.adding or (update_fields is not None and not ROLLUP_FIELDS & set(update_fields)):
+        return
+    previous = Report.objects.filter(pk=report.pk).only('artwork_id', 'comment_id', 'reason', 'resolved').first()
+    if previous is not None:
+        report._rollup_state = _state(previous)
+
+
+def _add(key, field, total, pending):
+    """Add `total` reports, `pending` of them unresolved, to an existing target row"""
+    target_type, target_id = key
+    ReportTarget.objects.filter(target_type=target_type, target_id=target_id).update(**{
+        'total_reports': Greatest(F('total_reports') + total, Value(0)),
+        'pending_reports': Greatest(F('pending_reports') + pending, Value(0)),
+        field: Greatest(F(field) + total, Value(0)),
+    })
+
+
+def record_saved(report, created):
+    """Apply the rollup delta of a saved report (creation, edit of its target, reason or status)"""
+    if created:
+        record_report(report)
+        return
+    previous = getattr(report, '_rollup_state', None)
+    current = _state(report)
+    if previous is None or previous == current:
+        return
+
+    old_key, old_field, old_resolved = previous
+    new_key, new_field, new_resolved = current
+    if (old_key, old_field) != (new_key, new_field):
+        if old_key is not None:
+            _add(old_key, old_field, -1, 0 if old_resolved else -1)
+            ReportTarget.objects.filter(
+                target_type=old_key[0], target_id=old_key[1], total_reports__lte=0
+            ).delete()
+        record_report(report)
+    elif new_key is None:
+        return
+    elif new_resolved:
+        record_resolved([report], report.resolved_at)
+    else:
+        # Reopened
+        _add(new_key, new_field, 0, 1)
+
+
+def remember_deleted(report):
+    """Read the state of a report about to be deleted (a deferred field can't be loaded afterwards)"""
+    report._rollup_state = _state(report)
+
+
+def record_deleted(report):
+    """Take a deleted report out of its target's counts; a target left without reports is removed"""
+    key, field, resolved = getattr(report, '_rollup_state', None) or _state(report)
+    if key is None:
+        return
+    with transaction.atomic():
+        _add(key, field, -1, 0 if resolved else -1)
+        ReportTarget.objects.filter(target_type=key[0], target_id=key[1], total_reports__lte=0).delete()
+
+
+def record_resolved(reports, resolved_at=None):
+    """
+    Take newly resolved reports out of their targets' pending counts
+
+    `reports` must only contain reports that were pending before; targets are
+    grouped by how many of their reports were resolved, one UPDATE per group.
+    """
+    resolved_at = resolved_at or timezone.now()
+    counts = Counter(key for key in map(target_for, reports) if key is not None)
+
+    by_count = defaultdict(lambda: defaultdict(list))
+    for (target_type, target_id), count in counts.items():
+        by_count[count][target_type].append(target_id)
+
+    for count, targets in by_count.items():
+        condition = Q()
+        for target_type, target_ids in targets.items():
+            condition |= Q(target_type=target_type, target_id__in=target_ids)
+        ReportTarget.objects.filter(condition).update(
+            pending_reports=Greatest(F('pending_reports') - count, Value(0)),
+            last_resolved_at=resolved_at,
+        )
+
+
+@transaction.atomic
+def rebuild_report_targets():
+    """Recompute every ReportTarget row from the Report table; returns the number of rows"""
+    reason_counts = {
+        field: Count('id', filter=Q(reason=reason)) for reason, field in REASON_FIELDS.items()
+    }
+    aggregates = dict(
+        total_reports=Count('id'),
+        pending_reports=Count('id', filter=Q(resolved=False)),
+        first_reported_at=Min('created_at'),
+        last_reported_at=Max('created_at'),
+        last_resolved_at=Max('resolved_at'),
+        **reason_counts,
+    )
+
+    rows = []
+    groups = (
+        ('comment', Report.objects.filter(comment__isnull=False), 'comment_id'),
+        ('artwork', Report.objects.filter(comment__isnull=True, artwork__isnull=False), 'artwork_id'),
+    )
+    for target_type, reports, group_field in groups:
+        for row in reports.order_by().values(group_field).annotate(**aggregates):
+            target_id = row.pop(group_field)
+            # Unknown reasons are counted as 'other', as in record_report
+            row['other_reports'] = row['total_reports'] - sum(
+                row[field] for field in REASON_FIELDS.values() if field != 'other_reports'
+            )
+            rows.append(ReportTarget(
+                target_type=target_type,
+                target_id=target_id,
+                artwork_id=target_id if target_type == 'artwork' else None,
+                comment_id=target_id if target_type == 'comment' else None,
+                **row,
+            ))
+
+    ReportTarget.objects.all().delete()
+    ReportTarget.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
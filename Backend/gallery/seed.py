@@ -0,0 +1,285 @@
+"""
+Synthetic dataset for benchmarks and load tests
+seed() bulk-creates users (with profiles), categories, artworks with small
+generated images, likes, comments, reports, discussions, replies and finished
+generation jobs, spread over the last `days` days with a skewed popularity
+(a few artworks get most likes and comments, as in production). The data
+depend only on `seed`.
+
+bulk_create skips save() and the signals, so the rollups they maintain are
+rebuilt at the end: report targets, creator scores, evaluations and the
+leaderboard (evaluate_all) and the daily stats.
+"""
+
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from .admin_stats import rollup_daily_stats
+from .models import (
+    Artwork, Category, Comment, Discussion, GenerationJob, Like, Reply, Report, UserProfile,
+)
+from .report_targets import rebuild_report_targets
+
+
+# Counts at scale 1
+DEFAULT_COUNTS = {
+    'users': 50,
+    'categories': 8,
+    'artworks': 200,
+    'likes': 2000,
+    'comments': 600,
+    'reports': 60,
+    'discussions': 40,
+    'replies': 200,
+    'jobs': 10,
+}
+# Categories do not grow with the dataset
+FIXED_COUNTS = {'categories'}
+# At least one job of each kind
+MINIMUM_COUNTS = {'jobs': 2}
+
+USERNAME_PREFIX = 'seed_user_'
+STAFF_USERNAME = 'seed_staff'
+# Generated images are shared between artworks
+IMAGE_POOL = 24
+IMAGE_SIZE = (96, 96)
+
+CATEGORY_NAMES = [
+    'Painting', 'Photography', 'Digital', 'Sculpture', 'Illustration', 'Street Art',
+    'Watercolor', 'Pixel Art', 'Collage', 'Ink', 'Pastel', 'Generative',
+]
+DISCUSSION_CATEGORIES = ['General', 'Techniques', 'Critique', 'Events', 'Materials']
+WORDS = (
+    'light colour canvas brush texture shadow line form contrast palette study portrait landscape '
+    'abstract detail layer tone warm cold composition sketch motion calm bold soft sharp depth '
+    'balance rhythm grain glaze stroke horizon figure pattern surface'
+).split()
+LOCATIONS = ['Paris', 'Tunis', 'Lyon', 'Berlin', 'Montreal', 'Lisbon', 'Sousse', 'Madrid', '']
+
+
+def counts_for(scale=1, **overrides):
+    """DEFAULT_COUNTS multiplied by `scale`, then the explicit overrides (None = not given)"""
+    counts = {
+        name: count if name in FIXED_COUNTS else max(MINIMUM_COUNTS.get(name, 1), round(count * scale))
+        for name, count in DEFAULT_COUNTS.items()
+    }
+    counts.update({name: count for name, count in overrides.items() if count is not None})
+    return counts
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Let bulk_create keep the created_at/updated_at values set on the objects
+    (auto_now and auto_now_add would overwrite them with the current time)
+    """
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def sentence(rng, words=8):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def generate_images(rng, count):
+    """Save `count` small gradient JPEGs; return their storage names"""
+    names = []
+    for i in range(count):
+        start = [rng.randrange(256) for _ in range(3)]
+        end = [rng.randrange(256) for _ in range(3)]
+        image = Image.new('RGB', IMAGE_SIZE)
+        width = IMAGE_SIZE[0]
+        image.putdata([
+            tuple(start[c] + (end[c] - start[c]) * x // width for c in range(3))
+            for _ in range(IMAGE_SIZE[1]) for x in range(width)
+        ])
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=80)
+        names.append(default_storage.save(f'artworks/seed/{i}.jpg', ContentFile(buffer.getvalue())))
+    return names
+
+
+class Seeder:
+    def __init__(self, counts, seed=0, days=365, password='secret', images=True, batch_size=500, log=None):
+        self.counts = counts
+        self.rng = random.Random(seed)
+        self.days = days
+        self.password = password
+        self.images = images
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+
+    def moment(self, after=None):
+        """A random datetime within the seeded period (after `after` if given)"""
+        start = after or self.now - timedelta(days=self.days)
+        return start + (self.now - start) * self.rng.random()
+
+    def popular(self, items, k):
+        """k picks favouring the first items (Zipf-like popularity)"""
+        weights = [1 / (rank + 1) ** 0.8 for rank in range(len(items))]
+        return self.rng.choices(items, weights=weights, k=k)
+
+    def bulk(self, model, objects):
+        created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.log(f'{len(created)} {str(model._meta.verbose_name_plural).lower()}')
+        return created
+
+    def users(self):
+        # One hash for everybody: hashing is by far the slowest part otherwise
+        password = make_password(self.password)
+        start = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        users = [
+            User(username=f'{USERNAME_PREFIX}{start + i}', email=f'{USERNAME_PREFIX}{start + i}@example.com',
+                 password=password, date_joined=self.moment())
+            for i in range(self.counts['users'])
+        ]
+        users = self.bulk(User, users)
+        if not User.objects.filter(username=STAFF_USERNAME).exists():
+            User.objects.create(username=STAFF_USERNAME, email=f'{STAFF_USERNAME}@example.com',
+                                password=password, is_staff=True)
+        self.bulk(UserProfile, [
+            UserProfile(user=user, bio=sentence(self.rng, 12), location=self.rng.choice(LOCATIONS))
+            for user in users
+        ])
+        return users
+
+    def categories(self):
+        existing = {category.name: category for category in Category.objects.all()}
+        wanted = (CATEGORY_NAMES * (self.counts['categories'] // len(CATEGORY_NAMES) + 1))[:self.counts['categories']]
+        names = [name if i < len(CATEGORY_NAMES) else f'{name} {i}' for i, name in enumerate(wanted)]
+        self.bulk(Category, [Category(name=name, description=sentence(self.rng)) for name in names
+                             if name not in existing])
+        return list(Category.objects.filter(name__in=names))
+
+    def artworks(self, users, categories):
+        images = generate_images(self.rng, min(IMAGE_POOL, self.counts['artworks'])) if self.images else []
+        styles = [style for style, _ in Artwork.STYLE_CHOICES]
+        artists = self.popular(users, self.counts['artworks'])
+        artworks = []
+        for i, artist in enumerate(artists):
+            created = self.moment(after=artist.date_joined)
+            artworks.append(Artwork(
+                title=f'{sentence(self.rng, 3)[:-1]} #{i}', description=sentence(self.rng, 20), artist=artist,
+                category=self.rng.choice(categories), style=self.rng.choice(styles),
+                image=images[i % len(images)] if images else f'artworks/seed/{i % IMAGE_POOL}.jpg',
+                created_at=created, updated_at=created, is_featured=self.rng.random() < 0.05,
+                views=int(self.rng.paretovariate(1.2) * 10), price=self.rng.randrange(0, 500),
+                is_active=self.rng.random() > 0.02,
+            ))
+        # Newest first, so that "popular" also means recent
+        artworks.sort(key=lambda artwork: artwork.created_at, reverse=True)
+        return self.bulk(Artwork, artworks)
+
+    def likes(self, users, artworks):
+        wanted = min(self.counts['likes'], len(users) * len(artworks))
+        pairs = set()
+        while len(pairs) < wanted:
+            for artwork in self.popular(artworks, wanted - len(pairs)):
+                pairs.add((self.rng.choice(users), artwork))
+        self.bulk(Like, [Like(user=user, artwork=artwork, created_at=self.moment(after=artwork.created_at))
+                         for user, artwork in pairs])
+
+    def comments(self, users, artworks):
+        comments = []
+        for artwork in self.popular(artworks, self.counts['comments']):
+            created = self.moment(after=artwork.created_at)
+            comments.append(Comment(user=self.rng.choice(users), artwork=artwork, content=sentence(self.rng, 10),
+                                    created_at=created, updated_at=created, is_active=self.rng.random() > 0.02))
+        return self.bulk(Comment, comments)
+
+    def reports(self, users, artworks, comments):
+        reasons = [reason for reason, _ in Report.REPORT_CHOICES]
+        reports = []
+        for _ in range(self.counts['reports']):
+            artwork = comment = None
+            if self.rng.random() < 0.6 or not comments:
+                artwork = self.rng.choice(artworks)
+                created = self.moment(after=artwork.created_at)
+            else:
+                comment = self.rng.choice(comments)
+                created = self.moment(after=comment.created_at)
+            resolved = self.rng.random() < 0.3
+            reports.append(Report(
+                reporter=self.rng.choice(users), artwork=artwork, comment=comment, reason=self.rng.choice(reasons),
+                description=sentence(self.rng, 6), created_at=created, resolved=resolved,
+                resolved_at=self.moment(after=created) if resolved else None,
+            ))
+        self.bulk(Report, reports)
+
+    def discussions(self, users):
+        discussions = []
+        for _ in range(self.counts['discussions']):
+            created = self.moment()
+            discussions.append(Discussion(
+                title=sentence(self.rng, 5)[:-1], content=sentence(self.rng, 30), author=self.rng.choice(users),
+                created_at=created, updated_at=created, likes=self.rng.randrange(50),
+                category=self.rng.choice(DISCUSSION_CATEGORIES),
+            ))
+        discussions = self.bulk(Discussion, discussions)
+
+        replies = []
+        for discussion in self.popular(discussions, self.counts['replies']):
+            replies.append(Reply(discussion=discussion, author=self.rng.choice(users), content=sentence(self.rng, 12),
+                                 created_at=self.moment(after=discussion.created_at), likes=self.rng.randrange(10)))
+            discussion.replies += 1
+        self.bulk(Reply, replies)
+        Discussion.objects.bulk_update(discussions, ['replies'], batch_size=self.batch_size)
+
+    def jobs(self, users):
+        jobs = []
+        for i in range(self.counts['jobs']):
+            kind = 'tutorial' if i % 2 else 'description'
+            created = self.moment()
+            jobs.append(GenerationJob(
+                kind=kind, input_hash=f'seed-{kind}-{i}', params={'topic': sentence(self.rng, 3)},
+                status='done', result={'content': sentence(self.rng, 40)}, attempts=1,
+                requested_by=self.rng.choice(users), created_at=created, started_at=created,
+                finished_at=created + timedelta(seconds=self.rng.randrange(2, 30)),
+            ))
+        self.bulk(GenerationJob, jobs)
+
+    def run(self):
+        with transaction.atomic(), explicit_timestamps(Artwork, Comment, Like, Report, Discussion, Reply,
+                                                       GenerationJob):
+            users = self.users()
+            categories = self.categories()
+            artworks = self.artworks(users, categories)
+            self.likes(users, artworks)
+            comments = self.comments(users, artworks)
+            self.reports(users, artworks, comments)
+            self.discussions(users)
+            self.jobs(users)
+
+        self.log(f'{rebuild_report_targets()} report targets')
+        call_command('evaluate_all', stdout=io.StringIO())
+        self.log('creator scores, evaluations and leaderboard')
+        self.log(f'{rollup_daily_stats(days=self.days + 1)} days of daily stats')
+
+
+def seed(counts=None, **options):
+    """Create a synthetic dataset (see Seeder for the options); return the counts used"""
+    counts = counts or counts_for()
+    Seeder(counts, **options).run()
+    return counts
@@ -28,8 +28,8 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'is_staff']  # is_staff should not be editable via API
     
     def get_artworks_count(self, obj):
-        """Get the count of artworks for this user"""
-        return obj.artworks.count()
+        """Get the count of artworks for this user (hidden ones excluded)"""
+        return obj.artworks.filter(is_active=True).count()
 
 
 class SimpleUserSerializer(serializers.ModelSerializer):
@@ -86,15 +86,22 @@ class ArtworkSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'artist', 'views', 'created_at', 'updated_at']
 
     def get_likes_count(self, obj):
-        """Get the count of likes for this artwork"""
+        """Get the count of likes for this artwork (annotated `likes_count` if the queryset has it)"""
+        if hasattr(obj, 'likes_count'):
+            return obj.likes_count
         return obj.likes.count()
     
     def get_comments_count(self, obj):
-        """Get the count of comments for this artwork"""
-        return obj.comments.count()
+        """Get the count of comments for this artwork (annotated `comments_count` if the queryset has it)"""
+        if hasattr(obj, 'comments_count'):
+            return obj.comments_count
+        return obj.comments.filter(is_active=True).count()
     
     def get_is_liked(self, obj):
-        """Check if the current user has liked this artwork"""
+        """Check if the current user has liked this artwork (`liked_ids` context: ids liked, loaded once)"""
+        liked_ids = self.context.get('liked_ids')
+        if liked_ids is not None:
+            return obj.id in liked_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.likes.filter(user=request.user).exists()
@@ -149,7 +156,8 @@ class ReportSerializer(serializers.ModelSerializer):
         art = getattr(obj, 'artwork', None)
         if art is None and getattr(obj, 'comment', None) is not None:
             art = getattr(obj.comment, 'artwork', None)
-        if art is None:
+        # Une œuvre masquée par la modération est traitée comme supprimée
+        if art is None or not art.is_active:
             return None
 
         # image: gère FileField/ImageField .url ou string
@@ -181,11 +189,13 @@ class ReportSerializer(serializers.ModelSerializer):
         (utile pour l’admin UI quand report.artwork est nul).
         """
         c = getattr(obj, 'comment', None)
-        if c is None:
+        if c is None or not c.is_active:
             return None
 
         # sécurise artwork imbriqué si disponible
         art = getattr(c, 'artwork', None)
+        if art is not None and not art.is_active:
+            art = None
 
         def img_url(a):
             if not a:
@@ -305,8 +315,8 @@ class AdminUserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'date_joined', 'last_login']
     
     def get_artworks_count(self, obj):
-        """Get the count of artworks for this user"""
-        return obj.artworks.count()
+        """Get the count of artworks for this user (hidden ones excluded)"""
+        return obj.artworks.filter(is_active=True).count()
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -332,7 +342,7 @@ class ArtworkSerializer(serializers.ModelSerializer):
     artist = UserSerializer(read_only=True)
     likes_count = serializers.IntegerField(read_only=True)
     comments_count = serializers.IntegerField(read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
+    comments = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     category = serializers.StringRelatedField()
     
@@ -345,6 +355,10 @@ class ArtworkSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
     
+    def get_comments(self, obj):
+        # Comments hidden by moderation are left out
+        return CommentSerializer(obj.comments.filter(is_active=True), many=True, context=self.context).data
+
     def get_is_liked(self, obj):
         request = self.context.get('request')
         user = self.context.get('user')
@@ -0,0 +1,34 @@
+"""
+Session engine: cache first, database behind (django's cached_db)
+Set SESSION_ENGINE = 'gallery.sessions'. Cache entries live at most
+SESSION_CACHE_TTL seconds, so with a per-process cache a session deleted by
+another worker (logout) stops being served from this worker's cache soon after.
+"""
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.core.cache import caches
+
+
+class CappedTimeoutCache:
+    """Cache proxy that never stores an entry for longer than `max_timeout`"""
+
+    def __init__(self, cache, max_timeout):
+        self._cache = cache
+        self.max_timeout = max_timeout
+
+    def set(self, key, value, timeout=None):
+        timeout = self.max_timeout if timeout is None else min(timeout, self.max_timeout)
+        self._cache.set(key, value, timeout)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+
+class SessionStore(cached_db.SessionStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = CappedTimeoutCache(caches[settings.SESSION_CACHE_ALIAS], settings.SESSION_CACHE_TTL)
@@ -0,0 +1,75 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from . import report_targets, user_summaries
+from .models import Artwork, Report, UserProfile
+
+
+# Sent once a views increment has been written to the database
+# kwargs: artwork_id, artist_id, count
+artwork_viewed = Signal()
+
+# Sent by bulk moderation once artworks and comments were hidden with a queryset update
+# kwargs: artists ({artist_id: {'uploads', 'likes', 'views'}} removed from view), user_ids
+content_deactivated = Signal()
+
+
+# ---- User summary invalidation (see user_summaries.py) ----
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # login() only touches last_login, which is not part of the summary
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    user_summaries.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    user_summaries.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    user_summaries.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Artwork)
+def artwork_saved(sender, instance, created, **kwargs):
+    if created:
+        user_summaries.invalidate(instance.artist_id)
+
+
+@receiver(post_delete, sender=Artwork)
+def artwork_deleted(sender, instance, **kwargs):
+    user_summaries.invalidate(instance.artist_id)
+
+
+@receiver(content_deactivated)
+def content_hidden(sender, user_ids, **kwargs):
+    # artworks_count only counts active artworks
+    user_summaries.invalidate(*user_ids)
+
+
+# ---- Report rollup (see report_targets.py) ----
+
+@receiver(pre_save, sender=Report)
+def report_saving(sender, instance, update_fields=None, **kwargs):
+    report_targets.remember_state(instance, update_fields)
+
+
+@receiver(post_save, sender=Report)
+def report_saved(sender, instance, created, **kwargs):
+    report_targets.record_saved(instance, created)
+
+
+@receiver(pre_delete, sender=Report)
+def report_deleting(sender, instance, **kwargs):
+    report_targets.remember_deleted(instance)
+
+
+@receiver(post_delete, sender=Report)
+def report_deleted(sender, instance, **kwargs):
+    report_targets.record_deleted(instance)
@@ -0,0 +1,180 @@
+"""
+Slow-query log
+SlowQueryMiddleware times every query of a request; those slower than
+SLOW_QUERY_THRESHOLD_MS are kept, with redacted parameters, the calling view
+and the request path (filters included), in a bounded in-process ring buffer
+read by the admin/slow-queries/ view. The backend's EXPLAIN output is
+captured once per normalised query shape (the last
+SLOW_QUERY_PLAN_CACHE_SIZE shapes are remembered), and plans reading a whole
+table are flagged.
+
+Each worker keeps its own buffer: the view shows the entries of the worker
+that serves it.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import ExitStack
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+from .metrics import view_label
+from .query_inspector import normalize_sql
+
+
+# `SCAN <table>` without `USING ... INDEX` in an SQLite plan reads the whole table
+FULL_SCAN = re.compile(r'^SCAN (?P<table>[^\s(]\S*)$')
+# `"gallery_like" U0`: the plan names subquery tables by their alias
+TABLE_ALIAS = re.compile(r'"(?P<table>\w+)" (?P<alias>[A-Z]\d+)\b')
+
+_entries = deque(maxlen=settings.SLOW_QUERY_BUFFER_SIZE)
+# Normalised shape -> plan, so each shape is explained once per process;
+# least recently used first, at most SLOW_QUERY_PLAN_CACHE_SIZE shapes
+_plans = OrderedDict()
+_lock = threading.Lock()
+
+
+def redact(value):
+    """Keep what helps reading a plan (numbers, dates, booleans), hide text"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (Decimal, date, datetime)):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, (bytes, memoryview)):
+        return f'<{len(value)} bytes>'
+    return f'<str {len(str(value))}>'
+
+
+def explain(connection, sql, params):
+    """The plan of a SELECT as a list of lines (empty if the backend refuses)"""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return []
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        # The backend cursor, below Django's execute wrappers: the EXPLAIN is
+        # not recorded here nor counted by query budgets and Server-Timing
+        cursor = connection.create_cursor()
+        try:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    # SQLite: (id, parent, notused, detail); others: one text column
+    return [str(row[-1]) for row in rows]
+
+
+def full_scans(sql, plan):
+    """Tables the plan reads in full, subquery aliases resolved"""
+    aliases = {match['alias']: match['table'] for match in TABLE_ALIAS.finditer(sql)}
+    return [aliases.get(match['table'], match['table']) for match in map(FULL_SCAN.match, plan) if match]
+
+
+def cached_plan(connection, shape, sql, params):
+    with _lock:
+        plan = _plans.get(shape)
+        if plan is not None:
+            _plans.move_to_end(shape)
+            return plan
+    plan = explain(connection, sql, params)
+    with _lock:
+        _plans[shape] = plan
+        _plans.move_to_end(shape)
+        while len(_plans) > settings.SLOW_QUERY_PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
+
+
+def record(connection, request, sql, params, duration):
+    shape = normalize_sql(sql)
+    plan = cached_plan(connection, shape, sql, params)
+
+    entry = {
+        'at': timezone.now().isoformat(),
+        'duration_ms': round(duration * 1000, 2),
+        'alias': connection.alias,
+        'view': view_label(request),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'sql': sql[:4000],
+        'params': redact(list(params)) if params is not None else None,
+        'shape': shape[:4000],
+        'plan': plan,
+        'full_scans': full_scans(sql, plan),
+    }
+    with _lock:
+        _entries.append(entry)
+    print(f"[slow-query] {entry['duration_ms']} ms in {entry['view']} ({entry['path']}): {shape[:200]}")
+
+
+def entries(view=None):
+    """Recorded slow queries, newest first"""
+    with _lock:
+        recorded = list(_entries)
+    recorded.reverse()
+    if view:
+        recorded = [entry for entry in recorded if entry['view'] == view]
+    return recorded
+
+
+def shapes(recorded):
+    """Per-shape summary of entries: count, total and max duration, view(s), plan"""
+    summary = {}
+    for entry in recorded:
+        row = summary.setdefault(entry['shape'], {
+            'shape': entry['shape'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'views': set(), 'plan': entry['plan'], 'full_scans': entry['full_scans'],
+        })
+        row['count'] += 1
+        row['total_ms'] += entry['duration_ms']
+        row['max_ms'] = max(row['max_ms'], entry['duration_ms'])
+        row['views'].add(entry['view'])
+    rows = sorted(summary.values(), key=lambda row: -row['total_ms'])
+    for row in rows:
+        row['total_ms'] = round(row['total_ms'], 2)
+        row['views'] = sorted(row['views'])
+    return rows
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _plans.clear()
+
+
+class SlowQueryMiddleware:
+    """Record the queries of each request slower than SLOW_QUERY_THRESHOLD_MS"""
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+
+    def __call__(self, request):
+        def timed_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                duration = time.perf_counter() - started
+                if duration >= self.threshold and not many:
+                    try:
+                        record(context['connection'], request, sql, params, duration)
+                    except Exception as e:
+                        print(f"Slow-query log error: {str(e)}")
+
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(timed_query))
+            return self.get_response(request)
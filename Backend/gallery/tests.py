@@ -1,3 +1,1712 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import timedelta
+from http.server import ThreadingHTTPServer
+from unittest import mock, skipIf
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, router, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, resolve
+from django.utils import timezone
+from evaluation import creator_scores
+from evaluation.models import CreatorScore
+from evaluation.scoring import with_contribution_stats
+
+from . import (
+    admin_stats, ai_description_service, ai_service, ai_singleflight, benchmarks, jobs, metrics, slow_queries,
+    user_summaries, views,
+)
+from .ai_router import CircuitOpenError, ModelRouter
+from .ai_metering import CallMeter, rolling_aggregates
+from .ai_singleflight import SharedCallError, SingleFlight, fcntl
+from .ai_streaming import TutorialSectionParser, stream_text
+from .alloc_profiler import AllocationProfilerMiddleware, deploy_comparison
+from .benchmarks import ANONYMOUS, STAFF, USER
+from .db import read_only_request
+from .management.commands.fake_llm_server import LatencyModel, make_handler
+from .models import (
+    AICallRecord, AllocationProfile, Artwork, Category, Comment, DailyStats, Discussion, GenerationJob, Like,
+    Report, ReportTarget, UserProfile,
+)
+from .query_inspector import QueryBudgetExceeded, QueryInspectorMiddleware, normalize_sql, query_budget
+from .report_targets import rebuild_report_targets
+from .seed import counts_for, seed
+from .serializers import ArtworkSerializer, ReportSerializer
+from .sessions import CappedTimeoutCache, SessionStore
+from .timing import ServerTimingMiddleware, Timings, phase
+
+
+class FakeModels:
+    """fn(model, timeout) for ModelRouter: `failing` raise, `slow` sleep first; calls are recorded"""
+
+    def __init__(self, failing=(), slow=None, delay=0.3):
+        self.failing = set(failing)
+        self.slow = slow
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, model, timeout):
+        self.calls.append((model, timeout))
+        if model == self.slow:
+            time.sleep(self.delay)
+        if model in self.failing:
+            raise TimeoutError(f'{model} timed out')
+        return model
+
+
+class ModelRouterTests(SimpleTestCase):
+    """Circuit breaker, fallback budget and hedging of the AI model router (ai_router.py)"""
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        router = ModelRouter(['a', 'b'], failure_threshold=2, recovery_timeout=60)
+        models = FakeModels(failing={'a'})
+        for _ in range(3):
+            self.assertEqual(router.call(models, timeout=1), 'b')
+        # The third call skipped `a` without waiting for it
+        self.assertEqual([model for model, _ in models.calls], ['a', 'b', 'a', 'b', 'b'])
+        self.assertEqual(router.snapshot()['models'][0]['state'], 'open')
+
+    def test_half_open_trial_closes_the_circuit(self):
+        router = ModelRouter(['a', 'b'], failure_threshold=1, recovery_timeout=0)
+        router.call(FakeModels(failing={'a'}), timeout=1)
+        self.assertEqual(router.call(FakeModels(), timeout=1), 'a')
+        self.assertEqual(router.snapshot()['models'][0]['state'], 'closed')
+
+    def test_every_circuit_open(self):
+        router = ModelRouter(['a'], failure_threshold=1, recovery_timeout=60)
+        with self.assertRaises(TimeoutError):
+            router.call(FakeModels(failing={'a'}), timeout=1)
+        with self.assertRaises(CircuitOpenError):
+            router.call(FakeModels(), timeout=1)
+
+    def test_fallback_gets_its_own_slice_once_the_budget_is_spent(self):
+        router = ModelRouter(['a', 'b', 'c'], fallback_timeout=0.5)
+        models = FakeModels(failing={'a', 'b'}, slow='a', delay=0.1)
+        with self.assertRaises(TimeoutError):
+            router.call(models, timeout=0.05)
+        # `b` still runs, with fallback_timeout; `c` does not get a second extension
+        self.assertEqual([model for model, _ in models.calls], ['a', 'b'])
+        self.assertEqual(models.calls[1][1], 0.5)
+
+    def test_hedge_starts_the_next_model_past_the_p95(self):
+        router = ModelRouter(['a', 'b'], hedge=True, hedge_min_samples=2)
+        router.record_success('a', 0.01)
+        router.record_success('a', 0.01)
+        models = FakeModels(slow='a', delay=0.5)
+        started = time.monotonic()
+        self.assertEqual(router.call(models, timeout=2), 'b')
+        self.assertLess(time.monotonic() - started, 0.4)
+
+    def test_stream_falls_back_before_the_first_chunk_only(self):
+        router = ModelRouter(['a', 'b'])
+
+        def chunks(model, timeout):
+            if model == 'a':
+                raise ConnectionError('a is down')
+            yield from ('x', 'y')
+
+        self.assertEqual(list(router.stream(chunks, timeout=1)), ['x', 'y'])
+        self.assertEqual(router.snapshot()['models'][0]['consecutive_failures'], 1)
+
+
+@skipIf(fcntl is None, 'cross-worker coalescing needs fcntl')
+class SingleFlightTests(SimpleTestCase):
+    """Coalescing of identical AI calls across threads and workers (ai_singleflight.py)"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def flight(self):
+        """A SingleFlight sharing the directory: stands for another worker"""
+        return SingleFlight(directory=self.directory, wait_timeout=2)
+
+    def test_only_enum_like_arguments_are_folded(self):
+        flight = self.flight()
+        key = flight.make_key('tutorial', {'topic': 'Ink', 'language': 'en'}, folded=('language',))
+        self.assertEqual(key, flight.make_key('tutorial', {'topic': 'Ink', 'language': ' EN'}, folded=('language',)))
+        self.assertNotEqual(key, flight.make_key('tutorial', {'topic': 'ink', 'language': 'en'},
+                                                 folded=('language',)))
+
+    def test_user_entered_styles_are_not_folded(self):
+        # Artwork.style and the description form's fields reach the prompt verbatim
+        keys = []
+        with mock.patch.object(ai_singleflight.singleflight, 'do', side_effect=lambda key, fn: keys.append(key)):
+            for style in ('Ink wash', 'ink  wash'):
+                ai_service.generate_comment_suggestions('Dunes', 'Sand', style)
+                ai_description_service.generate_artwork_description('Dunes', style.upper(), style)
+        self.assertEqual(len(set(keys)), 4)
+
+    def test_threads_share_one_call(self):
+        flight = self.flight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'result'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do('key', slow))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(calls), results), (1, ['result'] * 5))
+
+    def run_follower(self, fn):
+        """Run fn through another worker's SingleFlight while this one leads; return its outcome"""
+        started = threading.Event()
+        outcome = {}
+
+        def follower():
+            started.set()
+            try:
+                outcome['result'] = self.flight().do('key', fn)
+            except Exception as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=follower)
+        return started, outcome, thread
+
+    def test_workers_share_the_leaders_result(self):
+        upstream = []
+        started, outcome, thread = self.run_follower(lambda: upstream.append('follower') or 'own')
+
+        def leader():
+            thread.start()
+            started.wait()
+            time.sleep(0.2)  # the follower is waiting on the lock
+            upstream.append('leader')
+            return 'shared'
+
+        self.assertEqual(self.flight().do('key', leader), 'shared')
+        thread.join()
+        self.assertEqual((outcome, upstream), ({'result': 'shared'}, ['leader']))
+
+    def test_workers_get_the_leaders_failure_without_calling_upstream(self):
+        upstream = []
+        started, outcome, thread = self.run_follower(lambda: upstream.append('follower'))
+
+        def leader():
+            thread.start()
+            started.wait()
+            time.sleep(0.2)
+            raise ConnectionError('upstream is down')
+
+        with self.assertRaises(ConnectionError):
+            self.flight().do('key', leader)
+        thread.join()
+        self.assertIsInstance(outcome['error'], SharedCallError)
+        self.assertEqual(upstream, [])
+
+    def test_prune_keeps_held_locks_and_recent_results(self):
+        flight = self.flight()
+        flight.do('old', lambda: 'x')
+        flight.do('recent', lambda: 'y')
+        old_result = os.path.join(self.directory, 'old.json')
+        os.utime(old_result, (time.time() - 60, time.time() - 60))
+        held = open(os.path.join(self.directory, 'held.lock'), 'a+')
+        self.addCleanup(held.close)
+        fcntl.flock(held.fileno(), fcntl.LOCK_EX)
+
+        flight.prune()
+        self.assertEqual(sorted(os.listdir(self.directory)), ['held.lock', 'recent.json'])
+
+
+TUTORIAL = {
+    'title': 'Ink washes',
+    'introduction': 'Learn "wet" {washes}, step by step.',
+    'materials': ['Ink', 'Brush'],
+    'steps': [{'step': 1, 'title': 'Dilute', 'description': 'Mix 1:3'},
+              {'step': 2, 'title': 'Lay', 'description': 'Work fast, {wet} on wet'}],
+    'tips': ['Test on scrap paper'],
+    'conclusion': 'Practice.',
+}
+
+
+def sse_events(response):
+    """(event, data) pairs of a text/event-stream response"""
+    text = b''.join(response.streaming_content).decode()
+    return [
+        (block.split('\n')[0].removeprefix('event: '), json.loads(block.split('\n')[1].removeprefix('data: ')))
+        for block in text.strip().split('\n\n')
+    ]
+
+
+class TutorialStreamingTests(TestCase):
+    """Incremental tutorial parser (ai_streaming.py) and the SSE views"""
+
+    def parse(self, text, chunk_size):
+        parser = TutorialSectionParser()
+        events = []
+        for start in range(0, len(text), chunk_size):
+            events.extend(parser.feed(text[start:start + chunk_size]))
+        return events
+
+    def test_sections_and_steps_are_emitted_as_they_complete(self):
+        text = '```json\n' + json.dumps(TUTORIAL, indent=2) + '\n```'
+        expected = [('section', 'title', 'Ink washes'),
+                    ('section', 'introduction', TUTORIAL['introduction']),
+                    ('section', 'materials', ['Ink', 'Brush']),
+                    ('step', 'steps', TUTORIAL['steps'][0]),
+                    ('step', 'steps', TUTORIAL['steps'][1]),
+                    ('section', 'tips', ['Test on scrap paper']),
+                    ('section', 'conclusion', 'Practice.')]
+        for chunk_size in (1, 7, len(text)):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(text, chunk_size), expected)
+
+    def test_step_is_emitted_before_the_document_ends(self):
+        text = json.dumps(TUTORIAL)
+        cut = text.index('{"step": 2')
+        self.assertEqual([kind for kind, _, _ in self.parse(text[:cut], 5)][-1], 'step')
+
+    def test_tutorial_stream_view(self):
+        def stream_tutorial(**params):
+            yield 'section', {'key': 'title', 'value': 'Ink washes'}
+            yield 'done', dict(TUTORIAL, **params)
+
+        with mock.patch('gallery.ai_service.stream_tutorial', stream_tutorial):
+            response = self.client.post('/tutorials/generate/stream/', {'topic': 'ink'},
+                                        content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = sse_events(response)
+        self.assertEqual([event for event, _ in events], ['section', 'done'])
+        self.assertEqual(events[1][1]['topic'], 'ink')
+
+    def test_errors_do_not_leak_upstream_details(self):
+        def stream_tutorial(**params):
+            raise ConnectionError('https://upstream.example/v1 key=sk-123 refused')
+            yield
+
+        with mock.patch('gallery.ai_service.stream_tutorial', stream_tutorial), \
+                redirect_stdout(io.StringIO()) as output:
+            response = self.client.post('/tutorials/generate/stream/', {'topic': 'ink'},
+                                        content_type='application/json')
+            events = sse_events(response)
+        self.assertEqual(events, [('error', {'error': 'Failed to generate tutorial'})])
+        self.assertIn('key=sk-123', output.getvalue())
+
+        with mock.patch('gallery.views.stream_groq_ai', stream_tutorial), redirect_stdout(io.StringIO()):
+            response = self.client.post('/generate-technique/stream/', {'prompt': 'ink'},
+                                        content_type='application/json')
+            self.assertEqual(sse_events(response), [('error', {'error': 'Failed to generate technique'})])
+
+
+TUTORIAL_PARAMS = {'topic': 'Ink washes', 'skill_level': 'beginner', 'language': 'en'}
+
+
+class JobQueueTests(TestCase):
+    """AI generation job queue (jobs.py) and its endpoints"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'secret')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'secret')
+
+    def test_identical_requests_share_a_job(self):
+        job = jobs.enqueue('tutorial', TUTORIAL_PARAMS)
+        self.assertEqual(jobs.enqueue('tutorial', dict(TUTORIAL_PARAMS, language=' EN'), self.alice), job)
+        # Free text is not folded: it reaches the prompt
+        self.assertNotEqual(jobs.enqueue('tutorial', dict(TUTORIAL_PARAMS, topic='ink washes')), job)
+
+    def test_description_jobs_are_per_user(self):
+        params = {'title': 'Dunes', 'category': 'Painting', 'style': None}
+        self.assertNotEqual(jobs.enqueue('description', params, self.alice),
+                            jobs.enqueue('description', params, self.bob))
+
+    def test_description_styles_are_not_folded(self):
+        params = {'title': 'Dunes', 'category': 'Painting', 'style': 'Ink wash'}
+        job = jobs.enqueue('description', params, self.alice)
+        self.assertNotEqual(jobs.enqueue('description', dict(params, style='ink  wash'), self.alice), job)
+        self.assertNotEqual(jobs.enqueue('description', dict(params, category='painting'), self.alice), job)
+
+    def test_one_active_job_per_input(self):
+        job = jobs.enqueue('tutorial', TUTORIAL_PARAMS)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            GenerationJob.objects.create(kind='tutorial', input_hash=job.input_hash)
+        # The request that lost the race gets the active job
+        GenerationJob.objects.create(kind='tutorial', input_hash=job.input_hash, status='done',
+                                     finished_at=timezone.now() - jobs.JOB_RESULT_TTL * 2)
+        self.assertEqual(jobs.enqueue('tutorial', TUTORIAL_PARAMS), job)
+
+    def test_finished_jobs_expire(self):
+        job = jobs.enqueue('tutorial', TUTORIAL_PARAMS)
+        GenerationJob.objects.filter(pk=job.pk).update(status='done', finished_at=timezone.now())
+        self.assertEqual(jobs.enqueue('tutorial', TUTORIAL_PARAMS), job)
+        GenerationJob.objects.filter(pk=job.pk).update(finished_at=timezone.now() - jobs.JOB_RESULT_TTL * 2)
+        self.assertNotEqual(jobs.enqueue('tutorial', TUTORIAL_PARAMS), job)
+
+    def test_failed_attempts_are_retried_after_a_delay(self):
+        job = jobs.enqueue('tutorial', TUTORIAL_PARAMS)
+        with mock.patch.object(jobs, 'execute', side_effect=ConnectionError('down')), \
+                redirect_stdout(io.StringIO()):
+            for attempt in range(1, jobs.JOB_MAX_ATTEMPTS + 1):
+                claimed = jobs.claim_next('worker')
+                self.assertEqual((claimed.pk, claimed.attempts), (job.pk, attempt))
+                job = jobs.run_job(claimed)
+                if job.status == 'pending':
+                    self.assertGreater(job.run_after, timezone.now() + jobs.JOB_RETRY_DELAY * (attempt - 0.5))
+                    # Not due yet
+                    self.assertIsNone(jobs.claim_next('worker'))
+                    GenerationJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertEqual(job.status, 'failed')
+        # A new identical request does not requeue it right away
+        self.assertEqual(jobs.enqueue('tutorial', TUTORIAL_PARAMS), job)
+        GenerationJob.objects.filter(pk=job.pk).update(finished_at=timezone.now() - jobs.JOB_RETRY_DELAY * 2)
+        self.assertEqual(jobs.enqueue('tutorial', TUTORIAL_PARAMS).status, 'pending')
+
+    def test_stale_jobs_are_requeued_until_out_of_attempts(self):
+        job = jobs.enqueue('tutorial', TUTORIAL_PARAMS)
+        lost = jobs.enqueue('tutorial', dict(TUTORIAL_PARAMS, topic='Glazes'))
+        long_ago = timezone.now() - jobs.JOB_STALE_AFTER * 2
+        GenerationJob.objects.filter(pk=job.pk).update(status='running', started_at=long_ago, attempts=1)
+        GenerationJob.objects.filter(pk=lost.pk).update(status='running', started_at=long_ago,
+                                                        attempts=jobs.JOB_MAX_ATTEMPTS)
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        lost.refresh_from_db()
+        self.assertEqual((job.status, lost.status), ('pending', 'failed'))
+
+    def test_jobs_are_polled_by_public_id(self):
+        job = jobs.enqueue('tutorial', TUTORIAL_PARAMS)
+        response = self.client.get(f'/tutorials/jobs/{job.public_id}/')
+        self.assertEqual(response.json()['id'], str(job.public_id))
+        self.assertEqual(self.client.get(f'/tutorials/jobs/{job.pk}/').status_code, 404)
+
+    def test_description_jobs_are_readable_by_their_requester_only(self):
+        self.client.force_login(self.alice)
+        response = self.client.post('/artworks/generate-description/jobs/', {'title': 'Dunes'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        url = f"/artworks/generate-description/jobs/{response.json()['id']}/"
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.force_login(self.bob)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+FAKE_LLM_OPTIONS = {
+    'latency': 'fixed', 'latency_ms': 0, 'latency_spread': 0.5, 'ttft_ms': 0,
+    'tokens_per_second': 0, 'error_rate': 0.0, 'quiet': True,
+}
+
+
+class FakeLLMServerTests(TestCase):
+    """The fake OpenAI-compatible server (fake_llm_server) driven by the technique endpoints"""
+
+    def serve(self, **options):
+        """Start a fake server on a free port; point the technique calls at it"""
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(dict(FAKE_LLM_OPTIONS, **options)))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        patcher = mock.patch.object(views, 'GROQ_API_URL',
+                                    f'http://127.0.0.1:{server.server_address[1]}/openai/v1/chat/completions')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_latency_distributions(self):
+        self.addCleanup(random.setstate, random.getstate())
+        random.seed(0)
+        self.assertEqual(LatencyModel('fixed', 200, 0.5).sample(), 0.2)
+        for distribution in ('uniform', 'exponential', 'lognormal'):
+            samples = [LatencyModel(distribution, 200, 0.5).sample() for _ in range(4000)]
+            with self.subTest(distribution=distribution):
+                self.assertAlmostEqual(sum(samples) / len(samples), 0.2, delta=0.02)
+
+    def test_completion(self):
+        self.serve()
+        self.assertIn('Start with the big shapes', views.call_groq_ai('How do I start?'))
+
+    def test_stream(self):
+        self.serve()
+        self.assertEqual(''.join(views.stream_groq_ai('How do I start?')).strip(),
+                         ('Start with the big shapes, then refine edges and values. ' * 8).strip())
+
+    def test_injected_errors(self):
+        self.serve(error_rate=1.0)
+        self.assertTrue(views.call_groq_ai('How do I start?').startswith('Error from Groq API'))
+
+    def test_stalled_upstream_times_out(self):
+        self.serve(latency_ms=3000)
+        started = time.monotonic()
+        with mock.patch.object(views, 'GROQ_TIMEOUT', 0.2), self.assertRaises(requests.Timeout):
+            views.call_groq_ai('How do I start?')
+        self.assertLess(time.monotonic() - started, 2)
+
+
+def chunk(content=None, usage=None):
+    """One chunk of an OpenAI-style completion stream"""
+    choices = [mock.Mock(delta=mock.Mock(content=content))] if content is not None else []
+    return mock.Mock(choices=choices, usage=usage, x_groq=None)
+
+
+class AIMeteringTests(TestCase):
+    """Per-call AI metering (ai_metering.py) and the usage endpoint"""
+
+    MESSAGES = [{'role': 'user', 'content': 'Hello'}]
+
+    def test_successful_call(self):
+        with CallMeter('tutorial', 'm', self.MESSAGES) as meter:
+            meter.set_usage({'prompt_tokens': 12, 'completion_tokens': 30})
+        record = AICallRecord.objects.get()
+        self.assertEqual((record.endpoint, record.model, record.outcome), ('tutorial', 'm', 'ok'))
+        self.assertEqual((record.prompt_tokens, record.completion_tokens, record.ttft_ms), (12, 30, None))
+
+    def test_failures_are_classified(self):
+        for error, outcome in ((TimeoutError(), 'timeout'), (requests.ReadTimeout(), 'timeout'),
+                               (ValueError(), 'error')):
+            with self.subTest(error=type(error).__name__), self.assertRaises(type(error)):
+                with CallMeter('tutorial', 'm', self.MESSAGES):
+                    raise error
+            self.assertEqual(AICallRecord.objects.order_by('-pk').first().outcome, outcome)
+
+    def test_stream_records_ttft_usage_and_cancellation(self):
+        deltas = stream_text(lambda: iter([chunk('Hel'), chunk('lo'), chunk(usage={'completion_tokens': 2})]),
+                             CallMeter('tutorial_stream', 'm', self.MESSAGES))
+        self.assertEqual(''.join(deltas), 'Hello')
+        record = AICallRecord.objects.get()
+        self.assertEqual((record.outcome, record.completion_tokens), ('ok', 2))
+        self.assertIsNotNone(record.ttft_ms)
+
+        # The client went away after the first token
+        deltas = stream_text(lambda: iter([chunk('Hel'), chunk('lo')]), CallMeter('tutorial_stream', 'm', []))
+        next(deltas)
+        deltas.close()
+        self.assertEqual(AICallRecord.objects.order_by('-pk').first().outcome, 'cancelled')
+
+    def test_rolling_aggregates(self):
+        AICallRecord.objects.bulk_create(
+            [AICallRecord(endpoint='tutorial', model='m', outcome='ok', wall_ms=ms, prompt_tokens=10,
+                          completion_tokens=100, prompt_hash='same') for ms in (100, 200, 300, 400)]
+            + [AICallRecord(endpoint='tutorial', model='m', outcome='timeout', wall_ms=10000, prompt_hash='other'),
+               AICallRecord(endpoint='description', model='m', outcome='ok', wall_ms=50, prompt_hash='x')]
+        )
+        old = AICallRecord.objects.create(endpoint='tutorial', model='m', outcome='ok', wall_ms=1, prompt_hash='old')
+        AICallRecord.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(hours=2))
+
+        tutorial = next(row for row in rolling_aggregates(timedelta(hours=1)) if row['endpoint'] == 'tutorial')
+        self.assertEqual((tutorial['calls'], tutorial['errors'], tutorial['error_rate']), (5, 1, 0.2))
+        self.assertEqual((tutorial['prompt_tokens'], tutorial['completion_tokens']), (40, 400))
+        # Percentiles are over the successful calls only
+        self.assertEqual((tutorial['p50_wall_ms'], tutorial['p95_wall_ms']), (300, 400))
+        self.assertEqual(tutorial['repeat_prompt_ratio'], 0.6)
+
+    def test_usage_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get('/admin/ai-usage/').status_code, 302)
+        self.client.force_login(User.objects.create_user('staff', 'staff@example.com', 'secret', is_staff=True))
+        response = self.client.get('/admin/ai-usage/?window=60')
+        self.assertEqual(response.json(), {'window_seconds': 60, 'aggregates': []})
+
+
+class ReportQueueTests(TestCase):
+    """Keyset pagination and filters of the moderation queue (get_reports)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('moderator', password='pw', is_staff=True)
+        reporter = User.objects.create_user('reporter', password='pw')
+        # bulk_create: Artwork.save() would open the (missing) image file
+        artwork = Artwork.objects.bulk_create([
+            Artwork(title='Reported', description='', artist=reporter, image='artworks/test.jpg')
+        ])[0]
+        reports = Report.objects.bulk_create([
+            Report(reporter=reporter, artwork=artwork, reason=('spam', 'other')[i % 2], resolved=i < 3)
+            for i in range(7)
+        ])
+        # Ties on created_at must not lose or repeat a report across pages
+        Report.objects.filter(pk__in=[r.pk for r in reports[2:5]]).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def pages(self, query=''):
+        ids, url = [], f'/reports/all/?limit=2{query}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [report['id'] for report in response.json()]
+            cursor = response.get('X-Next-Cursor')
+            url = f'/reports/all/?limit=2{query}&cursor={cursor}' if cursor else None
+        return ids
+
+    def test_cursor_walks_the_whole_queue_once(self):
+        expected = list(Report.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(self.pages(), expected)
+
+    def test_filters(self):
+        for query, filters in (('&resolved=true', {'resolved': True}), ('&resolved=0', {'resolved': False}),
+                               ('&reason=spam&resolved=false', {'reason': 'spam', 'resolved': False})):
+            with self.subTest(query=query):
+                expected = Report.objects.filter(**filters).order_by('-created_at', '-id')
+                self.assertEqual(self.pages(query), list(expected.values_list('id', flat=True)))
+
+    def test_headers(self):
+        response = self.client.get('/reports/all/?limit=2&reason=spam')
+        self.assertEqual(response['X-Pending-Count'], '4')
+        self.assertIn('reason=spam', response['Link'])
+        self.assertIn(f"cursor={response['X-Next-Cursor']}", response['Link'])
+        self.assertNotIn('X-Next-Cursor', self.client.get('/reports/all/'))
+
+    def test_invalid_params(self):
+        for query in ('resolved=maybe', 'reason=rude', 'since=yesterday', 'limit=x', 'cursor=garbage'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/reports/all/?{query}').status_code, 400)
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/reports/all/').status_code, 302)
+
+class ReportRollupTests(TestCase):
+    """The ReportTarget rollup follows every save and delete of a Report"""
+
+    COUNTS = ('total_reports', 'pending_reports', 'inappropriate_reports', 'spam_reports',
+              'copyright_reports', 'other_reports')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('moderator', password='pw', is_staff=True)
+        cls.reporter = User.objects.create_user('reporter', password='pw')
+        # bulk_create: Artwork.save() would open the (missing) image file
+        cls.artworks = Artwork.objects.bulk_create([
+            Artwork(title=f'Reported {i}', description='', artist=cls.staff, image='artworks/test.jpg')
+            for i in range(2)
+        ])
+        cls.comment = Comment.objects.create(user=cls.staff, artwork=cls.artworks[0], content='Hi')
+
+    def report(self, **fields):
+        fields = {'reporter': self.reporter, 'artwork': self.artworks[0], 'reason': 'spam', **fields}
+        return Report.objects.create(**fields)
+
+    def rollup(self):
+        return {
+            (row['target_type'], row['target_id']): tuple(row[field] for field in self.COUNTS)
+            for row in ReportTarget.objects.values('target_type', 'target_id', *self.COUNTS)
+        }
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollup()
+        rebuild_report_targets()
+        self.assertEqual(incremental, self.rollup())
+
+    def test_older_report_moved_onto_a_target_keeps_its_dates(self):
+        older = self.report(artwork=self.artworks[1])
+        Report.objects.filter(pk=older.pk).update(created_at=timezone.now() - timedelta(days=3))
+        older.refresh_from_db()
+        self.report()
+        older.artwork = self.artworks[0]
+        older.save()
+
+        def dates():
+            return ReportTarget.objects.filter(target_type='artwork').values_list(
+                'target_id', 'first_reported_at', 'last_reported_at'
+            ).get()
+
+        incremental = dates()
+        self.assertEqual(incremental[1], older.created_at)
+        self.assertMatchesRebuild()
+        self.assertEqual(dates(), incremental)
+
+    def test_create_report_view(self):
+        with redirect_stdout(io.StringIO()):
+            response = self.client.post('/reports/', json.dumps({
+                'reporter_id': self.reporter.pk, 'comment_id': self.comment.pk, 'reason': 'copyright',
+            }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.rollup(), {('comment', self.comment.pk): (1, 1, 0, 0, 1, 0)})
+
+    def test_resolve_report_is_staff_only(self):
+        report = self.report()
+        self.assertEqual(self.client.post(f'/reports/{report.pk}/resolve/').status_code, 302)
+        self.client.force_login(self.reporter)
+        self.assertEqual(self.client.post(f'/reports/{report.pk}/resolve/').status_code, 302)
+        self.assertFalse(Report.objects.get(pk=report.pk).resolved)
+
+        self.client.force_login(self.staff)
+        for _ in range(2):
+            self.assertEqual(self.client.post(f'/reports/{report.pk}/resolve/').status_code, 200)
+        self.assertEqual(self.rollup()[('artwork', self.artworks[0].pk)][:2], (1, 0))
+        self.assertMatchesRebuild()
+
+    def test_edits_outside_the_views(self):
+        report = self.report()
+        self.report(reason='other')
+        report.reason = 'inappropriate'
+        report.save()
+        report.mark_resolved()
+        self.assertEqual(self.rollup(), {('artwork', self.artworks[0].pk): (2, 1, 1, 0, 0, 1)})
+        # Reopened, then moved to another target
+        report.resolved = False
+        report.save()
+        report.artwork = self.artworks[1]
+        report.save()
+        self.assertEqual(self.rollup(), {
+            ('artwork', self.artworks[0].pk): (1, 1, 0, 0, 0, 1),
+            ('artwork', self.artworks[1].pk): (1, 1, 1, 0, 0, 0),
+        })
+        self.assertMatchesRebuild()
+
+    def test_deletes(self):
+        first, second = self.report(), self.report(artwork=self.artworks[1], resolved=True)
+        self.report(artwork=self.artworks[1])
+        first.delete()
+        Report.objects.filter(pk=second.pk).only('pk').delete()
+        self.assertEqual(self.rollup(), {('artwork', self.artworks[1].pk): (1, 1, 0, 1, 0, 0)})
+        # Cascade from the reporter
+        self.reporter.delete()
+        self.assertEqual(self.rollup(), {})
+
+    def test_bulk_resolve(self):
+        reports = [self.report(), self.report(), self.report(comment=self.comment)]
+        self.client.force_login(self.staff)
+        response = self.client.post('/reports/bulk-resolve/', json.dumps({'ids': [r.pk for r in reports[1:]]}),
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {'resolved': 2})
+        self.assertEqual(self.rollup()[('artwork', self.artworks[0].pk)][:2], (2, 1))
+        self.assertMatchesRebuild()
+
+class BulkModerationTests(TestCase):
+    """Bulk ban/deactivate: hidden content leaves every read path, scores and summaries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('moderator', password='pw', is_staff=True)
+        cls.spammer = User.objects.create_user('spammer', password='pw')
+        cls.fan = User.objects.create_user('fan', password='pw')
+        # No image: Artwork.save() opens no file, and the creation signals run
+        cls.hidden = Artwork.objects.create(title='Spam', description='', artist=cls.spammer, views=40)
+        cls.kept = Artwork.objects.create(title='Art', description='', artist=cls.fan)
+        Like.objects.create(user=cls.fan, artwork=cls.hidden)
+        cls.comment = Comment.objects.create(user=cls.spammer, artwork=cls.kept, content='Buy now')
+        cls.report = Report.objects.create(reporter=cls.fan, artwork=cls.hidden, reason='spam')
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def post(self, url, body):
+        return self.client.post(url, json.dumps(body), content_type='application/json')
+
+    def ban(self, **options):
+        response = self.post('/admin/users/bulk-ban/', {'user_ids': [self.spammer.pk, self.staff.pk], **options})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_admin_api_routes_resolve_behind_the_admin_site(self):
+        self.assertEqual(resolve('/admin/users/').func, views.get_all_users)
+        self.assertEqual(resolve('/admin/stats/').func, views.get_admin_stats)
+        self.assertEqual(self.client.get('/admin/').status_code, 200)
+
+    def test_ban_never_bans_the_requesting_admin(self):
+        self.assertEqual(self.ban(), {'banned': 1, 'artworks_deactivated': 0, 'comments_deactivated': 0})
+        self.assertTrue(User.objects.get(pk=self.staff.pk).is_active)
+        self.assertTrue(Artwork.objects.get(pk=self.hidden.pk).is_active)
+
+    def test_ban_and_deactivate(self):
+        # Cached before the ban: must not be served stale afterwards
+        self.assertEqual(user_summaries.get(self.spammer.pk)['artworks_count'], 1)
+        self.assertEqual(self.ban(deactivate_content=True),
+                         {'banned': 1, 'artworks_deactivated': 1, 'comments_deactivated': 1})
+
+        score = CreatorScore.objects.get(pk=self.spammer.pk)
+        self.assertEqual((score.uploads, score.total_likes, score.total_views, score.score), (0, 0, 0, 0))
+        self.assertEqual(user_summaries.get(self.spammer.pk)['artworks_count'], 0)
+        stats = with_contribution_stats(User.objects.filter(pk=self.spammer.pk)).get()
+        self.assertEqual((stats.uploads, stats.total_likes, stats.total_views), (0, 0, 0))
+
+    def test_hidden_content_leaves_the_read_paths(self):
+        self.ban(deactivate_content=True)
+        self.client.force_login(self.fan)
+        self.assertEqual([a['id'] for a in self.client.get('/artworks/').json()], [self.kept.pk])
+        self.assertEqual(self.client.get(f'/artworks/{self.hidden.pk}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/artworks/{self.kept.pk}/').json()['comments'], [])
+        self.assertEqual(self.client.post(f'/artworks/{self.hidden.pk}/like/').status_code, 404)
+        self.assertEqual(self.client.get(f'/users/{self.spammer.username}/').json()['artworks_count'], 0)
+        with redirect_stdout(io.StringIO()):
+            response = self.post('/reports/', {'reporter_id': self.fan.pk, 'artwork_id': self.hidden.pk,
+                                               'reason': 'spam'})
+        self.assertEqual(response.status_code, 404)
+
+        self.client.force_login(self.staff)
+        self.assertIsNone(self.client.get('/reports/all/').json()[0]['artwork'])
+        self.assertIsNone(self.client.get('/reports/grouped/').json()[0]['artwork'])
+        self.assertIsNone(ReportSerializer(Report.objects.get(pk=self.report.pk)).data['artwork'])
+        self.assertEqual(ArtworkSerializer().get_comments(self.kept), [])
+
+    def test_deleting_hidden_artwork_does_not_count_twice(self):
+        self.ban(deactivate_content=True)
+        Artwork.objects.get(pk=self.hidden.pk).delete()
+        score = CreatorScore.objects.get(pk=self.spammer.pk)
+        self.assertEqual((score.uploads, score.total_likes, score.total_views), (0, 0, 0))
+
+    def test_deactivate_skips_active_users(self):
+        response = self.post('/admin/users/deactivate-content/', {'user_ids': [self.spammer.pk]})
+        self.assertEqual(response.json(), {'users': 0, 'artworks_deactivated': 0, 'comments_deactivated': 0})
+        User.objects.filter(pk=self.spammer.pk).update(is_active=False)
+        response = self.post('/admin/users/deactivate-content/', {'user_ids': [self.spammer.pk]})
+        self.assertEqual(response.json(), {'users': 1, 'artworks_deactivated': 1, 'comments_deactivated': 1})
+
+    def test_invalid_bodies(self):
+        for url in ('/admin/users/bulk-ban/', '/admin/users/deactivate-content/'):
+            for body in ({}, {'user_ids': []}, {'user_ids': 'x'}, {'user_ids': list(range(1001))}):
+                with self.subTest(url=url, body=body):
+                    self.assertEqual(self.post(url, body).status_code, 400)
+
+    def test_staff_only(self):
+        self.client.force_login(self.fan)
+        self.assertEqual(self.post('/admin/users/bulk-ban/', {'user_ids': [self.spammer.pk]}).status_code, 302)
+        self.assertTrue(User.objects.get(pk=self.spammer.pk).is_active)
+
+class AdminStatsTests(TestCase):
+    """Single-query dashboard counts and the DailyStats rollup (admin_stats.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('moderator', password='pw', is_staff=True)
+        users = [User.objects.create_user(f'user{i}', password='pw', is_active=i > 0) for i in range(3)]
+        # bulk_create: Artwork.save() would open the (missing) image file
+        artworks = Artwork.objects.bulk_create([
+            Artwork(title=f'Work {i}', description='', artist=users[i], image='artworks/test.jpg', views=10 * i)
+            for i in range(3)
+        ])
+        Like.objects.bulk_create([Like(user=users[0], artwork=artwork) for artwork in artworks[1:]])
+        Comment.objects.create(user=users[1], artwork=artworks[0], content='Nice')
+        Report.objects.bulk_create([
+            Report(reporter=users[1], artwork=artworks[0], reason='spam'),
+            Report(reporter=users[2], artwork=artworks[0], reason='spam', resolved=True),
+        ])
+        # Two days ago: outside a two-day rollup
+        User.objects.filter(pk=users[2].pk).update(date_joined=timezone.now() - timedelta(days=2))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_compute_stats_is_one_query(self):
+        with self.assertNumQueries(1):
+            stats = admin_stats.compute_stats()
+        self.assertEqual({key: stats[key] for key in (
+            'totalUsers', 'activeUsers', 'totalArtworks', 'totalLikes', 'totalComments',
+            'totalReports', 'pendingReports', 'totalViews',
+        )}, {'totalUsers': 4, 'activeUsers': 3, 'totalArtworks': 3, 'totalLikes': 2, 'totalComments': 1,
+             'totalReports': 2, 'pendingReports': 1, 'totalViews': 30})
+
+    def test_snapshot_is_cached(self):
+        self.client.force_login(self.staff)
+        first = self.client.get('/admin/stats/').json()
+        Like.objects.all().delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(admin_stats.get_stats_snapshot(), first)
+
+    def test_rollup(self):
+        self.assertEqual(admin_stats.rollup_daily_stats(days=2), 2)
+        today = DailyStats.objects.get(date=timezone.localdate())
+        self.assertEqual((today.new_users, today.new_artworks, today.new_likes, today.new_comments,
+                          today.new_reports), (3, 3, 2, 1, 2))
+        # No earlier measurement: today's growth is unknown
+        self.assertEqual((today.views, today.total_views), (0, 30))
+        self.assertEqual(DailyStats.objects.get(date=timezone.localdate() - timedelta(days=1)).new_users, 0)
+
+    def test_rollup_views_are_the_growth_since_the_last_measurement(self):
+        DailyStats.objects.create(date=timezone.localdate() - timedelta(days=3), total_views=12)
+        admin_stats.rollup_daily_stats(days=1)
+        self.assertEqual(DailyStats.objects.get(date=timezone.localdate()).views, 18)
+
+        # Re-run in place after more views, and never negative once artworks are deleted
+        Artwork.objects.update(views=F('views') + 1)
+        admin_stats.rollup_daily_stats(days=1)
+        self.assertEqual(DailyStats.objects.get(date=timezone.localdate()).views, 21)
+        Artwork.objects.all().delete()
+        admin_stats.rollup_daily_stats(days=1)
+        self.assertEqual(DailyStats.objects.get(date=timezone.localdate()).views, 0)
+        self.assertEqual(DailyStats.objects.count(), 2)
+
+    def test_daily_endpoint(self):
+        call_command('rollup_daily_stats', '--days', '3', stdout=io.StringIO())
+        self.client.force_login(self.staff)
+        days = self.client.get('/admin/stats/daily/?days=3').json()['days']
+        self.assertEqual([day['users'] for day in days], [1, 0, 3])
+        self.assertEqual(len(self.client.get('/admin/stats/daily/?days=1').json()['days']), 1)
+        self.assertEqual(self.client.get('/admin/stats/daily/?days=x').status_code, 400)
+
+    def test_staff_only(self):
+        for url in ('/admin/stats/', '/admin/stats/daily/'):
+            self.assertEqual(self.client.get(url).status_code, 302)
+
+class AdminUserListTests(TestCase):
+    """Keyset-paginated admin user list (get_all_users)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('moderator', email='mod@example.com', password='pw', is_staff=True)
+        cls.users = [
+            User.objects.create_user(f'User{i}', email=f'person{i}@example.com', password='pw', is_active=i != 2)
+            for i in range(6)
+        ]
+        # bulk_create: Artwork.save() would open the (missing) image file
+        Artwork.objects.bulk_create([
+            Artwork(title=f'Work {i}', description='', artist=cls.users[0], image='artworks/test.jpg')
+            for i in range(3)
+        ])
+        # Ties on date_joined must not lose or repeat a user across pages
+        User.objects.filter(pk__in=[u.pk for u in cls.users[1:4]]).update(date_joined=timezone.now())
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def pages(self, query=''):
+        usernames, url = [], f'/admin/users/?limit=2{query}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            usernames += [user['username'] for user in response.json()]
+            cursor = response.get('X-Next-Cursor')
+            url = f'/admin/users/?limit=2{query}&cursor={cursor}' if cursor else None
+        return usernames
+
+    def test_cursor_walks_every_user_once(self):
+        expected = User.objects.order_by('-date_joined', '-id').values_list('username', flat=True)
+        self.assertEqual(self.pages(), list(expected))
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        # The first request of the session also refreshes it
+        self.client.get('/admin/users/?limit=1')
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/admin/users/?limit=1')
+        with self.assertNumQueries(len(small.captured_queries)):
+            self.client.get('/admin/users/?limit=200')
+
+    def test_payload(self):
+        user = next(u for u in self.client.get('/admin/users/').json() if u['username'] == 'User0')
+        self.assertEqual((user['artworks_count'], user['email'], user['is_staff']), (3, 'person0@example.com', False))
+
+    def test_filters(self):
+        self.assertEqual(sorted(self.pages('&search=user1')), ['User1'])
+        self.assertEqual(sorted(self.pages('&search=PERSON')), [f'User{i}' for i in range(6)])
+        self.assertEqual(self.pages('&is_staff=true'), ['moderator'])
+        self.assertEqual(self.pages('&is_active=false'), ['User2'])
+
+    def test_invalid_params(self):
+        for query in ('limit=x', 'cursor=garbage'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/admin/users/?{query}').status_code, 400)
+
+    def test_staff_only(self):
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.client.get('/admin/users/').status_code, 302)
+
+class UserSummaryTests(TestCase):
+    """Cached user summaries (user_summaries.py) and their invalidation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('painter', email='painter@example.com', password='pw')
+        cls.other = User.objects.create_user('sculptor', password='pw')
+
+    def setUp(self):
+        cache.clear()
+
+    def cached(self, user):
+        return cache.get(f'user_summary:{user.pk}')
+
+    def test_misses_load_in_one_query_and_hits_in_none(self):
+        with self.assertNumQueries(1):
+            summaries = user_summaries.get_many([self.user.pk, self.other.pk, None, 999999])
+        self.assertEqual(set(summaries), {self.user.pk, self.other.pk})
+        with self.assertNumQueries(0):
+            user_summaries.get_many([self.user.pk, self.other.pk])
+
+    def test_private_fields_are_not_cached(self):
+        user_summaries.get(self.user.pk)
+        self.assertFalse({'email', 'is_staff'} & set(self.cached(self.user)))
+        # Promoted without a signal: check_auth still reads is_staff from the user itself
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.client.force_login(self.user)
+        data = self.client.get('/auth/check/').json()['user']
+        self.assertEqual((data['email'], data['is_staff']), ('painter@example.com', True))
+
+    def test_invalidation(self):
+        changes = {
+            'user saved': lambda: User.objects.get(pk=self.user.pk).save(),
+            'profile saved': lambda: UserProfile.objects.update_or_create(user=self.user, defaults={'bio': 'Hi'}),
+            'artwork created': lambda: Artwork.objects.create(title='New', description='', artist=self.user),
+            'artwork deleted': lambda: Artwork.objects.filter(artist=self.user).first().delete(),
+            'user deleted': lambda: User.objects.get(pk=self.user.pk).delete(),
+        }
+        for change, apply in changes.items():
+            with self.subTest(change=change):
+                user_summaries.get(self.user.pk)
+                self.assertIsNotNone(self.cached(self.user))
+                apply()
+                self.assertIsNone(self.cached(self.user))
+
+    def test_login_keeps_the_summary(self):
+        user_summaries.get(self.user.pk)
+        user = User.objects.get(pk=self.user.pk)
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+        self.assertIsNotNone(self.cached(self.user))
+
+    def test_artworks_count_follows_uploads(self):
+        self.assertEqual(user_summaries.get(self.user.pk)['artworks_count'], 0)
+        Artwork.objects.create(title='New', description='', artist=self.user)
+        self.assertEqual(user_summaries.get(self.user.pk)['artworks_count'], 1)
+
+class SessionRefreshTests(TestCase):
+    """Sliding session expiry (SessionRefreshMiddleware) on the cached_db engine"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('painter', password='pw')
+
+    def setUp(self):
+        cache.clear()
+
+    def session_writes(self, method='get', path='/auth/check/'):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(path)
+        writes = [
+            q['sql'] for q in ctx.captured_queries
+            if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT')
+        ]
+        return response, writes
+
+    def test_used_session_is_saved_once_per_interval(self):
+        self.client.login(username='painter', password='pw')
+        response, writes = self.session_writes()
+        self.assertTrue(response.json()['authenticated'])
+        # First request records the refresh time
+        self.assertTrue(writes)
+        for _ in range(3):
+            response, writes = self.session_writes()
+            self.assertEqual(writes, [])
+            self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_session_is_refreshed_after_the_interval(self):
+        self.client.login(username='painter', password='pw')
+        self.session_writes()
+        key = self.client.session.session_key
+        expire_date = Session.objects.get(pk=key).expire_date
+        later = time.time() + settings.SESSION_REFRESH_INTERVAL + 1
+        with mock.patch('gallery.middleware.time.time', return_value=later), \
+                mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(hours=2)):
+            response, writes = self.session_writes()
+        self.assertTrue(writes)
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertGreater(Session.objects.get(pk=key).expire_date, expire_date)
+
+    def test_anonymous_requests_write_nothing(self):
+        response, writes = self.session_writes()
+        self.assertFalse(response.json()['authenticated'])
+        self.assertEqual(writes, [])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+    def test_logout_deletes_the_session(self):
+        self.client.login(username='painter', password='pw')
+        self.session_writes()
+        key = self.client.session.session_key
+        self.assertEqual(self.client.post('/auth/logout/').status_code, 200)
+        self.assertFalse(Session.objects.filter(pk=key).exists())
+        self.assertFalse(self.client.get('/auth/check/').json()['authenticated'])
+
+    def test_cache_timeout_is_capped(self):
+        backend = mock.Mock()
+        capped = CappedTimeoutCache(backend, 300)
+        capped.set('a', 1, 1209600)
+        capped.set('b', 2, 60)
+        capped.set('c', 3)
+        self.assertEqual(
+            backend.set.call_args_list, [mock.call('a', 1, 300), mock.call('b', 2, 60), mock.call('c', 3, 300)]
+        )
+        # Everything else goes straight to the wrapped cache
+        capped.get('a')
+        backend.get.assert_called_once_with('a')
+
+    def test_session_store_uses_the_capped_cache(self):
+        store = SessionStore()
+        self.assertIsInstance(store._cache, CappedTimeoutCache)
+        self.assertEqual(store._cache.max_timeout, settings.SESSION_CACHE_TTL)
+
+
+class ReadWriteRoutingTests(TransactionTestCase):
+    """
+    ReadWriteRouter on real connections: TestCase would keep every read on
+    'default' (it wraps each test in a transaction)
+    """
+
+    databases = {'default', 'read'}
+
+    def setUp(self):
+        cache.clear()
+        creator_scores.take_pending_views()
+        self.user = User.objects.create_user('painter', password='pw')
+        self.artwork = Artwork.objects.create(title='Work', description='', artist=self.user)
+
+    def tearDown(self):
+        creator_scores.take_pending_views()
+
+    def request(self, method, path):
+        with CaptureQueriesContext(connections['default']) as default, \
+                CaptureQueriesContext(connections['read']) as read, \
+                redirect_stdout(io.StringIO()):
+            response = getattr(self.client, method)(path)
+        return response, [q['sql'] for q in default.captured_queries], [q['sql'] for q in read.captured_queries]
+
+    def test_get_reads_from_the_read_alias(self):
+        response, default, read = self.request('get', f'/artworks/{self.artwork.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('"gallery_artwork"' in sql for sql in read))
+        self.assertTrue(all(sql.startswith('SELECT') for sql in read))
+        # The view counter is a write: it stays on 'default'
+        self.assertTrue(any(sql.startswith('UPDATE "gallery_artwork"') for sql in default))
+        self.assertFalse(any(sql.startswith('SELECT') for sql in default))
+
+    def test_post_stays_on_default(self):
+        self.client.force_login(self.user)
+        response, default, read = self.request('post', f'/artworks/{self.artwork.pk}/like/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(read, [])
+        self.assertTrue(any(sql.startswith('INSERT INTO "gallery_like"') for sql in default))
+
+    def test_reads_see_the_request_own_writes(self):
+        with read_only_request():
+            self.assertEqual(router.db_for_read(Artwork), 'read')
+            self.assertEqual(router.db_for_write(Artwork), 'default')
+            Artwork.objects.filter(pk=self.artwork.pk).update(title='Committed')
+            # Autocommit: the read-only connection sees the write at once
+            self.assertEqual(Artwork.objects.get(pk=self.artwork.pk).title, 'Committed')
+            with transaction.atomic():
+                Artwork.objects.filter(pk=self.artwork.pk).update(title='Uncommitted')
+                # Inside the transaction, reads follow the writes onto 'default'
+                self.assertEqual(router.db_for_read(Artwork), 'default')
+                self.assertEqual(Artwork.objects.get(pk=self.artwork.pk).title, 'Uncommitted')
+            self.assertEqual(Artwork.objects.get(pk=self.artwork.pk).title, 'Uncommitted')
+
+    def test_outside_requests_read_from_default(self):
+        self.assertEqual(router.db_for_read(Artwork), 'default')
+
+
+# Lookup tables small enough that scanning them is the right plan
+SCAN_ALLOWED = {'gallery_category'}
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN QUERY PLAN of every SELECT issued by the hot views (index,
+    get_reports, get_all_users, register): fails when one of them goes back
+    to a full table scan, i.e. when an index of migration 0014 (or 0009/0013)
+    stops matching the view's filters and sorts
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', 'staff@example.com', 'secret', is_staff=True)
+        cls.users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'secret') for i in range(3)]
+        cls.category = Category.objects.create(name='Painting')
+        # bulk_create: Artwork.save() would open the (missing) image file
+        Artwork.objects.bulk_create([
+            Artwork(title=f'Artwork {i}', description='', artist=cls.users[i % 3], category=cls.category,
+                    style='abstract' if i % 2 else 'digital', image=f'artworks/{i}.jpg', is_featured=i == 0)
+            for i in range(6)
+        ])
+        artworks = list(Artwork.objects.all())
+        Like.objects.bulk_create([Like(user=user, artwork=artworks[0]) for user in cls.users])
+        comment = Comment.objects.create(user=cls.users[1], artwork=artworks[0], content='Nice')
+        Report.objects.bulk_create([
+            Report(reporter=cls.users[0], artwork=artworks[1], reason='spam'),
+            Report(reporter=cls.users[1], comment=comment, reason='other', resolved=True),
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[3] for row in cursor.fetchall()]
+
+    def assertNoFullScan(self, sql):
+        details = self.plan(sql)
+        # The slow-query log's own plan reading (FULL_SCAN, TABLE_ALIAS)
+        scanned = [table for table in slow_queries.full_scans(sql, details) if table not in SCAN_ALLOWED]
+        self.assertFalse(scanned, f'Full scan of {scanned} in:\n{sql}\n\n' + '\n'.join(details))
+        return details
+
+    def selects(self, method, url, **kwargs):
+        """The SELECT statements run by one request"""
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, response.content)
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+
+    def assertViewUsesIndexes(self, url, method='get', **kwargs):
+        selects = self.selects(method, url, **kwargs)
+        self.assertTrue(selects)
+        for sql in selects:
+            with self.subTest(url=url, sql=sql[:80]):
+                self.assertNoFullScan(sql)
+        return selects
+
+    def test_index(self):
+        for url in ('/artworks/', '/artworks/?style=abstract', '/artworks/?featured=1',
+                    '/artworks/?category=painting'):
+            self.assertViewUsesIndexes(url)
+
+    def test_index_filters_seek(self):
+        for url, index in (('/artworks/?style=abstract', 'artwork_style_created_idx'),
+                           ('/artworks/?featured=1', 'artwork_featured_idx'),
+                           ('/artworks/?category=painting', 'artwork_category_created_idx')):
+            details = self.plan(self.selects('get', url)[0])
+            self.assertTrue(any(index in detail for detail in details), f'{url}: ' + '\n'.join(details))
+
+    def test_get_reports(self):
+        for url in ('/reports/all/', '/reports/all/?resolved=false', '/reports/all/?resolved=true',
+                    '/reports/all/?resolved=true&reason=spam', '/reports/all/?since=2020-01-01'):
+            self.assertViewUsesIndexes(url)
+
+    def test_get_reports_pages_without_sorting(self):
+        response = self.client.get('/reports/all/?limit=1')
+        for url in ('/reports/all/?limit=1', f"/reports/all/?limit=1&cursor={response['X-Next-Cursor']}"):
+            details = self.plan(self.selects('get', url)[0])
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', details, f'{url}: ' + '\n'.join(details))
+
+    def test_get_all_users(self):
+        response = self.client.get('/admin/users/?limit=1')
+        for url in ('/admin/users/', '/admin/users/?search=user', '/admin/users/?search=USER1@',
+                    f"/admin/users/?limit=1&cursor={response['X-Next-Cursor']}"):
+            self.assertViewUsesIndexes(url)
+
+    def test_register(self):
+        self.client.logout()
+        self.assertViewUsesIndexes(
+            '/auth/register/', method='post', content_type='application/json',
+            data=json.dumps({'username': 'newcomer', 'email': 'newcomer@example.com', 'password': 'secret'}),
+        )
+
+
+def per_user_queries(request):
+    """An N+1 on purpose: one query per user"""
+    for user in User.objects.all():
+        user.artworks.exists()
+    return HttpResponse('ok')
+
+
+class QueryInspectorTests(TestCase):
+    """N+1 report and per-view query budgets (query_inspector.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'secret') for i in range(6)]
+        Artwork.objects.bulk_create([
+            Artwork(title=f'Artwork {i}', description='', artist=cls.users[i % 6], image=f'artworks/{i}.jpg')
+            for i in range(30)
+        ])
+        for artwork in Artwork.objects.all():
+            Like.objects.create(user=cls.users[0], artwork=artwork)
+            Comment.objects.create(user=cls.users[artwork.id % 6], artwork=artwork, content='Nice')
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = 12 AND b = 'x''y' AND c IN (%s, %s, %s)"),
+            'SELECT * FROM t WHERE a = ? AND b = ? AND c IN (...)',
+        )
+
+    @override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_REPEAT_THRESHOLD=5)
+    def test_middleware_reports_repeated_shapes_with_call_site(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            response = QueryInspectorMiddleware(per_user_queries)(RequestFactory().get('/'))
+        self.assertEqual(response['X-Query-Count'], str(1 + len(self.users)))
+        self.assertEqual(response['X-Query-Repeats'], '1')
+        self.assertIn(f'{len(self.users)}x', output.getvalue())
+        self.assertIn('gallery/tests.py', output.getvalue())
+        self.assertIn('(per_user_queries)', output.getvalue())
+
+    def test_budget_raises_in_tests(self):
+        view = query_budget(3)(per_user_queries)
+        with self.assertRaisesMessage(QueryBudgetExceeded, f'ran {1 + len(self.users)} queries, budget is 3'):
+            view(RequestFactory().get('/'))
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_budget_only_logs_when_not_strict(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            response = query_budget(3)(per_user_queries)(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('budget is 3', output.getvalue())
+
+    def test_index_query_count_does_not_grow_with_artworks(self):
+        self.client.force_login(self.users[0])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/artworks/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 30)
+        self.assertTrue(all(artwork['is_liked'] for artwork in response.json()))
+        self.assertLess(len(queries), 10)
+
+
+class ServerTimingTests(TestCase):
+    """Per-request phase breakdown (timing.py)"""
+
+    def test_nested_phases_are_exclusive(self):
+        timings = Timings()
+        outer = timings.enter('ai')
+        inner = timings.enter('db')
+        timings.exit(inner)
+        timings.exit(outer)
+        total, phases = timings.breakdown()
+        self.assertEqual(set(phases), {'ai', 'db', 'app'})
+        self.assertAlmostEqual(sum(phases.values()), total, places=6)
+
+    def test_phase_closed_out_of_order_is_dropped(self):
+        timings = Timings()
+        suspended = timings.enter('ai')
+        running = timings.enter('db')
+        timings.exit(suspended)
+        timings.exit(running)
+        self.assertEqual(timings._stack, [])
+
+    def test_phase_is_a_no_op_outside_a_request(self):
+        with phase('image'):
+            pass
+
+    def test_header_and_log_line(self):
+        def view(request):
+            with phase('image'):
+                User.objects.count()
+            return HttpResponse('ok')
+
+        output = io.StringIO()
+        with override_settings(SERVER_TIMING_LOG=True), redirect_stdout(output):
+            response = ServerTimingMiddleware(view)(RequestFactory().get('/artworks/'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="1x", image;dur=[\d.]+;desc="1x", '
+                                                    r'app;dur=[\d.]+, total;dur=[\d.]+$')
+        line = json.loads(output.getvalue().removeprefix('[timing] '))
+        self.assertEqual((line['path'], line['status'], line['db_queries']), ('/artworks/', 200, 1))
+        self.assertIn('image_ms', line)
+
+    def test_views_send_server_timing(self):
+        response = self.client.get('/categories/')
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+
+
+def broken_view(request):
+    raise RuntimeError('boom')
+
+
+# URLconf of MetricsTests.test_view_exceptions_are_counted
+urlpatterns = [
+    path('broken/', broken_view, name='broken'),
+    path('ok/', lambda request: HttpResponse('ok'), name='ok'),
+]
+
+@override_settings(METRICS_ENABLED=True)
+class MetricsTests(TestCase):
+    """Metrics shared through per-process files and the /metrics endpoint (metrics.py)"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        for patcher in (mock.patch.object(metrics, 'METRICS_DIR', self.directory),
+                        mock.patch.object(metrics, '_values_pid', None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'secret', is_staff=True)
+
+    def other_process(self, pid):
+        """The file of another (exited) worker"""
+        return metrics.MmapValues(os.path.join(self.directory, f'{pid}.db'))
+
+    def test_samples_are_summed_across_processes(self):
+        metrics.AI_CALLS.labels(endpoint='tutorial', model='m', outcome='ok').inc()
+        metrics.HTTP_IN_FLIGHT.inc(2)
+        exited = self.other_process(2 ** 22 + 1)
+        exited.add('["ai_calls_total","",{"endpoint":"tutorial","model":"m","outcome":"ok"}]', 2)
+        exited.add('["http_requests_in_flight","",{}]', 5)
+
+        text = metrics.render_text()
+        self.assertIn('ai_calls_total{endpoint="tutorial",model="m",outcome="ok"} 3\n', text)
+        # Gauges of exited processes are ignored
+        self.assertIn('http_requests_in_flight 2\n', text)
+        self.assertIn('# TYPE ai_call_duration_seconds histogram\n', text)
+
+    def test_file_grows_and_reopens(self):
+        values = self.other_process(2 ** 22 + 2)
+        for i in range(3000):
+            values.add(f'["ai_tokens_total","",{{"endpoint":"e{i}","model":"m","kind":"prompt"}}]', i)
+        reopened = self.other_process(2 ** 22 + 2)
+        self.assertEqual(len(reopened._offsets), 3000)
+        reopened.add('["ai_tokens_total","",{"endpoint":"e2999","model":"m","kind":"prompt"}]', 1)
+        self.assertIn('ai_tokens_total{endpoint="e2999",model="m",kind="prompt"} 3000\n', metrics.render_text())
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics.HTTP_REQUEST_DURATION.labels(view='v', method='GET').observe(0.03)
+        text = metrics.render_text()
+        self.assertIn('http_request_duration_seconds_bucket{view="v",method="GET",le="0.025"} 0\n', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="v",method="GET",le="0.05"} 1\n', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="v",method="GET",le="+Inf"} 1\n', text)
+        self.assertIn('http_request_duration_seconds_count{view="v",method="GET"} 1\n', text)
+
+    def test_requests_are_counted_per_view(self):
+        self.client.get('/categories/')
+        self.client.get('/categories/')
+        self.client.force_login(self.staff)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('http_requests_total{view="get_categories",method="GET",status="200"} 2\n',
+                      response.content.decode())
+
+    @override_settings(ROOT_URLCONF='gallery.tests')
+    def test_view_exceptions_are_counted(self):
+        self.client.raise_request_exception = False
+        with self.assertLogs('django.request', 'ERROR'):
+            self.assertEqual(self.client.get('/broken/').status_code, 500)
+        self.assertEqual(self.client.get('/ok/').status_code, 200)
+        text = metrics.render_text()
+        self.assertIn('http_request_exceptions_total{view="broken"} 1\n', text)
+        self.assertNotIn('http_request_exceptions_total{view="ok"}', text)
+        self.assertIn('http_requests_total{view="broken",method="GET",status="500"} 1\n', text)
+        self.assertIn('http_requests_in_flight 0\n', text)
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_endpoint_is_staff_or_token_only(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me').status_code, 200)
+
+
+@override_settings(SLOW_QUERY_ENABLED=True, SLOW_QUERY_THRESHOLD_MS=0)
+class SlowQueryTests(TestCase):
+    """Slow-query ring buffer, plans per shape and the staff view (slow_queries.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', 'staff@example.com', 'secret', is_staff=True)
+        cls.category = Category.objects.create(name='Painting')
+        Artwork.objects.bulk_create([
+            Artwork(title=f'Artwork {i}', description='', artist=cls.staff, category=cls.category,
+                    style='abstract', image=f'artworks/{i}.jpg')
+            for i in range(3)
+        ])
+
+    def setUp(self):
+        slow_queries.clear()
+        self.addCleanup(slow_queries.clear)
+
+    def test_redact_keeps_numbers_and_hides_text(self):
+        self.assertEqual(slow_queries.redact([1, 2.5, True, None, 'secret@example.com', b'\x00\x01']),
+                         [1, 2.5, True, None, '<str 18>', '<2 bytes>'])
+
+    def test_queries_of_index_are_recorded_with_plan_and_filters(self):
+        with redirect_stdout(io.StringIO()):
+            self.client.get('/artworks/?style=abstract&category=painting')
+        recorded = slow_queries.entries(view='artworks')
+        self.assertTrue(recorded)
+        artworks = next(entry for entry in recorded if 'FROM "gallery_artwork"' in entry['sql']
+                        and '"gallery_artwork"."style"' in entry['sql'])
+        self.assertEqual(artworks['path'], '/artworks/?style=abstract&category=painting')
+        self.assertIn('<str 8>', artworks['params'])
+        self.assertNotIn('abstract', json.dumps(artworks['params']))
+        self.assertTrue(artworks['plan'])
+        # The like/comment subqueries name their tables by alias (U0)
+        self.assertNotIn('U0', artworks['full_scans'])
+
+    def test_plan_is_explained_once_per_shape(self):
+        with mock.patch.object(slow_queries, 'explain', wraps=slow_queries.explain) as explain, \
+                redirect_stdout(io.StringIO()):
+            self.client.get('/artworks/?style=abstract')
+            first = explain.call_count
+            self.client.get('/artworks/?style=digital')
+        self.assertGreater(first, 0)
+        self.assertEqual(explain.call_count, first)
+        shapes = slow_queries.shapes(slow_queries.entries(view='artworks'))
+        self.assertTrue(any(row['count'] == 2 for row in shapes))
+
+    @override_settings(SLOW_QUERY_PLAN_CACHE_SIZE=2)
+    def test_plan_cache_evicts_least_recently_used_shapes(self):
+        with mock.patch.object(slow_queries, 'explain', return_value=['SCAN t']) as explain:
+            for shape in ('a', 'b', 'a', 'c'):
+                slow_queries.cached_plan(connection, shape, 'SELECT 1', ())
+            self.assertEqual(list(slow_queries._plans), ['a', 'c'])
+            self.assertEqual(explain.call_count, 3)
+            slow_queries.cached_plan(connection, 'b', 'SELECT 1', ())
+            self.assertEqual(explain.call_count, 4)
+        self.assertEqual(list(slow_queries._plans), ['c', 'b'])
+
+    def test_full_scans_resolve_subquery_aliases(self):
+        sql = 'SELECT 1 FROM "gallery_artwork" WHERE EXISTS (SELECT 1 FROM "gallery_like" U0)'
+        plan = ['SEARCH gallery_artwork USING INDEX x (id=?)', 'SCAN U0', 'SCAN gallery_comment USING INDEX y']
+        self.assertEqual(slow_queries.full_scans(sql, plan), ['gallery_like'])
+
+    def test_view_is_staff_only(self):
+        self.assertEqual(self.client.get('/admin/slow-queries/').status_code, 302)
+        self.client.force_login(self.staff)
+        with redirect_stdout(io.StringIO()):
+            self.client.get('/artworks/')
+            response = self.client.get('/admin/slow-queries/?view=artworks&limit=1')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['queries']), 1)
+        self.assertGreaterEqual(data['count'], 1)
+        self.assertTrue(all('artworks' in row['views'] for row in data['shapes']))
+
+
+def large_payload(request):
+    return HttpResponse(b''.join(bytes(1024) for _ in range(512)))
+
+
+@override_settings(ALLOC_PROFILER_ENABLED=True, ALLOC_PROFILER_TOKEN='profile-me', ALLOC_PROFILER_SAMPLE_RATE=0)
+class AllocationProfilerTests(TestCase):
+    """tracemalloc profiles of sampled or flagged requests (alloc_profiler.py)"""
+
+    def profile(self, view=large_payload, **headers):
+        with redirect_stdout(io.StringIO()):
+            return AllocationProfilerMiddleware(view)(RequestFactory().get('/', **headers))
+
+    def test_only_flagged_requests_are_profiled(self):
+        self.profile()
+        self.profile(HTTP_X_ALLOC_PROFILE='wrong')
+        self.assertFalse(AllocationProfile.objects.exists())
+        response = self.profile(HTTP_X_ALLOC_PROFILE='profile-me')
+        self.assertIn('peak=', response['X-Alloc-Profile'])
+        self.assertEqual(AllocationProfile.objects.get().trigger, 'header')
+
+    @override_settings(ALLOC_PROFILER_SAMPLE_RATE=1)
+    def test_sampled_request_reports_peak_and_sites(self):
+        self.profile()
+        profile = AllocationProfile.objects.get()
+        self.assertEqual((profile.trigger, profile.view, profile.status), ('sample', 'unmatched', 200))
+        self.assertGreaterEqual(profile.peak_bytes, 512 * 1024)
+        self.assertGreaterEqual(profile.retained_bytes, 512 * 1024)
+        self.assertIn('gallery/tests.py', profile.top_sites[0]['site'])
+
+    def test_profiles_are_compared_per_release(self):
+        for release in ('v1', 'v2'):
+            with override_settings(RELEASE=release):
+                self.profile(HTTP_X_ALLOC_PROFILE='profile-me')
+        rows = deploy_comparison(view='unmatched')
+        self.assertEqual([row['release'] for row in rows], ['v2', 'v1'])
+        self.assertEqual([row['release'] for row in deploy_comparison(releases=['v1'])], ['v1'])
+        self.assertTrue(rows[0]['top_sites'])
+
+    def test_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get('/admin/alloc-profiles/').status_code, 302)
+        self.client.force_login(User.objects.create_user('staff', 'staff@example.com', 'secret', is_staff=True))
+        response = self.client.get('/admin/alloc-profiles/?view=artworks')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['views'], [])
+
+
+class SeedAndBenchmarkTests(TestCase):
+    """Synthetic dataset (seed.py) and the endpoint benchmark harness (benchmarks.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        media = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(media.cleanup)
+        cls.counts = counts_for(0.2)
+        with override_settings(MEDIA_ROOT=media.name):
+            seed(cls.counts, seed=1, days=30)
+
+    def test_counts_and_rollups(self):
+        self.assertEqual(User.objects.filter(username__startswith='seed_user_').count(), self.counts['users'])
+        self.assertEqual(Artwork.objects.count(), self.counts['artworks'])
+        self.assertEqual(Like.objects.count(), self.counts['likes'])
+        self.assertEqual(Comment.objects.count(), self.counts['comments'])
+        self.assertEqual(Report.objects.count(), self.counts['reports'])
+        self.assertEqual(sum(Discussion.objects.values_list('replies', flat=True)), self.counts['replies'])
+        self.assertEqual(sum(ReportTarget.objects.values_list('total_reports', flat=True)), self.counts['reports'])
+        # Timestamps are spread over the period, not all "now"
+        self.assertGreater(Artwork.objects.values('created_at').distinct().count(), 1)
+
+    def test_every_route_is_benchmarked_or_skipped(self):
+        self.assertEqual(benchmarks.unmeasured(), [])
+
+    def test_writes_are_rolled_back(self):
+        fixture = benchmarks.Fixture.from_database()
+        endpoint = next(endpoint for endpoint in benchmarks.ENDPOINTS if endpoint.name == 'toggle_like')
+        likes = Like.objects.count()
+        result = benchmarks.measure(endpoint, benchmarks.USER, fixture, repeat=2, HTTP_HOST='localhost')
+        self.assertEqual((result['status'], result['auth']), (200, 'user'))
+        self.assertGreater(result['queries'], 0)
+        self.assertEqual(Like.objects.count(), likes)
+
+
+# (URL name, caller): (status, queries, response size ceiling in bytes) on the
+# EndpointRegressionTests dataset, with an empty cache. Query counts are exact:
+# when a change adds or removes queries on purpose, update the figure here.
+ENDPOINT_BUDGETS = {
+    ('artworks', ANONYMOUS): (200, 3, 36800),
+    ('artworks', USER): (200, 8, 36700),
+    ('artwork_detail', ANONYMOUS): (200, 8, 5900),
+    ('artwork_detail', USER): (200, 13, 5900),
+    ('update_artwork', ANONYMOUS): (401, 3, 100),
+    ('update_artwork', USER): (200, 10, 100),
+    ('toggle_like', ANONYMOUS): (401, 3, 100),
+    ('toggle_like', USER): (200, 15, 100),
+    ('add_comment', ANONYMOUS): (401, 3, 100),
+    ('add_comment', USER): (201, 10, 300),
+    ('delete_comment', ANONYMOUS): (401, 3, 100),
+    ('delete_comment', USER): (204, 9, 100),
+    ('get_description_job', ANONYMOUS): (401, 0, 100),
+    ('get_description_job', USER): (200, 5, 800),
+    ('register', ANONYMOUS): (201, 19, 300),
+    ('login', ANONYMOUS): (200, 13, 400),
+    ('logout', ANONYMOUS): (200, 3, 100),
+    ('logout', USER): (200, 6, 100),
+    ('check_auth', ANONYMOUS): (200, 0, 100),
+    ('check_auth', USER): (200, 5, 400),
+    ('profile', ANONYMOUS): (401, 0, 100),
+    ('profile', USER): (200, 5, 400),
+    ('user_profile', ANONYMOUS): (200, 2, 400),
+    ('user_profile', USER): (200, 2, 400),
+    ('create_report', ANONYMOUS): (201, 14, 100),
+    ('create_report', USER): (201, 14, 100),
+    ('get_reports', ANONYMOUS): (302, 0, 100),
+    ('get_reports', STAFF): (200, 6, 3600),
+    ('get_report_targets', ANONYMOUS): (302, 0, 100),
+    ('get_report_targets', STAFF): (200, 5, 2600),
+    ('resolve_report', ANONYMOUS): (302, 3, 100),
+    ('resolve_report', STAFF): (200, 13, 500),
+    ('ban_user', ANONYMOUS): (302, 3, 100),
+    ('ban_user', STAFF): (200, 9, 200),
+    ('bulk_resolve_reports', ANONYMOUS): (302, 3, 100),
+    ('bulk_resolve_reports', STAFF): (200, 12, 100),
+    ('get_all_users', ANONYMOUS): (302, 0, 100),
+    ('get_all_users', STAFF): (200, 5, 1900),
+    ('bulk_ban_users', ANONYMOUS): (302, 3, 100),
+    ('bulk_ban_users', STAFF): (200, 10, 100),
+    ('bulk_deactivate_content', ANONYMOUS): (302, 3, 100),
+    ('bulk_deactivate_content', STAFF): (200, 10, 100),
+    ('get_admin_stats', ANONYMOUS): (302, 0, 100),
+    ('get_admin_stats', STAFF): (200, 5, 400),
+    ('get_admin_daily_stats', ANONYMOUS): (302, 0, 100),
+    ('get_admin_daily_stats', STAFF): (200, 5, 4000),
+    ('get_ai_usage', ANONYMOUS): (302, 0, 100),
+    ('get_ai_usage', STAFF): (200, 6, 100),
+    ('get_slow_queries', ANONYMOUS): (302, 0, 100),
+    ('get_slow_queries', STAFF): (200, 4, 200),
+    ('get_alloc_profiles', ANONYMOUS): (302, 0, 100),
+    ('get_alloc_profiles', STAFF): (200, 5, 100),
+    ('get_categories', ANONYMOUS): (200, 1, 1100),
+    ('get_categories', USER): (200, 1, 1100),
+    ('get_tutorial_categories', ANONYMOUS): (200, 0, 1400),
+    ('get_tutorial_categories', USER): (200, 0, 1400),
+    ('get_tutorial_job', ANONYMOUS): (200, 1, 800),
+    ('get_tutorial_job', USER): (200, 1, 800),
+    ('ai_router_status', ANONYMOUS): (302, 0, 100),
+    ('ai_router_status', STAFF): (200, 4, 800),
+    ('metrics', ANONYMOUS): (403, 0, 100),
+    ('metrics', STAFF): (200, 4, 1000),
+    ('api-root', ANONYMOUS): (200, 0, 100),
+    ('api-root', USER): (200, 4, 100),
+    ('evaluation-list', ANONYMOUS): (200, 1, 1600),
+    ('evaluation-list', USER): (200, 5, 1600),
+    ('evaluation-detail', ANONYMOUS): (200, 1, 300),
+    ('evaluation-detail', USER): (200, 5, 300),
+    ('evaluation-evaluate', ANONYMOUS): (200, 9, 300),
+    ('evaluation-evaluate', USER): (200, 13, 300),
+    ('evaluation-badge', ANONYMOUS): (200, 1, 300),
+    ('evaluation-badge', USER): (200, 5, 300),
+    ('evaluation-leaderboard', ANONYMOUS): (200, 1, 1000),
+    ('evaluation-leaderboard', USER): (200, 5, 1000),
+    ('evaluation-my-rank', ANONYMOUS): (401, 0, 100),
+    ('evaluation-my-rank', USER): (200, 6, 300),
+}
+# Median of the warm requests; about ten times the usual figure, so that only
+# a real regression (not a busy CI machine) fails
+LATENCY_CEILING_MS = 250
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EndpointRegressionTests(TestCase):
+    """
+    Query count, status, latency and response size of every benchmarked
+    endpoint (benchmarks.ENDPOINTS) on a fixed seeded dataset
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # update_artwork reads the artwork's image file
+        media = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        cls.addClassCleanup(media_root.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(counts_for(0.1), seed=0, days=30)
+        cls.fixture = benchmarks.Fixture.from_database()
+
+    def setUp(self):
+        # /metrics renders the files of every process: only this one's
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for patcher in (mock.patch.object(metrics, 'METRICS_DIR', directory.name),
+                        mock.patch.object(metrics, '_values_pid', None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Views buffered by earlier tests would be flushed in the middle of a measured request
+        creator_scores.take_pending_views()
+
+    def calls(self):
+        for endpoint in benchmarks.ENDPOINTS:
+            for auth in endpoint.auth:
+                yield endpoint, auth, ENDPOINT_BUDGETS[endpoint.name, auth]
+
+    def test_every_endpoint_has_a_budget(self):
+        calls = {(endpoint.name, auth) for endpoint in benchmarks.ENDPOINTS for auth in endpoint.auth}
+        self.assertEqual(calls, set(ENDPOINT_BUDGETS))
+
+    def test_query_counts_and_response_sizes(self):
+        for endpoint, auth, (status, queries, max_bytes) in self.calls():
+            with self.subTest(endpoint=endpoint.name, auth=auth):
+                cache.clear()
+                client = benchmarks.client_for(auth, self.fixture, endpoint)
+                with redirect_stdout(io.StringIO()), self.assertNumQueries(queries):
+                    response, content = benchmarks.send(client, endpoint, self.fixture)
+                self.assertEqual(response.status_code, status)
+                self.assertLessEqual(len(content), max_bytes)
+
+    def test_latency(self):
+        for endpoint, auth, _ in self.calls():
+            with self.subTest(endpoint=endpoint.name, auth=auth), redirect_stdout(io.StringIO()):
+                result = benchmarks.measure(endpoint, auth, self.fixture, repeat=3)
+                self.assertLessEqual(result['p50_ms'], LATENCY_CEILING_MS)
+
+    def test_comment_deletion_is_author_or_staff_only(self):
+        comment = self.fixture.comment
+        other = User.objects.filter(is_staff=False).exclude(pk=comment.user_id).first()
+        self.client.force_login(other)
+        self.assertEqual(self.client.delete(f'/comments/{comment.pk}/').status_code, 403)
+        self.client.force_login(self.fixture.user)
+        self.assertEqual(self.client.delete(f'/comments/{comment.pk}/').status_code, 204)
+        comment.refresh_from_db()
+        self.assertFalse(comment.is_active)
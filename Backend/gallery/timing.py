@@ -0,0 +1,171 @@
+"""
+Per-request time breakdown
+ServerTimingMiddleware attributes the wall time of each request to phases -
+db, ai, image, serialize, render, and `app` for the rest - and sends it as a
+Server-Timing header plus one structured (JSON) log line.
+
+Code marks a phase with `with phase('image'):` or `@timed('ai')`; outside a
+request both are no-ops. Phases are exclusive: time spent in an inner phase
+(e.g. the db write of the AI metering) is not counted in the outer one.
+"""
+
+import json
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django import http
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+PHASES = ('db', 'ai', 'image', 'serialize', 'render')
+
+_current = ContextVar('request_timings', default=None)
+
+
+class Timings:
+    """Exclusive time per phase for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        # [name, running since] entries, innermost last
+        self._stack = []
+
+    def enter(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.totals[parent[0]] += now - parent[1]
+        entry = [name, now]
+        self._stack.append(entry)
+        self.counts[name] += 1
+        return entry
+
+    def exit(self, entry):
+        now = time.perf_counter()
+        if self._stack and self._stack[-1] is entry:
+            self._stack.pop()
+            self.totals[entry[0]] += now - entry[1]
+            if self._stack:
+                self._stack[-1][1] = now
+        else:
+            # Closed out of order (a generator suspended inside a phase): drop it
+            self._stack = [other for other in self._stack if other is not entry]
+
+    def breakdown(self):
+        """(total seconds, {phase: seconds}) with `app` as the unattributed remainder"""
+        total = time.perf_counter() - self.started
+        phases = {name: self.totals[name] for name in PHASES if self.counts[name]}
+        phases.update({name: seconds for name, seconds in self.totals.items() if name not in PHASES})
+        phases['app'] = max(0.0, total - sum(phases.values()))
+        return total, phases
+
+
+class phase:
+    """Attribute the enclosed block to a phase of the current request"""
+
+    def __init__(self, name):
+        self.name = name
+        self._timings = None
+        self._entry = None
+
+    def __enter__(self):
+        self._timings = _current.get()
+        if self._timings is not None:
+            self._entry = self._timings.enter(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._timings is not None:
+            self._timings.exit(self._entry)
+        return False
+
+
+def timed(name):
+    """Decorator form of phase() for plain (non-generator) functions"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class JsonResponse(http.JsonResponse):
+    """django.http.JsonResponse whose JSON encoding is timed as `serialize`"""
+
+    def __init__(self, *args, **kwargs):
+        with phase('serialize'):
+            super().__init__(*args, **kwargs)
+
+
+def _timed_query(execute, sql, params, many, context):
+    with phase('db'):
+        return execute(sql, params, many, context)
+
+
+def server_timing_header(total, phases, counts):
+    metrics = [
+        f'{name};dur={seconds * 1000:.1f}' + (f';desc="{counts[name]}x"' if counts.get(name) else '')
+        for name, seconds in phases.items()
+    ]
+    metrics.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(metrics)
+
+
+class ServerTimingMiddleware:
+    """
+    Time breakdown of every request (SERVER_TIMING_ENABLED); the log line is
+    printed when SERVER_TIMING_LOG. Streaming responses are measured up to the
+    moment the view returns. Goes second in MIDDLEWARE, right after
+    AllocationProfilerMiddleware: `total` covers every other middleware but
+    leaves out the profiler's tracemalloc start and stop.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.log = settings.SERVER_TIMING_LOG
+
+    def __call__(self, request):
+        timings = Timings()
+        token = _current.set(timings)
+        try:
+            with ExitStack() as stack:
+                for alias in settings.DATABASES:
+                    stack.enter_context(connections[alias].execute_wrapper(_timed_query))
+                response = self.get_response(request)
+            total, phases = timings.breakdown()
+        finally:
+            _current.reset(token)
+
+        response['Server-Timing'] = server_timing_header(total, phases, timings.counts)
+        if self.log:
+            print('[timing] ' + json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                **{f'{name}_ms': round(seconds * 1000, 1) for name, seconds in phases.items()},
+                'db_queries': timings.counts['db'],
+            }))
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses and TemplateResponses are rendered after the view returns
+        render = response.render
+
+        def timed_render():
+            with phase('render'):
+                return render()
+
+        response.render = timed_render
+        return response
@@ -12,9 +12,12 @@ urlpatterns = [
     path('artworks/<int:pk>/suggest-comments/', views.suggest_comments, name='suggest_comments'),
     #techniques
     path('generate-technique/', views.generate_art_technique, name='generate_art_technique'),
+    path('generate-technique/stream/', views.generate_art_technique_stream, name='generate_art_technique_stream'),
     
     path('artworks/<int:pk>/update/', views.update_artwork, name='update_artwork'),
     path('artworks/generate-description/', views.generate_description, name='generate_description'),
+    path('artworks/generate-description/jobs/', views.create_description_job, name='create_description_job'),
+    path('artworks/generate-description/jobs/<uuid:job_id>/', views.get_generation_job, {'kind': 'description'}, name='get_description_job'),
 
     # Comments
     path('comments/<int:pk>/', views.delete_comment, name='delete_comment'),
@@ -33,14 +36,22 @@ urlpatterns = [
     # Reports
     path('reports/', views.create_report, name='create_report'),
     path('reports/all/', views.get_reports, name='get_reports'),
+    path('reports/grouped/', views.get_report_targets, name='get_report_targets'),
     path('reports/<int:report_id>/resolve/', views.resolve_report, name='resolve_report'),
     path('users/<int:user_id>/ban/', views.ban_user, name='ban_user'),
+    path('reports/bulk-resolve/', views.bulk_resolve_reports, name='bulk_resolve_reports'),
 
     
     
     # Admin
     path('admin/users/', views.get_all_users, name='get_all_users'),
+    path('admin/users/bulk-ban/', views.bulk_ban_users, name='bulk_ban_users'),
+    path('admin/users/deactivate-content/', views.bulk_deactivate_content, name='bulk_deactivate_content'),
     path('admin/stats/', views.get_admin_stats, name='get_admin_stats'),
+    path('admin/stats/daily/', views.get_admin_daily_stats, name='get_admin_daily_stats'),
+    path('admin/ai-usage/', views.get_ai_usage, name='get_ai_usage'),
+    path('admin/slow-queries/', views.get_slow_queries, name='get_slow_queries'),
+    path('admin/alloc-profiles/', views.get_alloc_profiles, name='get_alloc_profiles'),
 
     # Categories
     path('categories/', views.get_categories, name='get_categories'),
@@ -48,6 +59,15 @@ urlpatterns = [
     # Tutorials
     path('tutorials/categories/', views.get_tutorial_categories, name='get_tutorial_categories'),
     path('tutorials/generate/', views.generate_ai_tutorial, name='generate_ai_tutorial'),
+    path('tutorials/generate/stream/', views.generate_ai_tutorial_stream, name='generate_ai_tutorial_stream'),
+    path('tutorials/jobs/', views.create_tutorial_job, name='create_tutorial_job'),
+    path('tutorials/jobs/<uuid:job_id>/', views.get_generation_job, {'kind': 'tutorial'}, name='get_tutorial_job'),
+
+    # AI router introspection
+    path('ai/router/', views.ai_router_status, name='ai_router_status'),
+
+    # Prometheus metrics (staff or METRICS_TOKEN)
+    path('metrics', views.metrics, name='metrics'),
 
     # Evaluation (IA)
     path('evaluation/', include('evaluation.urls')),
@@ -0,0 +1,104 @@
+"""
+Cached user summaries: profile fields, avatar URL and artwork count
+get_user_data (check_auth, login, profile) and the nested author/commenter
+fields of the artwork views read from here; a page of authors costs one
+cache.get_many plus at most one query for the misses. The receivers in
+signals.py invalidate a summary when the user, profile, avatar or artwork
+count changes (including bulk moderation hiding artworks).
+
+Only public fields are cached: email and is_staff are read from the User
+instance by get_user_data, so they are never stale nor shared between users.
+"""
+
+import os
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Artwork, UserProfile
+
+
+USER_SUMMARY_TTL = int(os.getenv('USER_SUMMARY_TTL', '300'))
+
+
+def _key(user_id):
+    return f'user_summary:{user_id}'
+
+
+def summary_from_user(user):
+    """
+    Build the summary of a user loaded with select_related('userprofile')
+    and an `artworks_count` annotation (see with_summary_fields)
+    """
+    try:
+        profile = user.userprofile
+    except UserProfile.DoesNotExist:
+        profile = None
+    return {
+        'id': user.id,
+        'username': user.username,
+        # Relative: made absolute per request, the host may differ
+        'avatar': profile.avatar.url if profile and profile.avatar else None,
+        'bio': profile.bio if profile else '',
+        'location': profile.location if profile else '',
+        'website': profile.website if profile else '',
+        'artworks_count': user.artworks_count,
+    }
+
+
+def with_summary_fields(users):
+    """Everything summary_from_user needs, in the same query as the users"""
+    return users.select_related('userprofile').annotate(
+        artworks_count=Coalesce(Subquery(
+            Artwork.objects.filter(artist=OuterRef('pk'), is_active=True).order_by()
+            .values('artist').annotate(count=Count('id')).values('count')[:1],
+            output_field=IntegerField(),
+        ), 0),
+    )
+
+
+def get_many(user_ids):
+    """{user_id: summary} for the given ids; unknown users are left out"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return {}
+    cached = cache.get_many([_key(user_id) for user_id in user_ids])
+    summaries = {summary['id']: summary for summary in cached.values()}
+
+    missing = user_ids - summaries.keys()
+    if missing:
+        loaded = {
+            user.id: summary_from_user(user)
+            for user in with_summary_fields(User.objects.filter(id__in=missing))
+        }
+        cache.set_many({_key(user_id): summary for user_id, summary in loaded.items()}, USER_SUMMARY_TTL)
+        summaries.update(loaded)
+    return summaries
+
+
+def get(user_id):
+    return get_many([user_id]).get(user_id)
+
+
+def invalidate(*user_ids):
+    cache.delete_many([_key(user_id) for user_id in user_ids if user_id is not None])
+
+
+def avatar_url(summary, request):
+    return request.build_absolute_uri(summary['avatar']) if summary and summary['avatar'] else None
+
+
+def author_data(summary, request):
+    """The nested {'id', 'username', 'avatar'} used for artists and commenters"""
+    return {
+        'id': summary['id'],
+        'username': summary['username'],
+        'avatar': avatar_url(summary, request),
+    }
+
+
+def user_data(summary, user, request):
+    """The get_user_data payload: the summary plus the private fields of the instance"""
+    return {**summary, 'email': user.email, 'is_staff': user.is_staff, 'avatar': avatar_url(summary, request)}
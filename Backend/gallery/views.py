@@ -1,30 +1,51 @@
-from django.http import JsonResponse
-from .models import Artwork, Report, Comment, Like, Category, UserProfile
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from .models import Artwork, Report, ReportTarget, Comment, Like, Category, UserProfile, GenerationJob
 from .forms import ReportForm
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Q, Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Lower
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time as datetime_time, timedelta
+import base64
 import requests
 from dotenv import load_dotenv
 import json
 import os
+from .admin_stats import daily_series, get_stats_snapshot
 from .ai_service import generate_comment_suggestions
+from .ai_metering import CallMeter, rolling_aggregates
+from .ai_streaming import sse_event
+from .alloc_profiler import deploy_comparison
+from .jobs import PER_USER_KINDS, enqueue
+from .metrics import render_text
+from .query_inspector import query_budget
+from .report_targets import record_resolved
 from .serializers import ReportSerializer
-from rest_framework.response import Response
+from . import slow_queries
+from .signals import artwork_viewed, content_deactivated
+from .timing import JsonResponse
+from . import user_summaries
+from .user_summaries import author_data, summary_from_user, user_data, with_summary_fields
 
 
 load_dotenv()
 
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-GROQ_API_URL = 'https://api.groq.com/openai/v1/chat/completions'
+GROQ_BASE_URL = os.getenv('GROQ_BASE_URL', 'https://api.groq.com/openai/v1')
+GROQ_API_URL = f'{GROQ_BASE_URL}/chat/completions'
+# Seconds before a stalled upstream call gives up (the worker would stay blocked otherwise)
+GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT', '60'))
 
 def call_groq_ai(user_query: str) -> str:
     """
@@ -45,35 +66,71 @@ def call_groq_ai(user_query: str) -> str:
         "top_p": 0.9,
     }
 
-    response = requests.post(
-        "https://api.groq.com/openai/v1/chat/completions",
-        headers=headers,
-        json=payload,
-    )
+    with CallMeter('art_technique', payload['model'], payload['messages']) as meter:
+        response = requests.post(
+            GROQ_API_URL,
+            headers=headers,
+            json=payload,
+            timeout=GROQ_TIMEOUT,
+        )
 
-    if response.status_code != 200:
-        return f"Error from Groq API: {response.text}"
+        if response.status_code != 200:
+            meter.finish('error')
+            return f"Error from Groq API: {response.text}"
 
-    result = response.json()
+        result = response.json()
+        meter.set_usage(result.get('usage'))
     return result['choices'][0]['message']['content']
 
 
-    response = requests.post(GROQ_API_URL, headers=headers, data=json.dumps(payload))
-    if response.status_code == 200:
-        data = response.json()
-        return data["choices"][0]["message"]["content"]
-    else:
-        return f"Error: {response.status_code} - {response.text}"
+def stream_groq_ai(user_query: str):
+    """
+    Stream the Groq AI chat model answer, yielding text deltas as they arrive.
+    """
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json",
+    }
 
+    payload = {
+        "model": "meta-llama/llama-4-scout-17b-16e-instruct",
+        "messages": [
+            {"role": "system", "content": "You are an expert art instructor."},
+            {"role": "user", "content": user_query},
+        ],
+        "temperature": 0.7,
+        "top_p": 0.9,
+        "stream": True,
+    }
 
+    meter = CallMeter('art_technique_stream', payload['model'], payload['messages'])
+    with meter, requests.post(GROQ_API_URL, headers=headers, json=payload, stream=True, timeout=GROQ_TIMEOUT) as response:
+        if response.status_code != 200:
+            raise Exception(f"Error from Groq API: {response.text}")
+
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            chunk = json.loads(data)
+            usage = chunk.get('usage') or (chunk.get('x_groq') or {}).get('usage')
+            if usage:
+                meter.set_usage(usage)
+            choices = chunk.get('choices') or []
+            delta = choices[0].get('delta', {}).get('content') if choices else None
+            if delta:
+                meter.first_token()
+                yield delta
 
-    response = requests.post(GROQ_API_URL, headers=headers, data=json.dumps(payload))
-    if response.status_code == 200:
-        data = response.json()
-        return data["choices"][0]["message"]["content"]
-    else:
-        return f"Error: {response.status_code} - {response.text}"
 
+def sse_response(events):
+    """Wrap an iterator of SSE strings in a non-buffered streaming response"""
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # disable proxy buffering (nginx)
+    return response
 
 
 
@@ -82,42 +139,51 @@ def call_groq_ai(user_query: str) -> str:
 # ============ Helper Functions ============
 
 def get_user_data(user, request):
-    """Helper function to get user data with is_staff"""
-    try:
-        profile = UserProfile.objects.get(user=user)
-        avatar = request.build_absolute_uri(profile.avatar.url) if profile.avatar else None
-        bio = profile.bio
-        location = profile.location
-        website = profile.website
-    except UserProfile.DoesNotExist:
-        avatar = None
-        bio = ''
-        location = ''
-        website = ''
-    
-    return {
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'is_staff': user.is_staff,  # Include is_staff for admin checks
-        'avatar': avatar,
-        'bio': bio,
-        'location': location,
-        'website': website,
-        'artworks_count': user.artworks.count(),
-    }
-
+    """Helper function to get user data with is_staff (public fields from the cached user summary)"""
+    if hasattr(user, 'artworks_count'):
+        # Already loaded with with_summary_fields (admin user list): no cache round trip
+        return user_data(summary_from_user(user), user, request)
+    summary = user_summaries.get(user.id)
+    if summary is None:
+        # Not saved (or deleted meanwhile): build it from the instance itself
+        summary = summary_from_user(with_summary_fields(User.objects.filter(pk=user.pk)).first() or user)
+    return user_data(summary, user, request)
+
+
+def related_count(queryset, field):
+    """
+    Number of `queryset` rows pointing (through `field`) at the outer row, as a
+    correlated subquery: no JOIN fan-out and no GROUP BY over the outer table,
+    so its filters and ORDER BY can still use an index
+    """
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(count=Count('id')).values('count')[:1],
+        output_field=IntegerField(),
+    ), 0)
+
+
+def validate_tutorial_params(topic, skill_level, language):
+    """Return an error message for invalid tutorial parameters, or None"""
+    if not topic:
+        return 'Topic is required'
+    if skill_level not in ['beginner', 'intermediate', 'advanced']:
+        return 'Invalid skill level'
+    if language not in ['en', 'ar', 'fr']:
+        return 'Invalid language. Must be en, ar, or fr'
+    return None
 
 # ============ Artworks ============
 @csrf_exempt
 @require_http_methods(["GET"])
+@query_budget(6)
 def index(request):
     """Get all artworks with optional filters"""
     try:
         # Start with annotated queryset
-        artworks = Artwork.objects.annotate(
-            likes_count=Count('likes', distinct=True),
-            comments_count=Count('comments', distinct=True)
+        artworks = Artwork.objects.filter(is_active=True).annotate(
+            likes_count=related_count(Like.objects.all(), 'artwork'),
+            comments_count=related_count(Comment.objects.filter(is_active=True), 'artwork'),
         )
         
         # Handle filters
@@ -133,7 +199,8 @@ def index(request):
                 Q(description__icontains=search)
             )
         if category and category != 'all':
-            artworks = artworks.filter(category__name__iexact=category)
+            # Category ids first, then a seek on the (category, created_at) index
+            artworks = artworks.filter(category__in=Category.objects.filter(name__iexact=category))
         if style and style != 'all':
             artworks = artworks.filter(style=style)
         if featured:
@@ -154,44 +221,39 @@ def index(request):
         else:
             artworks = artworks.order_by('-created_at')
         
+        artworks = list(artworks.select_related('category'))
+
+        # Artworks the current user liked, in one query
+        liked_ids = set()
+        if request.user.is_authenticated:
+            liked_ids = set(Like.objects.filter(user=request.user, artwork__in=artworks)
+                            .values_list('artwork_id', flat=True))
+
+        # Comments of every listed artwork in one query
+        comments_by_artwork = {}
+        for comment in Comment.objects.filter(
+            artwork__in=artworks, is_active=True
+        ).order_by('-created_at'):
+            comments_by_artwork.setdefault(comment.artwork_id, []).append(comment)
+
+        # Artists and commenters from the user-summary cache
+        authors = user_summaries.get_many(
+            [artwork.artist_id for artwork in artworks]
+            + [comment.user_id for comments in comments_by_artwork.values() for comment in comments]
+        )
+        
         data = []
         for artwork in artworks:
-            # Get artist avatar
-            avatar = None
-            try:
-                if hasattr(artwork.artist, 'userprofile') and artwork.artist.userprofile.avatar:
-                    avatar = request.build_absolute_uri(artwork.artist.userprofile.avatar.url)
-            except UserProfile.DoesNotExist:
-                pass
-            
-            # Get comments for this artwork
-            comments = Comment.objects.filter(artwork=artwork).order_by('-created_at')
             comments_data = []
-            for comment in comments:
-                comment_avatar = None
-                try:
-                    if hasattr(comment.user, 'userprofile') and comment.user.userprofile.avatar:
-                        comment_avatar = request.build_absolute_uri(comment.user.userprofile.avatar.url)
-                except UserProfile.DoesNotExist:
-                    pass
-                
+            for comment in comments_by_artwork.get(artwork.id, []):
                 comments_data.append({
                     'id': comment.id,
                     'text': comment.content,
                     'content': comment.content,
-                    'user': {
-                        'id': comment.user.id,
-                        'username': comment.user.username,
-                        'avatar': comment_avatar,
-                    },
+                    'user': author_data(authors[comment.user_id], request),
                     'created_at': comment.created_at.isoformat(),
                 })
             
-            # Check if current user has liked this artwork
-            is_liked = False
-            if request.user.is_authenticated:
-                is_liked = artwork.likes.filter(user=request.user).exists()
-            
             data.append({
                 'id': artwork.id,
                 'title': artwork.title,
@@ -199,15 +261,11 @@ def index(request):
                 'image': request.build_absolute_uri(artwork.image.url) if artwork.image else None,
                 'category': artwork.category.name if artwork.category else None,
                 'style': artwork.style,
-                'artist': {
-                    'id': artwork.artist.id,
-                    'username': artwork.artist.username,
-                    'avatar': avatar,
-                },
+                'artist': author_data(authors[artwork.artist_id], request),
                 'likes_count': artwork.likes_count,  # Use annotated value
                 'comments_count': artwork.comments_count,  # Use annotated value
                 'views': artwork.views,
-                'is_liked': is_liked,
+                'is_liked': artwork.id in liked_ids,
                 'is_featured': artwork.is_featured,
                 'comments': comments_data,  # Include all comments
                 'created_at': artwork.created_at.isoformat(),
@@ -234,25 +292,22 @@ def artwork_detail_update_delete(request, pk):
     try:
         if request.method == 'GET':
             # Get single artwork with comments
-            artwork = Artwork.objects.annotate(
+            artwork = Artwork.objects.filter(is_active=True).annotate(
                 likes_count=Count('likes', distinct=True),
-                comments_count=Count('comments', distinct=True)
+                comments_count=Count('comments', filter=Q(comments__is_active=True), distinct=True)
             ).get(pk=pk)
             
-            # Increment views
+            # Increment views with an UPDATE (no lost increments between
+            # workers, and no image re-processing in Artwork.save)
+            Artwork.objects.filter(pk=artwork.pk).update(views=F('views') + 1)
             artwork.views += 1
-            artwork.save()
+            artwork_viewed.send(sender=Artwork, artwork_id=artwork.pk, artist_id=artwork.artist_id, count=1)
             
             # Get comments
-            comments = Comment.objects.filter(artwork=artwork).order_by('-created_at')
+            comments = list(Comment.objects.filter(artwork=artwork, is_active=True).order_by('-created_at'))
             
-            # Get artist avatar
-            artist_avatar = None
-            try:
-                if hasattr(artwork.artist, 'userprofile') and artwork.artist.userprofile.avatar:
-                    artist_avatar = request.build_absolute_uri(artwork.artist.userprofile.avatar.url)
-            except UserProfile.DoesNotExist:
-                pass
+            # Artist and commenters from the user-summary cache
+            authors = user_summaries.get_many([artwork.artist_id] + [comment.user_id for comment in comments])
             
             data = {
                 'id': artwork.id,
@@ -261,11 +316,7 @@ def artwork_detail_update_delete(request, pk):
                 'image': request.build_absolute_uri(artwork.image.url) if artwork.image else None,
                 'category': artwork.category.name if artwork.category else None,
                 'style': artwork.style,
-                'artist': {
-                    'id': artwork.artist.id,
-                    'username': artwork.artist.username,
-                    'avatar': artist_avatar,
-                },
+                'artist': author_data(authors[artwork.artist_id], request),
                 'likes_count': artwork.likes_count,
                 'comments_count': artwork.comments_count,
                 'views': artwork.views,
@@ -280,22 +331,11 @@ def artwork_detail_update_delete(request, pk):
             
             # Add comments
             for comment in comments:
-                comment_avatar = None
-                try:
-                    if hasattr(comment.user, 'userprofile') and comment.user.userprofile.avatar:
-                        comment_avatar = request.build_absolute_uri(comment.user.userprofile.avatar.url)
-                except UserProfile.DoesNotExist:
-                    pass
-                
                 data['comments'].append({
                     'id': comment.id,
                     'text': comment.content,
                     'content': comment.content,
-                    'user': {
-                        'id': comment.user.id,
-                        'username': comment.user.username,
-                        'avatar': comment_avatar,
-                    },
+                    'user': author_data(authors[comment.user_id], request),
                     'created_at': comment.created_at.isoformat(),
                 })
             
@@ -502,13 +542,15 @@ def toggle_like(request, pk):
         if not request.user.is_authenticated:
             return JsonResponse({'error': 'Authentication required'}, status=401)
         
-        artwork = Artwork.objects.get(pk=pk)
+        artwork = Artwork.objects.get(pk=pk, is_active=True)
         like, created = Like.objects.get_or_create(
             artwork=artwork,
             user=request.user
         )
         
         if not created:
+            # Already loaded: the like signals need not fetch it again
+            like.artwork = artwork
             like.delete()
             liked = False
         else:
@@ -543,30 +585,18 @@ def add_comment(request, pk):
         if not text:
             return JsonResponse({'error': 'Comment text is required'}, status=400)
         
-        artwork = Artwork.objects.get(pk=pk)
+        artwork = Artwork.objects.get(pk=pk, is_active=True)
         comment = Comment.objects.create(
             artwork=artwork,
             user=request.user,
             content=text
         )
         
-        # Get user avatar
-        avatar = None
-        try:
-            if hasattr(request.user, 'userprofile') and request.user.userprofile.avatar:
-                avatar = request.build_absolute_uri(request.user.userprofile.avatar.url)
-        except UserProfile.DoesNotExist:
-            pass
-        
         return JsonResponse({
             'id': comment.id,
             'text': comment.content,
             'content': comment.content,
-            'user': {
-                'id': request.user.id,
-                'username': request.user.username,
-                'avatar': avatar,
-            },
+            'user': author_data(user_summaries.get(request.user.id), request),
             'created_at': comment.created_at.isoformat()
         }, status=201)
     except Artwork.DoesNotExist:
@@ -580,10 +610,17 @@ def add_comment(request, pk):
 @csrf_exempt
 @require_http_methods(["DELETE"])
 def delete_comment(request, pk):
+    """Hide a comment (its author or staff); the row is kept, like moderation does"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
     comment = get_object_or_404(Comment, pk=pk)
-    comment.is_deleted = True
-    comment.save(update_fields=['is_deleted'])
-    return Response(status=204)
+    if comment.user_id != request.user.id and not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    comment.is_active = False
+    comment.save(update_fields=['is_active', 'updated_at'])
+    return HttpResponse(status=204)
 
 
 # ============ AI Comment Suggestions ============
@@ -601,7 +638,7 @@ def suggest_comments(request, pk):
             return JsonResponse({'error': 'Authentication required'}, status=401)
         
         # Get the artwork
-        artwork = Artwork.objects.get(pk=pk)
+        artwork = Artwork.objects.get(pk=pk, is_active=True)
         
         # Generate suggestions using AI
         suggestions = generate_comment_suggestions(
@@ -667,14 +704,9 @@ def generate_ai_tutorial(request):
         language = data.get('language', 'en')
         
         # Validate inputs
-        if not topic:
-            return JsonResponse({'error': 'Topic is required'}, status=400)
-        
-        if skill_level not in ['beginner', 'intermediate', 'advanced']:
-            return JsonResponse({'error': 'Invalid skill level'}, status=400)
-        
-        if language not in ['en', 'ar', 'fr']:
-            return JsonResponse({'error': 'Invalid language. Must be en, ar, or fr'}, status=400)
+        error = validate_tutorial_params(topic, skill_level, language)
+        if error:
+            return JsonResponse({'error': error}, status=400)
         
         # Generate tutorial using AI
         from .ai_service import generate_tutorial
@@ -695,6 +727,150 @@ def generate_ai_tutorial(request):
         }, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def generate_ai_tutorial_stream(request):
+    """
+    Stream an AI-powered tutorial as Server-Sent Events
+    POST /tutorials/generate/stream/
+    Body: { "topic": "portrait drawing", "skill_level": "beginner", "language": "en" }
+    Events: token, section, step, done, error
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    topic = data.get('topic')
+    skill_level = data.get('skill_level', 'beginner')
+    language = data.get('language', 'en')
+    
+    error = validate_tutorial_params(topic, skill_level, language)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+    
+    from .ai_service import stream_tutorial
+    
+    def events():
+        try:
+            for event, payload in stream_tutorial(topic=topic, skill_level=skill_level, language=language):
+                yield sse_event(event, payload)
+        except Exception as e:
+            # The client only gets a generic message: the error may carry upstream details
+            print(f"Tutorial streaming error: {str(e)}")
+            import traceback
+            print(traceback.format_exc())
+            yield sse_event('error', {'error': 'Failed to generate tutorial'})
+    
+    return sse_response(events())
+
+
+# ============ AI Generation Jobs ============
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def create_tutorial_job(request):
+    """
+    Queue a tutorial generation job (processed by `manage.py run_ai_worker`)
+    POST /tutorials/jobs/
+    Body: { "topic": "portrait drawing", "skill_level": "beginner", "language": "en" }
+    An identical request returns the existing job while it is queued or
+    running, and its result for a while once done (jobs.JOB_RESULT_TTL).
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    params = {
+        'topic': data.get('topic'),
+        'skill_level': data.get('skill_level', 'beginner'),
+        'language': data.get('language', 'en'),
+    }
+    error = validate_tutorial_params(**params)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+    
+    job = enqueue('tutorial', params, request.user)
+    return JsonResponse(job.to_dict(), status=202 if job.status in GenerationJob.ACTIVE_STATUSES else 200)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def create_description_job(request):
+    """
+    Queue an artwork description generation job
+    POST /artworks/generate-description/jobs/
+    Body: { "title": "...", "category": "...", "style": "..." }
+    Jobs are per user: only their requester can poll them.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    if not data.get('title'):
+        return JsonResponse({'error': 'Title is required'}, status=400)
+    
+    params = {
+        'title': data.get('title'),
+        'category': data.get('category'),
+        'style': data.get('style'),
+    }
+    job = enqueue('description', params, request.user)
+    return JsonResponse(job.to_dict(), status=202 if job.status in GenerationJob.ACTIVE_STATUSES else 200)
+
+
+@require_http_methods(["GET"])
+def get_generation_job(request, job_id, kind):
+    """
+    Poll a generation job by its public id (a UUID, not the row id)
+    GET /tutorials/jobs/<id>/
+    GET /artworks/generate-description/jobs/<id>/   (the requester only)
+    """
+    jobs = GenerationJob.objects.filter(public_id=job_id, kind=kind)
+    if kind in PER_USER_KINDS:
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        jobs = jobs.filter(requested_by=request.user)
+    job = jobs.first()
+    if job is None:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    return JsonResponse(job.to_dict())
+
+
+@require_http_methods(["GET"])
+@staff_member_required
+def get_ai_usage(request):
+    """
+    Rolling aggregates of upstream AI calls per endpoint and model
+    GET /admin/ai-usage/?window=3600   (window in seconds, default 1 hour)
+    """
+    try:
+        window = int(request.GET.get('window', 3600))
+    except ValueError:
+        return JsonResponse({'error': 'window must be a number of seconds'}, status=400)
+    
+    return JsonResponse({
+        'window_seconds': window,
+        'aggregates': rolling_aggregates(timedelta(seconds=window)),
+    })
+
+
+@require_http_methods(["GET"])
+@staff_member_required
+def ai_router_status(request):
+    """
+    Inspect the AI model router (circuit state, success rate, latency percentiles)
+    GET /ai/router/
+    """
+    from .ai_service import router
+    return JsonResponse(router.snapshot())
+
+
  #============ AI description Suggestions ============
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -805,9 +981,8 @@ def login_view(request):
         user = authenticate(request, username=username, password=password)
         
         if user is not None:
+            # SessionMiddleware saves the new session once, with the response
             login(request, user)
-            request.session.modified = True
-            request.session.save()
             
             return JsonResponse({
                 'message': 'Login successful',
@@ -968,16 +1143,21 @@ def create_report(request):
             return JsonResponse({"error": "reporter_id and reason are required"}, status=400)
 
         reporter = get_object_or_404(User, id=reporter_id)
-        artwork = Artwork.objects.filter(id=artwork_id).first() if artwork_id else None
-        comment = Comment.objects.filter(id=comment_id).first() if comment_id else None
-
-        report = Report.objects.create(
-            reporter=reporter,
-            artwork=artwork,
-            comment=comment,
-            reason=reason,
-            description=description
-        )
+        # Content hidden by moderation can no longer be reported
+        artwork = Artwork.objects.filter(id=artwork_id, is_active=True).first() if artwork_id else None
+        comment = Comment.objects.filter(id=comment_id, is_active=True).first() if comment_id else None
+        if (artwork_id and artwork is None) or (comment_id and comment is None):
+            return JsonResponse({"error": "Reported content not found"}, status=404)
+
+        # The ReportTarget row is updated by the post_save receiver, in the same transaction
+        with transaction.atomic():
+            report = Report.objects.create(
+                reporter=reporter,
+                artwork=artwork,
+                comment=comment,
+                reason=reason,
+                description=description
+            )
 
         return JsonResponse({
             "message": "Report created successfully",
@@ -988,15 +1168,126 @@ def create_report(request):
         return JsonResponse({"error": str(e)}, status=500)
 
 
+# Keyset-paginated admin listings (reports, users)
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(timestamp, pk):
+    """Opaque keyset cursor for a (timestamp, id) ordering"""
+    raw = f'{timestamp.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, id) from a cursor, or None if it is invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        timestamp = parse_datetime(timestamp)
+        return (timestamp, int(pk)) if timestamp else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def parse_page_size(request):
+    """Return (limit, error) for the `limit` query param"""
+    try:
+        return min(max(int(request.GET.get('limit', PAGE_SIZE)), 1), MAX_PAGE_SIZE), None
+    except ValueError:
+        return None, 'limit must be an integer'
+
+
+def add_next_page_headers(request, response, next_cursor):
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        response['X-Next-Cursor'] = next_cursor
+        response['Link'] = f'<{request.build_absolute_uri(request.path)}?{params.urlencode()}>; rel="next"'
+
+
+def parse_report_date(value, end_of_day=False):
+    """Accept an ISO datetime or a plain date (whole day) in filters"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        parsed = datetime.combine(day, datetime_time.max if end_of_day else datetime_time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def visible(content):
+    """A reported artwork or comment, or None once deleted or hidden by moderation"""
+    return content if content is not None and content.is_active else None
+
+
+def filter_reports(reports, params):
+    """Apply the resolved/reason/since/until filters; return (queryset, error)"""
+    resolved = params.get('resolved', '')
+    if resolved:
+        if resolved.lower() not in ('true', 'false', '1', '0'):
+            return None, 'resolved must be true or false'
+        reports = reports.filter(resolved=resolved.lower() in ('true', '1'))
+
+    reason = params.get('reason', '')
+    if reason:
+        if reason not in dict(Report.REPORT_CHOICES):
+            return None, 'Invalid reason'
+        reports = reports.filter(reason=reason)
+
+    for param, lookup, end_of_day in (('since', 'created_at__gte', False), ('until', 'created_at__lte', True)):
+        value = params.get(param, '')
+        if value:
+            parsed = parse_report_date(value, end_of_day)
+            if parsed is None:
+                return None, f'Invalid {param} date'
+            reports = reports.filter(**{lookup: parsed})
+    return reports, None
+
+
 @require_http_methods(["GET"])
 @staff_member_required
+@query_budget(3)
 def get_reports(request):
-    reports = Report.objects.select_related(
+    """
+    Moderation queue, newest first, paginated by key on (created_at, id)
+
+    Query params: resolved, reason, since, until, limit, cursor.
+    The next page cursor is sent in X-Next-Cursor (and a Link header), the
+    number of unresolved reports in X-Pending-Count.
+    """
+    reports, error = filter_reports(Report.objects.all(), request.GET)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    limit, error = parse_page_size(request)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    cursor = request.GET.get('cursor', '')
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        created_at, report_id = position
+        # The leading range keeps the index seek; the OR only breaks ties on created_at
+        reports = reports.filter(
+            Q(created_at__lt=created_at) | Q(id__lt=report_id), created_at__lte=created_at
+        )
+
+    reports = list(reports.select_related(
         'reporter',
         'artwork','artwork__artist',
         'comment','comment__user',
         'comment__artwork','comment__artwork__artist',
-    ).order_by('-created_at')
+    ).order_by('-created_at', '-id')[:limit + 1])
+    next_cursor = None
+    if len(reports) > limit:
+        next_cursor = encode_cursor(reports[limit - 1].created_at, reports[limit - 1].id)
+    reports = reports[:limit]
 
     def img_url(obj):
         if not obj: return None
@@ -1005,7 +1296,8 @@ def get_reports(request):
 
     data = []
     for r in reports:
-        art = r.artwork or (r.comment.artwork if r.comment else None)
+        comment = visible(r.comment)
+        art = visible(r.artwork) or (visible(comment.artwork) if comment else None)
         item = {
             'id': r.id,
             'reporter': {'id': r.reporter.id, 'username': r.reporter.username},
@@ -1026,8 +1318,8 @@ def get_reports(request):
                    'username': getattr(getattr(art, 'artist', None),'username',None)}
                 ) if getattr(art,'artist',None) else None
             }
-        if r.comment:
-            c = r.comment
+        if comment:
+            c = comment
             item['comment'] = {
                 'id': c.id,
                 'text': getattr(c, 'content', None) or getattr(c, 'text', None),
@@ -1039,12 +1331,102 @@ def get_reports(request):
                 ) if getattr(c,'artwork',None) else None
             }
         data.append(item)
-    return JsonResponse(data, safe=False)
+
+    response = JsonResponse(data, safe=False)
+    # Served from the partial index on unresolved reports
+    response['X-Pending-Count'] = Report.objects.filter(resolved=False).count()
+    add_next_page_headers(request, response, next_cursor)
+    return response
+
+
+@require_http_methods(["GET"])
+@staff_member_required
+@query_budget(3)
+def get_report_targets(request):
+    """
+    Grouped moderation queue: one entry per reported artwork or comment
+
+    Served from the ReportTarget rollup, newest report first, paginated by key
+    on (last_reported_at, id). Query params: status (pending by default, or
+    all), type (artwork or comment), limit, cursor.
+    """
+    targets = ReportTarget.objects.all()
+    report_status = request.GET.get('status', 'pending')
+    if report_status == 'pending':
+        targets = targets.filter(pending_reports__gt=0)
+    elif report_status != 'all':
+        return JsonResponse({'error': 'status must be pending or all'}, status=400)
+
+    target_type = request.GET.get('type', '')
+    if target_type:
+        if target_type not in dict(ReportTarget.TARGET_CHOICES):
+            return JsonResponse({'error': 'type must be artwork or comment'}, status=400)
+        targets = targets.filter(target_type=target_type)
+
+    limit, error = parse_page_size(request)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    cursor = request.GET.get('cursor', '')
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        last_reported_at, target_pk = position
+        targets = targets.filter(
+            Q(last_reported_at__lt=last_reported_at) | Q(id__lt=target_pk), last_reported_at__lte=last_reported_at
+        )
+
+    targets = list(targets.select_related(
+        'artwork', 'artwork__artist', 'comment', 'comment__user', 'comment__artwork', 'comment__artwork__artist',
+    ).order_by('-last_reported_at', '-id')[:limit + 1])
+    next_cursor = None
+    if len(targets) > limit:
+        next_cursor = encode_cursor(targets[limit - 1].last_reported_at, targets[limit - 1].id)
+    targets = targets[:limit]
+
+    data = []
+    for target in targets:
+        comment = visible(target.comment)
+        art = visible(target.artwork) or (visible(comment.artwork) if comment else None)
+        item = {
+            'id': target.id,
+            'target_type': target.target_type,
+            'target_id': target.target_id,
+            'report_count': target.total_reports,
+            'pending_count': target.pending_reports,
+            'reasons': sorted(target.reason_counts),
+            'reason_counts': target.reason_counts,
+            'first_reported_at': target.first_reported_at.isoformat(),
+            'last_reported_at': target.last_reported_at.isoformat(),
+            'last_resolved_at': target.last_resolved_at.isoformat() if target.last_resolved_at else None,
+            # The content itself may have been deleted or hidden since
+            'artwork': None,
+            'comment': None,
+        }
+        if art:
+            item['artwork'] = {
+                'id': art.id,
+                'title': art.title,
+                'image': request.build_absolute_uri(art.image.url) if art.image else None,
+                'artist': {'id': art.artist.id, 'username': art.artist.username},
+            }
+        if comment:
+            item['comment'] = {
+                'id': comment.id,
+                'text': comment.content,
+                'user': {'id': comment.user.id, 'username': comment.user.username},
+            }
+        data.append(item)
+
+    response = JsonResponse(data, safe=False)
+    add_next_page_headers(request, response, next_cursor)
+    return response
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
-#@staff_member_required
+@staff_member_required
 def resolve_report(request, report_id):
     report = get_object_or_404(
         Report.objects.select_related(
@@ -1055,10 +1437,14 @@ def resolve_report(request, report_id):
         id=report_id
     )
     if not report.resolved:
+        now = timezone.now()
+        with transaction.atomic():
+            # Conditional update: only one of two concurrent resolves counts it in the rollup
+            # (a queryset update sends no post_save, so the rollup is updated here)
+            if Report.objects.filter(id=report.id, resolved=False).update(resolved=True, resolved_at=now):
+                record_resolved([report], now)
         report.resolved = True
-        if hasattr(report, 'resolved_at'):
-            report.resolved_at = timezone.now()
-        report.save(update_fields=['resolved'] + (['resolved_at'] if hasattr(report, 'resolved_at') else []))
+        report.resolved_at = now
 
     data = ReportSerializer(report).data
     return JsonResponse(data, status=200, safe=False)
@@ -1084,34 +1470,218 @@ def ban_user(request, user_id):
         return JsonResponse({"error": str(e)}, status=500)
 
 
+# ============ Bulk Moderation ============
+
+BULK_MAX_IDS = 1000
+
+
+def parse_id_list(value):
+    """Return a de-duplicated list of ids, or None if `value` is not a list of integers"""
+    if not isinstance(value, list) or len(value) > BULK_MAX_IDS:
+        return None
+    try:
+        return sorted({int(v) for v in value})
+    except (TypeError, ValueError):
+        return None
+
+
+def deactivate_content(user_ids):
+    """
+    Hide the artworks and comments of the given users; returns (artworks, comments) counts
+
+    A queryset update sends no post_save: content_deactivated carries what each
+    artist loses (uploads, likes and views of the hidden artworks) to the
+    creator scores and user summaries.
+    """
+    artworks = Artwork.objects.filter(artist_id__in=user_ids, is_active=True)
+    removed = {
+        row['artist_id']: {'uploads': row['uploads'], 'likes': 0, 'views': row['views']}
+        for row in artworks.order_by().values('artist_id').annotate(uploads=Count('id'), views=Sum('views'))
+    }
+    likes = Like.objects.filter(artwork__in=artworks).order_by().values('artwork__artist_id').annotate(count=Count('id'))
+    for row in likes:
+        removed[row['artwork__artist_id']]['likes'] = row['count']
+
+    hidden = artworks.update(is_active=False)
+    comments = Comment.objects.filter(user_id__in=user_ids, is_active=True).update(is_active=False)
+    content_deactivated.send(sender=Artwork, artists=removed, user_ids=user_ids)
+    return hidden, comments
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@staff_member_required
+def bulk_resolve_reports(request):
+    """
+    Resolve many reports at once (admin only)
+
+    Body: {"ids": [...]} and/or {"filter": {"reason", "since", "until",
+    "artwork_id", "comment_id"}}; one of them is required.
+    """
+    try:
+        data = json.loads(request.body or '{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    ids = data.get('ids')
+    filters = data.get('filter')
+    if ids is None and not filters:
+        return JsonResponse({'error': 'ids or filter is required'}, status=400)
+
+    reports = Report.objects.all()
+    if ids is not None:
+        ids = parse_id_list(ids)
+        if ids is None:
+            return JsonResponse({'error': f'ids must be a list of at most {BULK_MAX_IDS} integers'}, status=400)
+        reports = reports.filter(id__in=ids)
+    if filters:
+        if not isinstance(filters, dict):
+            return JsonResponse({'error': 'filter must be an object'}, status=400)
+        params = {key: str(filters[key]) for key in ('reason', 'since', 'until') if filters.get(key)}
+        reports, error = filter_reports(reports, params)
+        if error:
+            return JsonResponse({'error': error}, status=400)
+        for field in ('artwork_id', 'comment_id'):
+            if filters.get(field) is not None:
+                try:
+                    reports = reports.filter(**{field: int(filters[field])})
+                except (TypeError, ValueError):
+                    return JsonResponse({'error': f'{field} must be an integer'}, status=400)
+
+    now = timezone.now()
+    with transaction.atomic():
+        resolved = reports.filter(resolved=False).update(resolved=True, resolved_at=now)
+        if resolved:
+            # The rows stamped by this UPDATE, to take them out of the per-target rollup
+            record_resolved(reports.filter(resolved_at=now).only('artwork_id', 'comment_id'), now)
+
+    return JsonResponse({'resolved': resolved}, status=200)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@staff_member_required
+def bulk_ban_users(request):
+    """
+    Ban a list of users (admin only)
+
+    Body: {"user_ids": [...], "deactivate_content": false}. The requesting
+    admin is never banned.
+    """
+    try:
+        data = json.loads(request.body or '{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    user_ids = parse_id_list(data.get('user_ids'))
+    if not user_ids:
+        return JsonResponse({'error': f'user_ids must be a non-empty list of at most {BULK_MAX_IDS} integers'},
+                            status=400)
+    user_ids = [user_id for user_id in user_ids if user_id != request.user.id]
+
+    artworks = comments = 0
+    with transaction.atomic():
+        banned = User.objects.filter(id__in=user_ids, is_active=True).update(is_active=False)
+        if data.get('deactivate_content'):
+            artworks, comments = deactivate_content(user_ids)
+
+    return JsonResponse({
+        'banned': banned,
+        'artworks_deactivated': artworks,
+        'comments_deactivated': comments,
+    }, status=200)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@staff_member_required
+def bulk_deactivate_content(request):
+    """
+    Hide every artwork and comment of banned users (admin only)
+
+    Body: {"user_ids": [...]}; users that are not banned are skipped.
+    """
+    try:
+        data = json.loads(request.body or '{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    user_ids = parse_id_list(data.get('user_ids'))
+    if not user_ids:
+        return JsonResponse({'error': f'user_ids must be a non-empty list of at most {BULK_MAX_IDS} integers'},
+                            status=400)
+
+    with transaction.atomic():
+        banned_ids = list(User.objects.filter(id__in=user_ids, is_active=False).values_list('id', flat=True))
+        artworks, comments = deactivate_content(banned_ids)
+
+    return JsonResponse({
+        'users': len(banned_ids),
+        'artworks_deactivated': artworks,
+        'comments_deactivated': comments,
+    }, status=200)
+
 
 # ============ Admin - Users ============
 
+def prefix_range(term):
+    """[term, successor) bounds matching every string that starts with `term`"""
+    return term, term[:-1] + chr(ord(term[-1]) + 1)
+
+
 @require_http_methods(["GET"])
 @staff_member_required
+@query_budget(3)
 def get_all_users(request):
-    """Get all users (admin only)"""
+    """
+    Get all users (admin only), newest first
+
+    Paginated by key on (date_joined, id) with limit and cursor, like
+    get_reports. `search` is a case-insensitive prefix match on username or
+    email, served by the LOWER() indexes of migration 0013.
+    """
     try:
-        users = User.objects.all().order_by('-date_joined')
+        users = with_summary_fields(User.objects.all())
         
         # Apply filters
-        search = request.GET.get('search', '')
+        search = request.GET.get('search', '').strip().lower()
         is_staff = request.GET.get('is_staff', '')
         is_active = request.GET.get('is_active', '')
         
         if search:
-            users = users.filter(
-                Q(username__icontains=search) | 
-                Q(email__icontains=search)
+            low, high = prefix_range(search)
+            users = users.annotate(username_lower=Lower('username'), email_lower=Lower('email')).filter(
+                Q(username_lower__gte=low, username_lower__lt=high) |
+                Q(email_lower__gte=low, email_lower__lt=high)
             )
         if is_staff:
             users = users.filter(is_staff=is_staff.lower() == 'true')
         if is_active:
             users = users.filter(is_active=is_active.lower() == 'true')
-        
+
+        limit, error = parse_page_size(request)
+        if error:
+            return JsonResponse({'error': error}, status=400)
+
+        cursor = request.GET.get('cursor', '')
+        if cursor:
+            position = decode_cursor(cursor)
+            if position is None:
+                return JsonResponse({'error': 'Invalid cursor'}, status=400)
+            date_joined, user_id = position
+            users = users.filter(Q(date_joined__lt=date_joined) | Q(id__lt=user_id), date_joined__lte=date_joined)
+
+        users = list(users.order_by('-date_joined', '-id')[:limit + 1])
+        next_cursor = None
+        if len(users) > limit:
+            next_cursor = encode_cursor(users[limit - 1].date_joined, users[limit - 1].id)
+        users = users[:limit]
+
         data = [get_user_data(user, request) for user in users]
         
-        return JsonResponse(data, safe=False)
+        response = JsonResponse(data, safe=False)
+        add_next_page_headers(request, response, next_cursor)
+        return response
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -1121,27 +1691,78 @@ def get_all_users(request):
 @require_http_methods(["GET"])
 @staff_member_required
 def get_admin_stats(request):
-    """Get admin dashboard statistics"""
+    """Get admin dashboard statistics (one query, cached for ADMIN_STATS_TTL seconds)"""
     try:
-        total_users = User.objects.count()
-        active_users = User.objects.filter(is_active=True).count()
-        total_artworks = Artwork.objects.count()
-        total_reports = Report.objects.count()
-        pending_reports = Report.objects.filter(resolved=False).count()
-        
-        return JsonResponse({
-            'totalUsers': total_users,
-            'activeUsers': active_users,
-            'totalArtworks': total_artworks,
-            'totalReports': total_reports,
-            'pendingReports': pending_reports,
-            'totalTransactions': 0,  # Placeholder
-            'totalRevenue': 0,  # Placeholder
-        })
+        return JsonResponse(get_stats_snapshot())
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@require_http_methods(["GET"])
+@staff_member_required
+def get_admin_daily_stats(request):
+    """Per-day users, artworks, likes, comments, reports and views (?days=30, max 366)"""
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 366)
+    except ValueError:
+        return JsonResponse({'error': 'days must be an integer'}, status=400)
+    return JsonResponse({'days': daily_series(days)})
+
+
+@require_http_methods(["GET"])
+@staff_member_required
+def get_slow_queries(request):
+    """
+    Slow queries recorded by this worker (see slow_queries.py), newest first,
+    and a per-shape summary sorted by total time (?view=artworks, ?limit=50)
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), settings.SLOW_QUERY_BUFFER_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    recorded = slow_queries.entries(view=request.GET.get('view'))
+    return JsonResponse({
+        'enabled': settings.SLOW_QUERY_ENABLED,
+        'threshold_ms': settings.SLOW_QUERY_THRESHOLD_MS,
+        'count': len(recorded),
+        'queries': recorded[:limit],
+        'shapes': slow_queries.shapes(recorded),
+    })
+
+
+@require_http_methods(["GET"])
+@staff_member_required
+def get_alloc_profiles(request):
+    """
+    Allocation profiles per view and deploy (see alloc_profiler.py)
+    GET /admin/alloc-profiles/?view=artworks&releases=abc123,def456
+    """
+    releases = [release for release in request.GET.get('releases', '').split(',') if release]
+    return JsonResponse({
+        'enabled': settings.ALLOC_PROFILER_ENABLED,
+        'release': settings.RELEASE,
+        'views': deploy_comparison(view=request.GET.get('view'), releases=releases),
+    })
+
+
+# ============ Metrics ============
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    Prometheus text format of every metric (see metrics.py), for staff, or for
+    a scraper sending `Authorization: Bearer <METRICS_TOKEN>`
+    """
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized and settings.METRICS_TOKEN:
+        authorized = constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'
+        )
+    if not authorized:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    return HttpResponse(render_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 # ============ Categories ============
 
 @require_http_methods(["GET"])
@@ -1239,3 +1860,37 @@ def generate_art_technique(request):
         return JsonResponse({"generated_text": answer})
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def generate_art_technique_stream(request):
+    """
+    Stream the technique answer as Server-Sent Events
+    POST /generate-technique/stream/
+    Body: { "prompt": "..." }
+    Events: token, done, error
+    """
+    try:
+        body = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    prompt = body.get("prompt", "")
+    if not prompt:
+        return JsonResponse({"error": "Prompt is required"}, status=400)
+
+    def events():
+        parts = []
+        try:
+            for delta in stream_groq_ai(prompt):
+                parts.append(delta)
+                yield sse_event('token', {'text': delta})
+            yield sse_event('done', {'generated_text': ''.join(parts)})
+        except Exception as e:
+            print(f"Technique streaming error: {str(e)}")
+            import traceback
+            print(traceback.format_exc())
+            yield sse_event('error', {'error': 'Failed to generate technique'})
+
+    return sse_response(events())
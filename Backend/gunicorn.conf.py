@@ -0,0 +1,7 @@
+# Loaded automatically by gunicorn (procfile: gunicorn art_gallery.wsgi)
+
+
+def on_starting(server):
+    # Per-worker metric files of the previous run (see gallery/metrics.py)
+    from gallery import metrics
+    metrics.reset_directory()
@@ -127,6 +127,28 @@ const getAuthHeader = (): HeadersInit => {
   };
 };
 
+// Fetch every page of a list paginated by key: the backend sends the next
+// page's cursor in the X-Next-Cursor header until the last page
+const fetchAllPages = async <T>(url: string, errorMessage: string): Promise<T[]> => {
+  const items: T[] = [];
+  const separator = url.includes('?') ? '&' : '?';
+  let cursor: string | null = '';
+  do {
+    const pageUrl: string = `${url}${separator}limit=200${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`;
+    const response = await fetch(pageUrl, {
+      credentials: 'include',
+      headers: getAuthHeader(),
+    });
+    if (!response.ok) {
+      throw new Error(errorMessage);
+    }
+    const data = await response.json();
+    items.push(...(Array.isArray(data) ? data : []));
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return items;
+};
+
 // API functions
 export const api = {
   // ============ Artworks ============
@@ -632,17 +654,10 @@ async generateDescription(data: {
 
   
   async getReports(): Promise<Report[]> {
-  const response = await fetch(`${API_BASE_URL}/reports/all/`, {
-    credentials: 'include',
-    headers: getAuthHeader(),
-  });
-  if (!response.ok) {
-    throw new Error('Failed to fetch reports');
-  }
-  const data = await response.json();
+  const data = await fetchAllPages<any>(`${API_BASE_URL}/reports/all/`, 'Failed to fetch reports');
 
   // ✅ Normalisation: si report.artwork absent, essaie via report.comment.artwork
-  const normalized: Report[] = (Array.isArray(data) ? data : []).map((r: any) => {
+  const normalized: Report[] = data.map((r: any) => {
     const fallbackArtwork = r.artwork ?? r?.comment?.artwork ?? null;
     return {
       ...r,
@@ -737,17 +752,8 @@ async generateDescription(data: {
 
     const queryString = queryParams.toString();
     const url = `${API_BASE_URL}/admin/users/${queryString ? `?${queryString}` : ''}`;
-    
-    const response = await fetch(url, {
-      credentials: 'include',
-      headers: getAuthHeader(),
-    });
-    
-    if (!response.ok) {
-      throw new Error('Failed to fetch users');
-    }
-    
-    return response.json();
+
+    return fetchAllPages<User>(url, 'Failed to fetch users');
   },
 
   async updateUserStatus(userId: number, data: {
@@ -884,11 +890,20 @@ async generateDescription(data: {
   // ============ Evaluation ============
   evaluation: {
     async getEvaluations(): Promise<Evaluation[]> {
-      const res = await fetch(`${API_BASE_URL}/evaluation/evaluations/`, {
-        credentials: 'include',
-      });
-      if (!res.ok) throw new Error('Failed to fetch evaluations');
-      return res.json();
+      // The list is cursor-paginated ({ next, previous, results }): follow `next` to the end
+      const evaluations: Evaluation[] = [];
+      let url: string | null = `${API_BASE_URL}/evaluation/evaluations/?limit=200`;
+      while (url) {
+        const res = await fetch(url, {
+          credentials: 'include',
+        });
+        if (!res.ok) throw new Error('Failed to fetch evaluations');
+        const data = await res.json();
+        if (Array.isArray(data)) return data;
+        evaluations.push(...data.results);
+        url = data.next;
+      }
+      return evaluations;
     },
 
     async evaluateUser(userId: number): Promise<Evaluation> {